@@ -6,6 +6,7 @@ Requires: process_yields.py and process_weather.py to have been run first.
 
 import pandas as pd
 import numpy as np
+import argparse
 import json
 import os
 from scipy import stats
@@ -13,11 +14,54 @@ from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import r2_score, mean_absolute_error
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'public', 'data')
+import instrument
+import jsonout
+import model_cv
+import panel_model
+import resampling
+import whatif
+from season_features import CROP_FEATURES
+
+DATA_DIR = os.environ.get('HARROW_OUT_DIR', os.path.join(os.path.dirname(__file__), '..', 'public', 'data'))
+MODEL_DIR = os.path.join(
+    os.environ.get('HARROW_DATA_DIR', os.path.join(os.path.dirname(__file__), '..', 'Data')), 'models')
+
+parser = argparse.ArgumentParser(description='Analyze weather-yield correlations and build prediction models.')
+parser.add_argument('--resamples', type=int, default=10_000,
+                    help='bootstrap/permutation resamples for correlation and coefficient intervals '
+                         '(default: 10000; 0 disables)')
+parser.add_argument('--ci-level', type=float, default=0.95,
+                    help='bootstrap confidence level (default: 0.95)')
+parser.add_argument('--seed', type=int, default=0, help='random seed for resampling (default: 0)')
+parser.add_argument('--cv', action='store_true',
+                    help='also run rolling-origin, year-blocked cross-validation and write model_cv.json')
+parser.add_argument('--cv-models', default=','.join(model_cv.MODELS),
+                    help=f"comma-separated model families to cross-validate (default: {','.join(model_cv.MODELS)})")
+parser.add_argument('--cv-min-train-years', type=int, default=5,
+                    help='years in the first training window (default: 5)')
+parser.add_argument('--cv-block-years', type=int, default=1,
+                    help='years per test block (default: 1)')
+parser.add_argument('--cv-workers', type=int, default=None,
+                    help='processes for the folds (default: all CPUs; serial where the platform cannot fork)')
+parser.add_argument('--panel', action='store_true',
+                    help='also fit county-level panel models with county and year fixed effects on county '
+                         'weather (from process_weather.py --county-weather; state weather where a county has '
+                         'none) and write county_model_predictions.json and county_weather_anomalies.json')
+parser.add_argument('--model-dir', default=MODEL_DIR,
+                    help='where the fitted models are saved for whatif.py (default: Data/models)')
+instrument.add_arguments(parser)
+args = parser.parse_args()
+report = instrument.RunReport.from_args('analyze', args)
+
+cv_models = args.cv_models.split(',')
+unknown_models = set(cv_models) - set(model_cv.MODELS)
+if unknown_models:
+    parser.error(f"unknown model(s): {', '.join(sorted(unknown_models))}")
 
 # ============================================================
 # 1. Load processed data
 # ============================================================
+report.section('1. Load processed data')
 print("Loading processed data...")
 
 with open(os.path.join(DATA_DIR, 'state_yields.json')) as f:
@@ -57,14 +101,17 @@ for abbr, data in state_yields.items():
             })
 
 yield_df = pd.DataFrame(yield_records)
+report.rows(rows_out=len(yield_df) + len(weather_df))
 
 # ============================================================
 # 2. Join weather and yield data
 # ============================================================
+report.section('2. Join weather and yields', rows_in=len(yield_df) + len(weather_df))
 print("Joining weather and yield data...")
 
 merged = yield_df.merge(weather_df, on=['state', 'year'], how='inner')
 print(f"Merged records: {len(merged)}")
+report.rows(rows_out=len(merged))
 
 WEATHER_COLS = [
     'growing_season_avg_temp', 'growing_season_max_temp',
@@ -76,16 +123,38 @@ WEATHER_COLS = [
 available_cols = [c for c in WEATHER_COLS if c in merged.columns]
 print(f"Available weather features: {available_cols}")
 
+# Each crop also gets the features of its own season windows, when present
+crop_cols = {
+    crop: available_cols + [c for c in CROP_FEATURES[crop] if c in merged.columns]
+    for crop in ['corn', 'soybeans']
+}
+for crop, cols in crop_cols.items():
+    if len(cols) > len(available_cols):
+        print(f"  {crop} window features: {cols[len(available_cols):]}")
+
 # ============================================================
 # 3. Correlation analysis
 # ============================================================
+report.section('3. Correlations', rows_in=len(merged))
 print("\nRunning correlation analysis...")
 
+rng = np.random.default_rng(args.seed)
 correlations = {}
 for crop in ['corn', 'soybeans']:
-    crop_data = merged[merged['crop'] == crop].dropna(subset=available_cols + ['avg_yield'])
+    feature_cols = crop_cols[crop]
+    crop_data = merged[merged['crop'] == crop].dropna(subset=feature_cols + ['avg_yield'])
     crop_corr = {}
-    for col in available_cols:
+
+    # Bootstrap intervals and permutation p-values for all features at once
+    if args.resamples > 0:
+        X = crop_data[feature_cols].to_numpy(dtype=float)
+        y = crop_data['avg_yield'].to_numpy(dtype=float)
+        boot_r = resampling.bootstrap_pearson(X, y, resampling.resample_indices(len(y), args.resamples, rng))
+        r_lo, r_hi = resampling.percentile_ci(boot_r, args.ci_level)
+        perm_r = resampling.permutation_pearson(
+            X, y, resampling.resample_indices(len(y), args.resamples, rng, replace=False))
+
+    for i, col in enumerate(feature_cols):
         r, p = stats.pearsonr(crop_data[col], crop_data['avg_yield'])
         crop_corr[col] = {
             'r': round(float(r), 3),
@@ -94,35 +163,38 @@ for crop in ['corn', 'soybeans']:
             'direction': 'positive' if r > 0 else 'negative',
             'strength': 'strong' if abs(r) > 0.5 else 'moderate' if abs(r) > 0.3 else 'weak',
         }
+        if args.resamples > 0:
+            crop_corr[col]['r_ci'] = [round(float(r_lo[i]), 3), round(float(r_hi[i]), 3)]
+            crop_corr[col]['p_permutation'] = round(float(resampling.permutation_p_value(r, perm_r[:, i])), 4)
     correlations[crop] = crop_corr
 
-with open(os.path.join(DATA_DIR, 'correlations.json'), 'w') as f:
-    json.dump(correlations, f, indent=2)
-print("  correlations.json written")
-
 # Print summary
 for crop, corrs in correlations.items():
     print(f"\n  {crop}:")
     for feat, data in sorted(corrs.items(), key=lambda x: abs(x[1]['r']), reverse=True):
         sig = '*' if data['significant'] else ' '
-        print(f"    {feat:35s} r={data['r']:+.3f} {sig} ({data['strength']})")
+        ci = f"  {args.ci_level:.0%} CI [{data['r_ci'][0]:+.3f}, {data['r_ci'][1]:+.3f}]" if 'r_ci' in data else ''
+        print(f"    {feat:35s} r={data['r']:+.3f} {sig} ({data['strength']}){ci}")
 
 # ============================================================
 # 4. Linear Regression — feature importance from standardized coefficients
 # ============================================================
+report.section('4. Regression models', rows_in=len(merged))
 print("\nTraining Linear Regression models...")
 
 feature_importance = {}
 model_predictions = {}
+fitted_models = {}
 
 for crop in ['corn', 'soybeans']:
-    crop_data = merged[merged['crop'] == crop].dropna(subset=available_cols + ['avg_yield'])
+    feature_cols = crop_cols[crop]
+    crop_data = merged[merged['crop'] == crop].dropna(subset=feature_cols + ['avg_yield'])
 
     if len(crop_data) < 20:
         print(f"  Skipping {crop} - not enough data ({len(crop_data)} rows)")
         continue
 
-    X = crop_data[available_cols].values
+    X = crop_data[feature_cols].values
     y = crop_data['avg_yield'].values
     states = crop_data['state'].values
     years = crop_data['year'].values
@@ -155,7 +227,7 @@ for crop in ['corn', 'soybeans']:
     abs_coefs = np.abs(model.coef_)
     # Normalize to sum to 1 so they work as "importance" percentages
     total = abs_coefs.sum()
-    importances = dict(zip(available_cols, (abs_coefs / total).round(3).tolist()))
+    importances = dict(zip(feature_cols, (abs_coefs / total).round(3).tolist()))
 
     feature_importance[crop] = {
         'importances': importances,
@@ -166,8 +238,32 @@ for crop in ['corn', 'soybeans']:
         'model': 'linear_regression',
     }
 
+    fitted_models[crop] = {
+        'scaler': scaler,
+        'model': model,
+        'features': feature_cols,
+        'states': states.tolist(),
+        'years': years.astype(int).tolist(),
+        'metrics': {'r2': round(r2, 3), 'mae': round(mae, 1), 'n_train': int(len(X_train))},
+    }
+
     # Also store raw coefficients for interpretability
-    raw_coefs = dict(zip(available_cols, model.coef_.round(2).tolist()))
+    raw_coefs = dict(zip(feature_cols, model.coef_.round(2).tolist()))
+
+    # Coefficient uncertainty on the training rows, recorded with the correlations
+    if args.resamples > 0:
+        boot_coef = resampling.bootstrap_ols(
+            X_train, y_train, resampling.resample_indices(len(y_train), args.resamples, rng))
+        coef_lo, coef_hi = resampling.percentile_ci(boot_coef, args.ci_level)
+        perm_coef = resampling.permutation_ols(
+            X_train, y_train, resampling.resample_indices(len(y_train), args.resamples, rng, replace=False))
+        coef_p = resampling.permutation_p_value(model.coef_, perm_coef)
+        for i, col in enumerate(feature_cols):
+            correlations[crop][col].update({
+                'coef': raw_coefs[col],
+                'coef_ci': [round(float(coef_lo[i]), 2), round(float(coef_hi[i]), 2)],
+                'coef_p_permutation': round(float(coef_p[i]), 4),
+            })
     print(f"  Standardized coefficients (importance):")
     for feat, imp in sorted(importances.items(), key=lambda x: x[1], reverse=True):
         coef = raw_coefs[feat]
@@ -178,53 +274,226 @@ for crop in ['corn', 'soybeans']:
     all_pred = model.predict(X_scaled)
     residuals = y - all_pred
 
-    preds = []
-    for i in range(len(crop_data)):
-        row = crop_data.iloc[i]
-        preds.append({
-            'state': row['state'],
-            'year': int(row['year']),
-            'actual': round(float(y[i]), 1),
-            'predicted': round(float(all_pred[i]), 1),
-            'residual': round(float(residuals[i]), 1),
-            'is_anomaly': bool(abs(residuals[i]) > 2 * residuals.std()),
-        })
-    model_predictions[crop] = preds
+    is_anomaly = np.abs(residuals) > 2 * residuals.std()
+    # Kept as columns; the JSON rows are encoded from them in one pass
+    model_predictions[crop] = {
+        'state': states,
+        'year': years.astype(int),
+        'actual': jsonout.round_values(y, 1),
+        'predicted': jsonout.round_values(all_pred, 1),
+        'residual': jsonout.round_values(residuals, 1),
+        'is_anomaly': is_anomaly,
+    }
+
+with open(os.path.join(DATA_DIR, 'correlations.json'), 'w') as f:
+    json.dump(correlations, f, indent=2)
+print("\n  correlations.json written")
 
 with open(os.path.join(DATA_DIR, 'feature_importance.json'), 'w') as f:
     json.dump(feature_importance, f, indent=2)
-print("\n  feature_importance.json written")
+print("  feature_importance.json written")
 
 with open(os.path.join(DATA_DIR, 'model_predictions.json'), 'w') as f:
-    json.dump(model_predictions, f)
+    jsonout.dump({crop: jsonout.array(jsonout.records(cols)) for crop, cols in model_predictions.items()}, f)
 print("  model_predictions.json written")
+report.rows(rows_out=sum(len(cols['year']) for cols in model_predictions.values()))
 
 # ============================================================
-# 5. Weather-adjusted anomalies
+# 4b. Rolling-origin cross-validation (optional)
 # ============================================================
-print("\nIdentifying weather-adjusted anomalies...")
+if args.cv:
+    report.section('4b. Cross-validation', rows_in=len(merged))
+    print(f"\nCross-validating {', '.join(cv_models)} (rolling origin, "
+          f"{args.cv_block_years}-year test blocks)...")
+    cv_data = {}
+    for crop in ['corn', 'soybeans']:
+        feature_cols = crop_cols[crop]
+        crop_data = merged[merged['crop'] == crop].dropna(subset=feature_cols + ['avg_yield'])
+        if len(crop_data) >= 20:
+            cv_data[crop] = (
+                crop_data[feature_cols].to_numpy(dtype=float),
+                crop_data['avg_yield'].to_numpy(dtype=float),
+                crop_data['year'].to_numpy(),
+            )
+
+    cv_results, cv_seconds = model_cv.cross_validate(
+        cv_data, cv_models, args.cv_min_train_years, args.cv_block_years, args.cv_workers)
+    cv_summary = model_cv.summarize(cv_results)
+
+    for r in cv_results:
+        first, last = r['test_years'][0], r['test_years'][-1]
+        years_label = str(first) if first == last else f"{first}-{last}"
+        print(f"  {r['crop']:9s} {r['model']:7s} test {years_label:9s} n_train={r['n_train']:4d} "
+              f"R²={r['r2']:+.3f} MAE={r['mae']:6.2f} ({r['seconds']:.2f}s)")
+    for crop, models in cv_summary.items():
+        print(f"\n  {crop}:")
+        for name, m in models.items():
+            print(f"    {name:7s} mean R²={m['mean_r2']:+.3f} mean MAE={m['mean_mae']:.2f} "
+                  f"over {m['folds']} folds ({m['fit_seconds']:.2f}s fitting)")
+    print(f"\n  {len(cv_results)} fits in {cv_seconds:.2f}s wall time")
+
+    with open(os.path.join(DATA_DIR, 'model_cv.json'), 'w') as f:
+        json.dump({
+            'min_train_years': args.cv_min_train_years,
+            'block_years': args.cv_block_years,
+            'wall_seconds': round(cv_seconds, 2),
+            'summary': cv_summary,
+            'folds': cv_results,
+        }, f, indent=2)
+    print("  model_cv.json written")
+    report.rows(rows_out=len(cv_results))
 
-weather_anomalies = []
-for crop, preds in model_predictions.items():
-    residuals = [p['residual'] for p in preds]
-    std = np.std(residuals)
-    for p in preds:
-        if abs(p['residual']) > 1.5 * std:
-            weather_anomalies.append({
+# ============================================================
+# 4c. Saved models and what-if sensitivity
+# ============================================================
+if fitted_models:
+    report.section('4c. Model artifacts and sensitivity', rows_in=len(weather_df))
+    print("\nSaving models and scoring sensitivity scenarios...")
+    whatif.save_models(args.model_dir, fitted_models)
+    saved = whatif.ModelSet(args.model_dir, list(fitted_models))
+    for crop in saved.crops:
+        print(f"  {crop}: version {saved.info[crop]['version']} in {args.model_dir}")
+
+    baseline, baseline_years = whatif.baseline_features(weather_df, saved.features)
+    sensitivity = whatif.sensitivity_table(saved, baseline, baseline_years)
+    with open(os.path.join(DATA_DIR, 'sensitivity.json'), 'w') as f:
+        json.dump(sensitivity, f)
+    print(f"  sensitivity.json written (baseline {baseline_years[0]}-{baseline_years[-1]})")
+    report.rows(rows_out=sum(len(t['states']) for t in sensitivity.values()))
+
+# ============================================================
+# 4d. County panel models (optional)
+# ============================================================
+# County yields on county-year weather, with county and year fixed effects
+# absorbing soils, practices and nationwide shocks. A county's weather
+# comes from its own stations (county_weather_features.json); values its
+# stations do not report, or every value without that file, fall back to
+# the state-year weather.
+if args.panel:
+    report.section('4d. County panel models')
+    print("\nFitting county panel models (county and year fixed effects)...")
+    with open(os.path.join(DATA_DIR, 'county_yields.json')) as f:
+        county_yields = json.load(f)
+    county_df = pd.DataFrame([
+        {
+            'fips': fips,
+            'state': county['state_abbr'],
+            'county': county['county_name'],
+            'crop': crop,
+            'year': record['year'],
+            'yield': record['yield'],
+        }
+        for fips, county in county_yields.items()
+        for crop, records in county['crops'].items()
+        for record in records
+    ])
+    county_df = county_df.merge(weather_df, on=['state', 'year'], how='inner')
+
+    panel_cols = sorted({c for cols in crop_cols.values() for c in cols})
+    county_weather_file = os.path.join(DATA_DIR, 'county_weather_features.json')
+    if os.path.exists(county_weather_file):
+        with open(county_weather_file) as f:
+            county_weather = pd.DataFrame(json.load(f))
+        local = county_df[['fips', 'year']].merge(county_weather, on=['fips', 'year'], how='left')
+        local_cols = [c for c in panel_cols if c in local.columns]
+        from_county = local[local_cols].notna()
+        county_df[local_cols] = local[local_cols].where(from_county, county_df[local_cols])
+        share = from_county.to_numpy().sum() / (len(county_df) * len(panel_cols)) if len(county_df) else 0.0
+        print(f"  Weather: county stations for {share:.0%} of feature values, state-year weather for the rest")
+    else:
+        print("  Weather: state-year weather for every county (no county_weather_features.json; "
+              "run process_weather.py --county-weather)")
+
+    county_predictions = {}
+    county_anomalies = []
+    for crop in ['corn', 'soybeans']:
+        feature_cols = crop_cols[crop]
+        crop_data = county_df[county_df['crop'] == crop].dropna(subset=feature_cols + ['yield'])
+        keep = panel_model.drop_singletons([pd.factorize(crop_data['fips'])[0], pd.factorize(crop_data['year'])[0]])
+        crop_data = crop_data[keep]
+        if len(crop_data) < 20:
+            print(f"  Skipping {crop} - not enough data ({len(crop_data)} county-years)")
+            continue
+
+        X = crop_data[feature_cols].to_numpy(dtype=float)
+        y = crop_data['yield'].to_numpy(dtype=float)
+        counties = pd.factorize(crop_data['fips'])[0]
+        years = pd.factorize(crop_data['year'])[0]
+        model = panel_model.PanelRegression().fit(X, y, counties, years)
+        all_pred = model.predict(X, counties, years)
+        residuals = y - all_pred
+
+        print(f"\n  {crop}: {len(y):,} county-years, {model.n_counties_:,} counties × {model.n_years_} years "
+              f"({int((~keep).sum())} singletons dropped, {model.iterations} demeaning passes)")
+        print(f"  R²={r2_score(y, all_pred):.3f}, within R²={model.within_r2_:.3f}, "
+              f"MAE={mean_absolute_error(y, all_pred):.1f} bu/acre")
+        for feat, coef in zip(feature_cols, model.coef_.tolist()):
+            print(f"    {feat:35s} coef={coef:+.3f} bu/acre per unit")
+
+        is_anomaly = np.abs(residuals) > 2 * residuals.std()
+        cols = {
+            'fips': crop_data['fips'].to_numpy(),
+            'state': crop_data['state'].to_numpy(),
+            'county': crop_data['county'].to_numpy(),
+            'year': crop_data['year'].to_numpy(dtype=int),
+            'actual': jsonout.round_values(y, 1),
+            'predicted': jsonout.round_values(all_pred, 1),
+            'residual': jsonout.round_values(residuals, 1),
+            'is_anomaly': is_anomaly,
+        }
+        county_predictions[crop] = cols
+
+        # Same rule as the state-level weather-adjusted anomalies; only flagged rows become dicts
+        flagged = np.flatnonzero(np.abs(cols['residual']) > 1.5 * np.std(cols['residual']))
+        for values in zip(*(cols[k][flagged].tolist() for k in cols)):
+            p = dict(zip(cols, values))
+            county_anomalies.append({
                 'crop': crop,
-                'state': p['state'],
-                'year': p['year'],
-                'actual': p['actual'],
-                'predicted': p['predicted'],
-                'residual': p['residual'],
+                **{k: p[k] for k in ('fips', 'state', 'county', 'year', 'actual', 'predicted', 'residual')},
                 'type': 'overperformed' if p['residual'] > 0 else 'underperformed',
-                'description': f"{p['state']} {crop} in {p['year']}: yielded {p['actual']} bu/acre vs {p['predicted']} predicted ({p['residual']:+.1f} deviation)"
+                'description': f"{p['county']}, {p['state']} {crop} in {p['year']}: yielded {p['actual']} "
+                               f"bu/acre vs {p['predicted']} predicted ({p['residual']:+.1f} deviation)"
             })
 
+    county_anomalies.sort(key=lambda x: abs(x['residual']), reverse=True)
+
+    with open(os.path.join(DATA_DIR, 'county_model_predictions.json'), 'w') as f:
+        jsonout.dump({crop: jsonout.array(jsonout.records(cols)) for crop, cols in county_predictions.items()}, f)
+    print("\n  county_model_predictions.json written")
+    with open(os.path.join(DATA_DIR, 'county_weather_anomalies.json'), 'w') as f:
+        json.dump(county_anomalies, f, indent=2)
+    print(f"  county_weather_anomalies.json: {len(county_anomalies)} anomalies")
+    report.rows(rows_out=sum(len(cols['year']) for cols in county_predictions.values()))
+
+# ============================================================
+# 5. Weather-adjusted anomalies
+# ============================================================
+report.section('5. Weather-adjusted anomalies', rows_in=sum(len(cols['year']) for cols in model_predictions.values()))
+print("\nIdentifying weather-adjusted anomalies...")
+
+weather_anomalies = []
+for crop, cols in model_predictions.items():
+    flagged = np.flatnonzero(np.abs(cols['residual']) > 1.5 * np.std(cols['residual']))
+    for values in zip(*(cols[k][flagged].tolist() for k in cols)):
+        p = dict(zip(cols, values))
+        weather_anomalies.append({
+            'crop': crop,
+            'state': p['state'],
+            'year': p['year'],
+            'actual': p['actual'],
+            'predicted': p['predicted'],
+            'residual': p['residual'],
+            'type': 'overperformed' if p['residual'] > 0 else 'underperformed',
+            'description': f"{p['state']} {crop} in {p['year']}: yielded {p['actual']} bu/acre vs {p['predicted']} predicted ({p['residual']:+.1f} deviation)"
+        })
+
 weather_anomalies.sort(key=lambda x: abs(x['residual']), reverse=True)
 
 with open(os.path.join(DATA_DIR, 'weather_anomalies.json'), 'w') as f:
     json.dump(weather_anomalies, f, indent=2)
 print(f"  weather_anomalies.json: {len(weather_anomalies)} anomalies")
 
+report.rows(rows_out=len(weather_anomalies))
+
 print("\nAnalysis complete!")
+report.finish()
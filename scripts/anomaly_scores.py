@@ -0,0 +1,118 @@
+"""
+Vectorized county yield anomaly scoring.
+Scores every row against its (county, crop) group in one pass, with a
+choice of baseline: classic z-score, robust median/MAD z-score, or a
+z-score of the residual from the group's linear yield trend.
+"""
+
+import numpy as np
+
+MODES = ('zscore', 'robust', 'detrended')
+
+# Statistic each mode scores against, as named in the outputs
+BASELINES = {'zscore': 'mean', 'robust': 'median', 'detrended': 'trend'}
+
+# Scales the MAD to a standard deviation for normally distributed data
+MAD_TO_STD = 1.4826
+
+
+def group_rows(frame, keys):
+    """Row positions grouped by ``keys`` (sorted), keeping file order in each group.
+
+    Returns (order, starts, counts).
+    """
+    order = np.lexsort([frame[k].to_numpy() for k in reversed(keys)])
+    change = np.zeros(len(order), dtype=bool)
+    change[:1] = True
+    for k in keys:
+        col = frame[k].to_numpy()[order]
+        change[1:] |= col[1:] != col[:-1]
+    starts = np.flatnonzero(change)
+    counts = np.diff(np.append(starts, len(order)))
+    return order, starts, counts
+
+
+def group_sums(values, starts, counts):
+    """Per-group sums, each group added pairwise like Series.sum()/mean().
+
+    np.add.reduceat adds sequentially, which can differ from pandas in the
+    last bit; a group's mean then rounds to the other side of a tie.
+    """
+    return np.array([np.add.reduce(values[start:start + count])
+                     for start, count in zip(starts.tolist(), counts.tolist())], dtype=float)
+
+
+def group_mean_std(values, starts, counts):
+    """Per-group mean and sample std, with the same arithmetic as Series.mean()/std()."""
+    means = group_sums(values, starts, counts) / counts
+    sq_dev = (np.repeat(means, counts) - values) ** 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stds = np.sqrt(group_sums(sq_dev, starts, counts) / (counts - 1))
+    return means, stds
+
+
+def group_median(values, starts, counts):
+    """Per-group median from one (group, value) sort."""
+    group_ids = np.repeat(np.arange(len(starts)), counts)
+    ordered = values[np.lexsort((values, group_ids))]
+    lo = ordered[starts + (counts - 1) // 2]
+    hi = ordered[starts + counts // 2]
+    return (lo + hi) / 2
+
+
+def group_trend(values, years, starts, counts):
+    """Per-row fitted value of each group's least-squares line over years."""
+    x_mean = np.repeat(np.add.reduceat(years, starts) / counts, counts)
+    y_mean = np.repeat(np.add.reduceat(values, starts) / counts, counts)
+    x_dev = years - x_mean
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = np.add.reduceat(x_dev * (values - y_mean), starts) / np.add.reduceat(x_dev ** 2, starts)
+    return y_mean + np.repeat(slope, counts) * x_dev
+
+
+def score(values, years, starts, counts, mode='zscore'):
+    """Anomaly score and baseline for every row of grouped ``values``.
+
+    Rows must be contiguous per group (see ``group_rows``). Groups whose
+    spread is zero or undefined get NaN scores and are never flagged.
+    """
+    if mode == 'zscore':
+        means, stds = group_mean_std(values, starts, counts)
+        baseline = np.repeat(means, counts)
+        spread = np.repeat(stds, counts)
+    elif mode == 'robust':
+        medians = group_median(values, starts, counts)
+        baseline = np.repeat(medians, counts)
+        mad = group_median(np.abs(values - baseline), starts, counts)
+        spread = np.repeat(mad * MAD_TO_STD, counts)
+    elif mode == 'detrended':
+        baseline = group_trend(values, years, starts, counts)
+        # Two fitted parameters per group
+        with np.errstate(invalid='ignore', divide='ignore'):
+            resid_var = np.add.reduceat((values - baseline) ** 2, starts) / (counts - 2)
+        spread = np.repeat(np.sqrt(np.where(counts > 2, resid_var, np.nan)), counts)
+    else:
+        raise ValueError(f"Unknown anomaly mode {mode!r}; expected one of {MODES}")
+
+    valid = (spread != 0) & ~np.isnan(spread)
+    scores = np.full(len(values), np.nan)
+    scores[valid] = (values[valid] - baseline[valid]) / spread[valid]
+    return scores, baseline
+
+
+def top_k(keys, k=None):
+    """Positions of the ``k`` smallest ``keys`` in stable ascending order.
+
+    Uses a partial partition, so only the selected rows are fully sorted;
+    ties at the cut-off keep the earliest positions, exactly like slicing
+    a stable full sort.
+    """
+    if k is None or k >= len(keys):
+        return np.argsort(keys, kind='stable')
+    if k <= 0:
+        return np.array([], dtype=np.intp)
+    kth = np.partition(keys, k - 1)[k - 1]
+    better = np.flatnonzero(keys < kth)
+    ties = np.flatnonzero(keys == kth)[:k - len(better)]
+    chosen = np.sort(np.concatenate([better, ties]))
+    return chosen[np.argsort(keys[chosen], kind='stable')]
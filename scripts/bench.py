@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the data pipeline.
+Usage: python3 scripts/bench.py runlength [--stations N] [--years N]
+       python3 scripts/bench.py dtypes [--stations N] [--days N]
+       python3 scripts/bench.py spatial [--stations N] [--counties PATH]
+       python3 scripts/bench.py outputs [--data-dir DIR]
+       python3 scripts/bench.py stages [--stations N] [--counties N] [--scales 1,2,4] [--json PATH]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import brotli
+except ImportError:  # optional: br sizes are skipped without it
+    brotli = None
+
+import columnar
+from ghcn_ingest import filter_chunk
+from runlength import grouped_runs
+from spatial_index import CountyIndex, load_counties
+from synth_data import parse_years, write_ghcn, write_rma
+from weather_metrics import pivot_daily
+
+
+def timed(fn, repeat=3):
+    """Best-of-``repeat`` wall time of ``fn()`` in seconds, plus its result."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+# ============================================================
+# Run-length engine vs. the per-station Python loop
+# ============================================================
+def synthetic_growing_season(n_stations, n_years, seed=0):
+    """Daily PRCP/TMAX rows for April-September, shaped like `growing`."""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range('2010-04-01', '2010-09-30')
+    frames = []
+    for year in range(2010, 2010 + n_years):
+        dates = days + pd.DateOffset(years=year - 2010)
+        n = n_stations * len(dates)
+        frames.append(pd.DataFrame({
+            'station': np.repeat([f'US{i:09d}' for i in range(n_stations)], len(dates)),
+            'state': np.repeat([f'S{i % 30:02d}' for i in range(n_stations)], len(dates)),
+            'date': np.tile(dates, n_stations),
+            'year': year,
+            'PRCP': np.where(rng.random(n) < 0.3, rng.exponential(8.0, n), 0.0),
+            'TMAX': rng.normal(30.0, 5.0, n),
+        }))
+    # Shuffle so both paths pay for sorting, as they do on real data
+    growing = pd.concat(frames, ignore_index=True)
+    return growing.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def dry_spells_loop(growing):
+    """The original nested groupby + `for p in prcp` implementation."""
+    result = {}
+    for (state, year), group in growing.groupby(['state', 'year']):
+        dry_spells = []
+        for station, sgroup in group.groupby('station'):
+            prcp = sgroup.sort_values('date')['PRCP'].values
+            max_spell = 0
+            current = 0
+            for p in prcp:
+                if p < 1.0:
+                    current += 1
+                    max_spell = max(max_spell, current)
+                else:
+                    current = 0
+            dry_spells.append(max_spell)
+        result[(state, year)] = round(np.mean(dry_spells), 1)
+    return result
+
+
+def dry_spells_vectorized(growing):
+    spells = grouped_runs(
+        growing, ['state', 'year', 'station'], 'date',
+        {'dry': growing['PRCP'] < 1.0},
+    )
+    means = spells.groupby(level=['state', 'year'])['dry_longest'].mean()
+    return {key: round(value, 1) for key, value in means.items()}
+
+
+def all_spells_vectorized(growing):
+    return grouped_runs(
+        growing, ['state', 'year', 'station'], 'date',
+        {
+            'dry': growing['PRCP'] < 1.0,
+            'wet': growing['PRCP'] >= 1.0,
+            'heat': growing['TMAX'] > 35,
+        },
+        min_length=3,
+    )
+
+
+def bench_runlength(args):
+    growing = synthetic_growing_season(args.stations, args.years)
+    print(f"Station-seasons: {args.stations * args.years:,}, daily rows: {len(growing):,}")
+
+    loop_time, expected = timed(lambda: dry_spells_loop(growing), repeat=1)
+    vec_time, actual = timed(lambda: dry_spells_vectorized(growing))
+    all_time, _ = timed(lambda: all_spells_vectorized(growing))
+    coded = growing.astype({'station': 'category', 'state': 'category'})
+    coded_time, _ = timed(lambda: all_spells_vectorized(coded))
+
+    if actual != expected:
+        raise SystemExit("Mismatch between loop and vectorized dry spells!")
+
+    print(f"  python loop (dry only):       {loop_time:8.3f}s")
+    print(f"  run-length engine (dry only): {vec_time:8.3f}s  ({loop_time / vec_time:.0f}x)")
+    print(f"  run-length engine (dry/wet/heat): {all_time:8.3f}s")
+    print(f"  run-length engine (dry/wet/heat, categorical keys): {coded_time:8.3f}s")
+
+
+# ============================================================
+# Daily table layout: object/float64/datetime vs. compact codes
+# ============================================================
+def synthetic_ghcn_rows(n_stations, n_days, seed=0):
+    """Raw GHCN rows as read_csv returns them (station, YYYYMMDD, element, value)."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2012-01-01', periods=n_days)
+    stations = [f'USC{i:08d}' for i in range(n_stations)]
+    n = n_stations * n_days
+    frames = []
+    for element, values in (
+        ('PRCP', np.where(rng.random(n) < 0.3, rng.exponential(80.0, n), 0.0).round()),
+        ('TMAX', rng.normal(250.0, 60.0, n).round()),
+        ('TMIN', rng.normal(120.0, 60.0, n).round()),
+    ):
+        frames.append(pd.DataFrame({
+            'station': np.repeat(stations, n_days),
+            'date': np.tile(dates.strftime('%Y%m%d').astype(int), n_stations).astype(np.int32),
+            'element': element,
+            'value': values,
+            'q_flag': np.nan,
+        }))
+    raw = pd.concat(frames, ignore_index=True)
+    state_map = {station: f'S{i % 30:02d}' for i, station in enumerate(stations)}
+    return raw, state_map
+
+
+def legacy_daily_table(raw, state_map):
+    """The original layout: string keys, float64 values, datetime64 date + month."""
+    daily = raw[['station', 'date', 'element', 'value']].copy()
+    daily['station'] = daily['station'].astype(object)
+    daily['element'] = daily['element'].astype(object)
+    daily['state'] = daily['station'].map(state_map).astype(object)
+    daily['date'] = pd.to_datetime(daily['date'].astype(str), format='%Y%m%d')
+    daily['month'] = daily['date'].dt.month
+    return daily[['station', 'state', 'date', 'month', 'element', 'value']]
+
+
+def compact_daily_table(raw, state_map):
+    daily = filter_chunk(raw, set(state_map))
+    daily.insert(1, 'state', daily['station'].map(state_map).astype('category'))
+    return daily
+
+
+def legacy_pivot(daily):
+    return daily.pivot_table(
+        index=['station', 'state', 'date', 'month'],
+        columns='element', values='value', aggfunc='mean',
+    ).reset_index()
+
+
+def bench_dtypes(args):
+    raw, state_map = synthetic_ghcn_rows(args.stations, args.days)
+    legacy = legacy_daily_table(raw, state_map)
+    compact = compact_daily_table(raw, state_map)
+    print(f"Daily rows: {len(raw):,} ({args.stations:,} stations x {args.days} days x 3 elements)")
+
+    legacy_mb = legacy.memory_usage(deep=True).sum() / 1e6
+    compact_mb = compact.memory_usage(deep=True).sum() / 1e6
+    print("\nMemory (deep):")
+    print(f"  legacy  {legacy_mb:10.1f} MB  {dict(legacy.dtypes.astype(str))}")
+    print(f"  compact {compact_mb:10.1f} MB  {dict(compact.dtypes.astype(str))}")
+    print(f"  reduction: {legacy_mb / compact_mb:.1f}x")
+
+    legacy_pivot_time, _ = timed(lambda: legacy_pivot(legacy), repeat=1)
+    compact_pivot_time, _ = timed(lambda: pivot_daily(compact), repeat=1)
+    legacy_group_time, _ = timed(lambda: legacy.groupby(['state', 'month', 'element'])['value'].mean())
+    compact_group_time, _ = timed(
+        lambda: compact.groupby(['state', 'month', 'element'], observed=True)['value'].mean())
+
+    print("\nTimings:")
+    print(f"  pivot   legacy {legacy_pivot_time:7.3f}s  compact {compact_pivot_time:7.3f}s"
+          f"  ({legacy_pivot_time / compact_pivot_time:.1f}x)")
+    print(f"  groupby legacy {legacy_group_time:7.3f}s  compact {compact_group_time:7.3f}s"
+          f"  ({legacy_group_time / compact_group_time:.1f}x)")
+
+
+# ============================================================
+# Station-to-county join: grid index vs. brute force
+# ============================================================
+def synthetic_topology(nx=60, ny=50, points_per_arc=40, seed=0):
+    """Quantized TopoJSON of nx*ny wobbly quadrilateral "counties" over the CONUS box."""
+    rng = np.random.default_rng(seed)
+    gx = np.linspace(-125, -67, nx + 1)
+    gy = np.linspace(25, 49, ny + 1)
+    vx, vy = np.meshgrid(gx, gy, indexing='ij')
+    jitter = 0.3 * (gx[1] - gx[0])
+    vx[1:-1, 1:-1] += rng.uniform(-jitter, jitter, (nx - 1, ny - 1))
+    vy[1:-1, 1:-1] += rng.uniform(-jitter, jitter, (nx - 1, ny - 1))
+
+    scale = [1e-4, 1e-4]
+    translate = [-126.0, 24.0]
+    t = np.linspace(0, 1, points_per_arc)
+    arcs, arc_id = [], {}
+
+    def add_arc(a, b):
+        (x0, y0), (x1, y1) = a, b
+        wobble = 0.05 * np.sin(np.pi * t * rng.integers(1, 4)) * rng.choice([-1, 1])
+        xs = x0 + (x1 - x0) * t - (y1 - y0) * wobble
+        ys = y0 + (y1 - y0) * t + (x1 - x0) * wobble
+        q = np.round((np.column_stack([xs, ys]) - translate) / scale).astype(int)
+        arcs.append(np.vstack([q[:1], np.diff(q, axis=0)]).tolist())
+        return len(arcs) - 1
+
+    for i in range(nx + 1):
+        for j in range(ny + 1):
+            if i < nx:
+                arc_id['h', i, j] = add_arc((vx[i, j], vy[i, j]), (vx[i + 1, j], vy[i + 1, j]))
+            if j < ny:
+                arc_id['v', i, j] = add_arc((vx[i, j], vy[i, j]), (vx[i, j + 1], vy[i, j + 1]))
+
+    geometries = [
+        {'type': 'Polygon', 'id': f'{i * ny + j + 1001:05d}',
+         'arcs': [[arc_id['h', i, j], arc_id['v', i + 1, j], ~arc_id['h', i, j + 1], ~arc_id['v', i, j]]]}
+        for i in range(nx) for j in range(ny)
+    ]
+    return {
+        'type': 'Topology',
+        'transform': {'scale': scale, 'translate': translate},
+        'objects': {'counties': {'type': 'GeometryCollection', 'geometries': geometries}},
+        'arcs': arcs,
+    }
+
+
+def brute_force_locate(index, lon, lat):
+    """Test every station against every county polygon."""
+    result = np.full(len(lon), -1)
+    for county in range(len(index.fips)):
+        todo = np.flatnonzero(result < 0)
+        edges = index.edges[index.edge_starts[county]:index.edge_starts[county + 1]]
+        hit = index._contains(edges, lon[todo], lat[todo])
+        result[todo[hit]] = county
+    return result
+
+
+def bench_spatial(args):
+    if args.counties:
+        counties_path = args.counties
+    else:
+        fd, counties_path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(synthetic_topology(), f)
+
+    try:
+        load_time, counties = timed(lambda: load_counties(counties_path), repeat=1)
+    finally:
+        if not args.counties:
+            os.remove(counties_path)
+    build_time, index = timed(lambda: CountyIndex(counties))
+    n_edges = len(index.edges)
+    print(f"Counties: {len(index.fips):,}, edges: {n_edges:,}, grid: {index.shape[0]} x {index.shape[1]}")
+
+    rng = np.random.default_rng(0)
+    lon = rng.uniform(index.bbox[:, 0].min(), index.bbox[:, 2].max(), args.stations)
+    lat = rng.uniform(index.bbox[:, 1].min(), index.bbox[:, 3].max(), args.stations)
+
+    grid_time, found = timed(lambda: index.locate(lon, lat))
+    sample = slice(0, min(args.stations, args.brute_force_sample))
+    brute_time, expected = timed(lambda: brute_force_locate(index, lon[sample], lat[sample]), repeat=1)
+    if not np.array_equal(found[sample], expected):
+        raise SystemExit("Mismatch between grid index and brute force!")
+
+    brute_rate = brute_time / len(expected)
+    print(f"  load boundaries: {load_time:8.3f}s")
+    print(f"  build grid:      {build_time:8.3f}s")
+    print(f"  grid locate:     {grid_time:8.3f}s for {args.stations:,} stations "
+          f"({(found >= 0).mean():.1%} assigned)")
+    print(f"  brute force:     {brute_time:8.3f}s for {len(expected):,} stations "
+          f"(~{brute_rate * args.stations:.1f}s extrapolated, {brute_rate * args.stations / grid_time:.0f}x)")
+
+
+# ============================================================
+# Frontend payloads: arrays of objects vs. columnar
+# ============================================================
+NODE_PARSE = """
+const fs = require('fs');
+const text = fs.readFileSync(0, 'utf8');
+let best = Infinity;
+for (let i = 0; i < 5; i++) {
+  const start = process.hrtime.bigint();
+  JSON.parse(text);
+  best = Math.min(best, Number(process.hrtime.bigint() - start) / 1e9);
+}
+console.log(best);
+"""
+
+
+def node_parse_time(text):
+    """Best-of-5 JSON.parse time in Node, or None if node is not installed."""
+    if shutil.which('node') is None:
+        return None
+    result = subprocess.run(['node', '-e', NODE_PARSE], input=text, capture_output=True, text=True, check=True)
+    return float(result.stdout)
+
+
+def bench_outputs(args):
+    with open(os.path.join(args.data_dir, 'county_yields.json')) as f:
+        county_yields = json.load(f)
+    with open(os.path.join(args.data_dir, 'yield_anomalies.json')) as f:
+        anomalies = json.load(f)
+
+    payloads = {
+        'county_yields': (
+            json.dumps(county_yields),
+            json.dumps(columnar.county_yields_columnar(county_yields), separators=(',', ':')),
+        ),
+        'yield_anomalies': (
+            json.dumps(anomalies),
+            json.dumps(columnar.records_columnar(
+                anomalies, dictionary_columns=('fips', 'state_abbr', 'county', 'crop', 'type')),
+                separators=(',', ':')),
+        ),
+    }
+
+    print(f"{'file':18s} {'layout':9s} {'raw KB':>9s} {'gz KB':>8s} {'br KB':>8s} {'py parse':>9s} {'node parse':>11s}")
+    for name, texts in payloads.items():
+        for layout, text in zip(('rows', 'columnar'), texts):
+            data = text.encode()
+            gz = len(gzip.compress(data, compresslevel=9, mtime=0))
+            br = len(brotli.compress(data, quality=11)) if brotli else None
+            py_time, _ = timed(lambda: json.loads(text), repeat=5)
+            node_time = node_parse_time(text)
+            print(f"{name:18s} {layout:9s} {len(data) / 1024:9.1f} {gz / 1024:8.1f} "
+                  f"{br / 1024 if br else float('nan'):8.1f} {py_time * 1000:7.1f}ms "
+                  + (f"{node_time * 1000:9.1f}ms" if node_time is not None else f"{'n/a':>11s}"))
+    if brotli is None:
+        print("(brotli not installed: br sizes skipped)")
+
+
+# ============================================================
+# Pipeline stages on synthetic inputs
+# ============================================================
+STAGE_SCRIPTS = [
+    ('yields', 'process_yields.py'),
+    ('weather', 'process_weather.py'),
+    ('analyze', 'analyze.py'),
+]
+
+
+# Runs a script in-process and records its own peak RSS (VmHWM) at exit;
+# ru_maxrss would include the benchmark process it was forked from
+MEASURED_RUN = """
+import atexit, os, runpy, sys
+rss_file, script = sys.argv[1], sys.argv[2]
+
+def report():
+    with open('/proc/self/status') as f:
+        peak_kb = next(line.split()[1] for line in f if line.startswith('VmHWM'))
+    with open(rss_file, 'w') as out:
+        out.write(peak_kb)
+
+atexit.register(report)
+sys.argv = sys.argv[2:]
+sys.path.insert(0, os.path.dirname(script))
+runpy.run_path(script, run_name='__main__')
+"""
+
+
+def run_measured(script, args, env):
+    """Run a script; returns (wall s, cpu s, peak RSS MB) of its main process."""
+    with tempfile.NamedTemporaryFile(suffix='.rss') as rss_file:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, '-c', MEASURED_RUN, rss_file.name, script, *args],
+                                env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        stderr = proc.stderr.read().decode()
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+        if os.waitstatus_to_exitcode(status) != 0:
+            raise SystemExit(f"{script} failed:\n{stderr}")
+        peak_mb = int(open(rss_file.name).read()) / 1024
+    return wall, usage.ru_utime + usage.ru_stime, peak_mb
+
+
+def bench_stages(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix='harrow-bench-')
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    try:
+        for scale in [int(s) for s in args.scales.split(',')]:
+            data_dir = os.path.join(workdir, f'scale{scale}', 'Data')
+            out_dir = os.path.join(workdir, f'scale{scale}', 'out')
+            os.makedirs(data_dir, exist_ok=True)
+            os.makedirs(out_dir, exist_ok=True)
+
+            stations, counties = args.stations * scale, args.counties * scale
+            start = time.perf_counter()
+            rma_rows = write_rma(data_dir, counties, parse_years('2010-2024'), args.seed)
+            ghcn_rows = sum(write_ghcn(data_dir, stations, parse_years(args.ghcn_years), args.seed).values())
+            print(f"\nScale {scale}: {counties:,} counties ({rma_rows:,} RMA rows), {stations:,} stations "
+                  f"({ghcn_rows:,} GHCN rows); generated in {time.perf_counter() - start:.1f}s")
+
+            env = {**os.environ, 'HARROW_DATA_DIR': data_dir, 'HARROW_OUT_DIR': out_dir}
+            for stage, script in STAGE_SCRIPTS:
+                extra = args.weather_args.split() if stage == 'weather' else []
+                if stage == 'weather':
+                    extra += ['--no-cache']
+                wall, cpu, rss = run_measured(os.path.join(scripts_dir, script), extra, env)
+                rows = rma_rows if stage == 'yields' else ghcn_rows if stage == 'weather' else None
+                results.append({'scale': scale, 'stage': stage, 'input_rows': rows,
+                                'wall_seconds': round(wall, 3), 'cpu_seconds': round(cpu, 3),
+                                'peak_rss_mb': round(rss, 1)})
+                rate = f"{rows / wall:12,.0f} rows/s" if rows else ''
+                print(f"  {stage:8s} wall {wall:8.2f}s  cpu {cpu:8.2f}s  peak RSS {rss:8.1f} MB  {rate}")
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'stations': args.stations, 'counties': args.counties, 'ghcn_years': args.ghcn_years,
+                       'weather_args': args.weather_args, 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest='bench', required=True)
+
+    p = sub.add_parser('runlength', help='dry-spell loop vs. vectorized run-length engine')
+    p.add_argument('--stations', type=int, default=500)
+    p.add_argument('--years', type=int, default=3)
+    p.set_defaults(func=bench_runlength)
+
+    p = sub.add_parser('dtypes', help='memory and groupby cost of legacy vs. compact daily table')
+    p.add_argument('--stations', type=int, default=2000)
+    p.add_argument('--days', type=int, default=365)
+    p.set_defaults(func=bench_dtypes)
+
+    p = sub.add_parser('spatial', help='station-to-county join: grid index vs. brute force')
+    p.add_argument('--stations', type=int, default=40_000)
+    p.add_argument('--counties', help='GeoJSON/TopoJSON county boundaries (default: synthetic grid)')
+    p.add_argument('--brute-force-sample', type=int, default=2000,
+                   help='stations checked against brute force (default: 2000)')
+    p.set_defaults(func=bench_spatial)
+
+    p = sub.add_parser('outputs', help='size and parse time of row vs. columnar frontend payloads')
+    p.add_argument('--data-dir', default=os.path.join(os.path.dirname(__file__), '..', 'public', 'data'))
+    p.set_defaults(func=bench_outputs)
+
+    p = sub.add_parser('stages', help='time and memory of each pipeline script on synthetic inputs')
+    p.add_argument('--stations', type=int, default=500, help='GHCN stations at scale 1 (default: 500)')
+    p.add_argument('--counties', type=int, default=1300, help='RMA counties at scale 1 (default: 1300)')
+    p.add_argument('--ghcn-years', default='2023-2024', help='years of daily files (default: 2023-2024)')
+    p.add_argument('--scales', default='1', help='comma-separated multipliers of stations/counties (default: 1)')
+    p.add_argument('--weather-args', default='', help='extra process_weather.py arguments, e.g. "--streaming"')
+    p.add_argument('--workdir', help='keep generated data and outputs here (default: temporary)')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--json', help='also write results as JSON (for tracking regressions)')
+    p.set_defaults(func=bench_stages)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
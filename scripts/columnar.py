@@ -0,0 +1,76 @@
+"""
+Struct-of-arrays ("columnar") layout for the large frontend datasets.
+Columnar files state every key once and dictionary-encode repeated
+strings (FIPS, state, crop), so they are smaller and faster to parse
+than arrays of objects. src/utils/columnar.js decodes them back into
+the row shape the components use.
+"""
+
+import json
+
+FORMAT = 'columnar-v1'
+
+
+def encode_column(values):
+    """(codes, dictionary) for a column of repeated values, in first-seen order."""
+    dictionary = {}
+    codes = [dictionary.setdefault(v, len(dictionary)) for v in values]
+    return codes, list(dictionary)
+
+
+def records_columnar(records, dictionary_columns=()):
+    """Columnar form of a list of flat records with the same keys.
+
+    ``dictionary_columns`` are stored as integer codes into a per-column
+    dictionary; every other column is a plain array.
+    """
+    keys = list(records[0]) if records else []
+    return columns_columnar({key: [r[key] for r in records] for key in keys}, len(records), dictionary_columns)
+
+
+def columns_columnar(columns, length, dictionary_columns=()):
+    """Columnar form of equal-length columns ({key: list}), as records_columnar builds it."""
+    encoded, dictionaries = {}, {}
+    for key, values in columns.items():
+        if key in dictionary_columns:
+            values, dictionaries[key] = encode_column(values)
+        encoded[key] = values
+    return {'format': FORMAT, 'length': length, 'columns': encoded, 'dictionaries': dictionaries}
+
+
+def county_yields_columnar(county_yields):
+    """Columnar form of county_yields.json ({fips: {meta..., crops: {crop: [points]}}}).
+
+    ``counties`` holds one row per county. ``series`` holds one row per
+    (county, crop) series, with ``offset``/``length`` slicing the flat
+    ``year``/``yield`` arrays.
+    """
+    counties = [
+        {'fips': fips, **{k: v for k, v in county.items() if k != 'crops'}}
+        for fips, county in county_yields.items()
+    ]
+    series = {'county': [], 'crop': [], 'offset': [], 'length': []}
+    years, yields, crops = [], [], []
+    for i, county in enumerate(county_yields.values()):
+        for crop, points in county['crops'].items():
+            series['county'].append(i)
+            series['crop'].append(crop)
+            series['offset'].append(len(years))
+            series['length'].append(len(points))
+            years.extend(p['year'] for p in points)
+            yields.extend(p['yield'] for p in points)
+    series['crop'], crops = encode_column(series['crop'])
+
+    return {
+        'format': FORMAT,
+        'counties': records_columnar(counties, dictionary_columns=('state_abbr', 'state_name')),
+        'series': {'length': len(series['county']), 'columns': series, 'dictionaries': {'crop': crops}},
+        'year': years,
+        'yield': yields,
+    }
+
+
+def write_json(path, data):
+    """Compact JSON, as the frontend files are written."""
+    with open(path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
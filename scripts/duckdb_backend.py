@@ -0,0 +1,181 @@
+"""
+DuckDB execution backend for the heavy scans (--backend duckdb).
+The raw GHCN CSVs are filtered and pivoted to one row per station-day, and
+the RMA CSV is parsed once into a DuckDB table and reduced to the state ×
+crop × year cube, as SQL in an embedded DuckDB: multi-threaded, and
+spilling to disk instead of holding the raw rows in RAM. Results come back
+with the same columns, dtypes and row order as the pandas path, so every
+downstream step, and therefore every JSON output, is unchanged.
+
+The backend is partial for the yields: the county series and anomaly
+scores write every county row, so they still run in pandas on the cleaned
+rows DuckDB hands back (in place of pandas' own read of the CSV).
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from ghcn_ingest import ELEMENTS, GHCN_COLUMNS
+
+try:
+    import duckdb
+except ImportError:  # optional: only needed for --backend duckdb
+    duckdb = None
+
+BACKENDS = ['pandas', 'duckdb']
+
+
+def add_arguments(parser, data_dir):
+    """Register --backend and the DuckDB resource limits on a script's parser."""
+    parser.add_argument('--backend', choices=BACKENDS, default='pandas',
+                        help='engine for the raw-data scans (default: pandas; duckdb needs the duckdb package '
+                             'and reads and aggregates the yields, but county series and anomalies stay in pandas)')
+    parser.add_argument('--duckdb-memory-limit', metavar='SIZE',
+                        help="memory cap for DuckDB before it spills to disk, e.g. '4GB' (default: DuckDB's)")
+    parser.add_argument('--duckdb-threads', type=int, help='DuckDB worker threads (default: all CPUs)')
+    parser.add_argument('--duckdb-temp-dir', default=os.path.join(data_dir, 'duckdb_tmp'),
+                        help='where DuckDB spills intermediate results (default: Data/duckdb_tmp)')
+
+
+def _literal(value):
+    """SQL string literal of ``value``, for SET statements (they take no bound parameters)."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def connect(args):
+    """An in-memory DuckDB connection configured from the parsed arguments."""
+    if duckdb is None:
+        raise SystemExit("--backend duckdb needs the duckdb package (pip install duckdb)")
+    con = duckdb.connect()
+    con.execute(f"SET temp_directory = {_literal(args.duckdb_temp_dir)}")
+    if args.duckdb_memory_limit:
+        con.execute(f"SET memory_limit = {_literal(args.duckdb_memory_limit)}")
+    if args.duckdb_threads:
+        con.execute(f"SET threads = {int(args.duckdb_threads)}")
+    # Keep input order where the SQL does not impose one
+    con.execute("SET preserve_insertion_order = true")
+    return con
+
+
+# ============================================================
+# GHCN-Daily
+# ============================================================
+def _ghcn_source():
+    """read_csv over the file list bound to ``$files``."""
+    columns = ', '.join(f"'{c}': 'VARCHAR'" for c in GHCN_COLUMNS)
+    return f"read_csv($files, header = false, columns = {{{columns}}}, quote = '', escape = '')"
+
+
+def read_pivoted(con, paths, stations, state_dtype):
+    """Pivoted daily rows of the GHCN files in ``paths``, as ``pivot_daily`` returns them.
+
+    ``stations`` has one row per station id in station category order, with
+    its state. Duplicate station-days are averaged in tenths before the unit
+    conversion, exactly like the pandas pivot.
+    """
+    codes = pd.DataFrame({
+        'station_id': stations['station_id'].to_numpy(),
+        'station_code': np.arange(len(stations), dtype=np.int32),
+        'state_code': state_dtype.categories.get_indexer(stations['state']).astype(np.int32),
+    })
+    con.register('station_codes', codes)
+    elements = ', '.join(f"'{e}'" for e in sorted(ELEMENTS))
+    try:
+        pivoted = con.execute(f"""
+            WITH kept AS (
+                SELECT s.station_code, s.state_code, r.date // 10000 AS year, r.date // 100 % 100 AS month,
+                       dayofyear(make_date(r.date // 10000, r.date // 100 % 100, r.date % 100)) AS doy,
+                       r.element, CAST(r.value AS INTEGER) AS value
+                FROM (
+                    SELECT station, CAST(date AS INTEGER) AS date, element, value, q_flag
+                    FROM {_ghcn_source()}
+                ) r
+                JOIN station_codes s ON r.station = s.station_id
+                WHERE r.element IN ({elements}) AND coalesce(r.q_flag, '') = ''
+            )
+            SELECT station_code, state_code, year, doy, month,
+                   avg(value) FILTER (WHERE element = 'PRCP') AS PRCP,
+                   avg(value) FILTER (WHERE element = 'TMAX') AS TMAX,
+                   avg(value) FILTER (WHERE element = 'TMIN') AS TMIN
+            FROM kept
+            GROUP BY station_code, state_code, year, doy, month
+            ORDER BY station_code, year, doy
+        """, {'files': list(paths)}).df()
+    finally:
+        con.unregister('station_codes')
+
+    station_dtype = pd.CategoricalDtype(stations['station_id'])
+    frame = pd.DataFrame({
+        'station': pd.Categorical.from_codes(pivoted['station_code'].to_numpy(), dtype=station_dtype),
+        'state': pd.Categorical.from_codes(pivoted['state_code'].to_numpy(), dtype=state_dtype),
+        'year': pivoted['year'].to_numpy().astype(np.int16),
+        'doy': pivoted['doy'].to_numpy().astype(np.int16),
+        'month': pivoted['month'].to_numpy().astype(np.int8),
+    })
+    # Same element columns and units as pivot_daily; absent elements stay absent
+    for element in sorted(ELEMENTS):
+        values = pivoted[element].to_numpy(dtype=float)
+        if not np.isnan(values).all():
+            frame[element] = values / 10.0
+    return frame
+
+
+# ============================================================
+# RMA county yields
+# ============================================================
+def load_yields(con, csv_path):
+    """The RMA rows cleaned like process_yields.py's pandas load, in file order.
+
+    The CSV is parsed once into the temporary table ``yields``, which
+    ``yield_cube`` aggregates. Returns only the columns the county outputs
+    use (names, FIPS, crop, year and yield), with pandas' dtypes.
+    """
+    con.execute("""
+        CREATE OR REPLACE TEMP TABLE yields AS
+        SELECT row_number() OVER () AS file_row,
+               ltrim("State Abbreviation") AS state_abbr,
+               ltrim("State Name") AS state_name,
+               ltrim("County Name") AS county,
+               lower(trim("Commodity Name")) AS crop,
+               printf('%02d', CAST(trim("State Code") AS BIGINT)) ||
+                   printf('%03d', CAST(trim("County Code") AS BIGINT)) AS fips,
+               CAST(trim("Yield Year") AS BIGINT) AS year,
+               CAST(trim("Yield Amount") AS DOUBLE) AS amount
+        FROM read_csv($path, header = true, all_varchar = true, normalize_names = false)
+    """, {'path': csv_path})
+    rows = con.execute("""
+        SELECT state_abbr, state_name, county, crop, fips, year, amount
+        FROM yields
+        ORDER BY file_row
+    """).df()
+    return pd.DataFrame({
+        'State Name': rows['state_name'].astype(str),
+        'State Abbreviation': rows['state_abbr'].astype(str),
+        'County Name': rows['county'].astype(str),
+        'Commodity Name': rows['crop'].astype(str),
+        'Yield Year': rows['year'].to_numpy(dtype=np.int64),
+        'Yield Amount': rows['amount'].to_numpy(dtype=float),
+        'FIPS': rows['fips'].astype(str),
+    })
+
+
+def yield_cube(con):
+    """``yield_cube.build_cube`` over the ``yields`` table that ``load_yields`` made.
+
+    Sums are compensated (Kahan) and variances Welford updates, both run in
+    file order: the same arithmetic as the pandas groupby, so the cells
+    match it bit for bit however many threads scan the table.
+    """
+    return con.execute("""
+        SELECT state_abbr, state_name, crop, year,
+               kahan_sum(amount ORDER BY file_row) AS sum,
+               count(amount) AS count,
+               var_samp(amount ORDER BY file_row) AS var,
+               min(amount) AS min,
+               max(amount) AS max
+        FROM yields
+        GROUP BY state_abbr, state_name, crop, year
+        ORDER BY state_abbr, state_name, crop, year
+    """).df()
@@ -0,0 +1,295 @@
+"""
+Read GHCN-Daily yearly CSVs and filter them to our stations and elements.
+Files can be read serially or split into line-aligned byte ranges and
+filtered across a process pool. Filtered rows are cached per year as
+Parquet, with a manifest keyed by the source file's size, mtime and hash,
+so only changed years are re-parsed.
+"""
+
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# GHCN daily CSV columns: STATION, DATE, ELEMENT, DATA_VALUE, M_FLAG, Q_FLAG, S_FLAG, OBS_TIME
+# DATA_VALUE units: PRCP in tenths of mm, TMAX/TMIN in tenths of degrees C
+GHCN_COLUMNS = ['station', 'date', 'element', 'value', 'm_flag', 'q_flag', 's_flag', 'obs_time']
+GHCN_DTYPES = {'station': str, 'date': 'int32', 'element': str, 'value': float}
+ELEMENTS = {'PRCP', 'TMAX', 'TMIN'}
+ELEMENT_DTYPE = pd.CategoricalDtype(sorted(ELEMENTS))
+
+# Bump when the layout of cached frames changes
+CACHE_VERSION = 2
+
+# Days before the first of each month (index 1-12) in a non-leap year
+_DAYS_BEFORE_MONTH = np.array([0, 0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334], dtype=np.int16)
+
+
+def station_dtype(station_set):
+    """Categorical dtype shared by every frame, so frames concat without recoding."""
+    return pd.CategoricalDtype(sorted(station_set))
+
+
+def split_yyyymmdd(dates):
+    """(year, day of year, month) integer arrays from YYYYMMDD integers."""
+    dates = np.asarray(dates)
+    year = (dates // 10000).astype(np.int16)
+    month = (dates // 100 % 100).astype(np.int8)
+    day = (dates % 100).astype(np.int16)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    doy = _DAYS_BEFORE_MONTH[month] + day + (leap & (month > 2))
+    return year, doy.astype(np.int16), month
+
+
+def filter_chunk(chunk, station_set, stations=None):
+    """Rows of a raw GHCN chunk for our stations/elements that passed QC.
+
+    Returns compact columns: categorical station/element, int16 year and
+    day of year, int8 month and int16 values in GHCN's native tenths.
+    """
+    mask = (
+        chunk['station'].isin(station_set) &
+        chunk['element'].isin(ELEMENTS) &
+        (chunk['q_flag'].isna() | (chunk['q_flag'] == ''))  # quality check passed
+    )
+    filtered = chunk[mask]
+    year, doy, month = split_yyyymmdd(filtered['date'].to_numpy())
+    return pd.DataFrame({
+        'station': pd.Categorical(filtered['station'], dtype=stations or station_dtype(station_set)),
+        'year': year,
+        'doy': doy,
+        'month': month,
+        'element': pd.Categorical(filtered['element'], dtype=ELEMENT_DTYPE),
+        'value': filtered['value'].to_numpy().astype(np.int16),
+    })
+
+
+def read_year(filepath, station_set, chunksize=2_000_000):
+    """Filtered compact rows (see ``filter_chunk``) of one yearly CSV.
+
+    Returns (frame, rows_processed).
+    """
+    stations = station_dtype(station_set)
+
+    # Read in chunks to manage memory
+    chunks = pd.read_csv(
+        filepath,
+        header=None,
+        names=GHCN_COLUMNS,
+        dtype=GHCN_DTYPES,
+        usecols=['station', 'date', 'element', 'value', 'q_flag'],
+        chunksize=chunksize,
+    )
+
+    year_records = []
+    rows_processed = 0
+    for chunk in chunks:
+        rows_processed += len(chunk)
+        filtered = filter_chunk(chunk, station_set, stations)
+        if len(filtered) > 0:
+            year_records.append(filtered)
+
+    if not year_records:
+        return None, rows_processed
+    return pd.concat(year_records, ignore_index=True), rows_processed
+
+
+# ============================================================
+# Parallel ingestion
+# ============================================================
+_worker_stations = None
+_worker_dtype = None
+
+
+def fork_context():
+    """The 'fork' multiprocessing context, or None on platforms without it.
+
+    process_weather.py runs its whole body at import time, so a spawned
+    worker would re-run the script; forked workers start from the parent.
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context('fork')
+
+
+def _init_worker(station_set):
+    global _worker_stations, _worker_dtype
+    _worker_stations = station_set
+    _worker_dtype = station_dtype(station_set)
+
+
+def split_file(filepath, chunk_bytes):
+    """(start, end) byte ranges covering ``filepath``, split on line boundaries."""
+    size = os.path.getsize(filepath)
+    bounds = [0]
+    with open(filepath, 'rb') as f:
+        pos = chunk_bytes
+        while pos < size:
+            f.seek(pos)
+            f.readline()  # move to the start of the next line
+            pos = f.tell()
+            if pos >= size:
+                break
+            bounds.append(pos)
+            pos += chunk_bytes
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _read_range(filepath, start, end):
+    """Worker: filter one byte range of a yearly CSV."""
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    chunk = pd.read_csv(
+        io.BytesIO(data),
+        header=None,
+        names=GHCN_COLUMNS,
+        dtype=GHCN_DTYPES,
+        usecols=['station', 'date', 'element', 'value', 'q_flag'],
+    )
+    return filter_chunk(chunk, _worker_stations, _worker_dtype), len(chunk)
+
+
+def read_years_parallel(year_files, station_set, workers, chunk_bytes=256 * 1024 ** 2, max_years=None):
+    """Read several yearly CSVs across a process pool.
+
+    Every year is split into line-aligned byte ranges. At most
+    ``max_years`` years (default: ``workers``) are queued, being read or
+    handed out at a time; the next year is submitted once the caller asks
+    for the following one, so memory stays bounded however many years
+    there are.
+    Yields (year, frame, rows_processed) in the order of ``year_files``;
+    each frame has the same rows, order and dtypes as ``read_year`` would
+    return. Workers share one station categorical dtype, so their compact
+    frames concatenate without recoding. Workers are forked; callers check
+    ``fork_context()`` and read serially where it is None.
+    """
+    window = max(1, max_years or workers)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=fork_context(), initializer=_init_worker,
+                             initargs=(station_set,)) as pool:
+        remaining = iter(year_files.items())
+        in_flight = deque()
+
+        def submit_next():
+            item = next(remaining, None)
+            if item is not None:
+                year, filepath = item
+                in_flight.append((year, [pool.submit(_read_range, filepath, start, end)
+                                         for start, end in split_file(filepath, chunk_bytes)]))
+
+        for _ in range(window):
+            submit_next()
+        while in_flight:
+            year, year_futures = in_flight.popleft()
+            parts = [future.result() for future in year_futures]
+            del year_futures[:]  # release finished chunks early
+            rows_processed = sum(rows for _, rows in parts)
+            frames = [frame for frame, _ in parts if len(frame) > 0]
+            del parts
+            frame = pd.concat(frames, ignore_index=True) if frames else None
+            del frames
+            yield year, frame, rows_processed
+            # The caller is done with that year; refill the window
+            del frame
+            submit_next()
+
+
+# ============================================================
+# Yearly cache
+# ============================================================
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def filter_key(station_set):
+    """Identifies the filter a cache was built with (stations, elements, layout)."""
+    h = hashlib.sha256(f'v{CACHE_VERSION}'.encode())
+    h.update(','.join(sorted(ELEMENTS)).encode())
+    h.update('\n'.join(sorted(station_set)).encode())
+    return h.hexdigest()
+
+
+class YearCache:
+    """Parquet cache of filtered GHCN rows, one file per year.
+
+    An entry is reused when the source file's size and mtime match the
+    manifest. If only the mtime moved (e.g. a re-download of identical
+    bytes), the file is re-hashed and the entry kept when the hash matches.
+    """
+
+    def __init__(self, cache_dir, station_set):
+        self.cache_dir = cache_dir
+        self.manifest_path = os.path.join(cache_dir, 'manifest.json')
+        self.key = filter_key(station_set)
+        self.stations = station_dtype(station_set)
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.manifest = {'filter_key': self.key, 'years': {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            # A different station/element filter invalidates every entry
+            if manifest.get('filter_key') == self.key:
+                self.manifest = manifest
+
+    def _path(self, year):
+        return os.path.join(self.cache_dir, f'{year}.parquet')
+
+    def is_current(self, year, filepath):
+        """Whether ``year`` has a valid entry for ``filepath``, without reading it."""
+        entry = self.manifest['years'].get(str(year))
+        if entry is None or (entry['rows'] and not os.path.exists(self._path(year))):
+            return False
+
+        st = os.stat(filepath)
+        if st.st_size != entry['size']:
+            return False
+        if st.st_mtime_ns != entry['mtime_ns']:
+            if file_hash(filepath) != entry['sha256']:
+                return False
+            entry['mtime_ns'] = st.st_mtime_ns
+            self._save_manifest()
+        return True
+
+    def load(self, year, filepath):
+        """Cached (frame, rows_processed) for ``year``, or None if stale."""
+        if not self.is_current(year, filepath):
+            return None
+        entry = self.manifest['years'][str(year)]
+        if not entry['rows']:
+            return None, entry['rows_processed']
+        frame = pd.read_parquet(self._path(year))
+        # Parquet keeps only the dictionary values; restore the shared categories
+        frame = frame.astype({'station': self.stations, 'element': ELEMENT_DTYPE})
+        return frame, entry['rows_processed']
+
+    def store(self, year, filepath, frame, rows_processed):
+        st = os.stat(filepath)
+        if frame is not None:
+            tmp_path = self._path(year) + '.tmp'
+            frame.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, self._path(year))
+
+        self.manifest['years'][str(year)] = {
+            'source': os.path.basename(filepath),
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha256': file_hash(filepath),
+            'rows': 0 if frame is None else len(frame),
+            'rows_processed': rows_processed,
+        }
+        self._save_manifest()
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
@@ -0,0 +1,162 @@
+"""
+Lightweight per-section instrumentation for the pipeline scripts.
+Each numbered section is opened with ``report.section(...)``; the next
+call (or ``finish``) closes it, so the scripts need no re-indentation.
+A section records wall and CPU time, peak RSS above its starting RSS,
+and optional rows in/out. ``finish`` writes a JSON run report, and
+sections can be profiled with cProfile into one .prof file each.
+"""
+
+import cProfile
+import json
+import os
+import re
+import resource
+import sys
+import time
+from datetime import datetime, timezone
+
+
+def add_arguments(parser):
+    """Register --report and --profile-dir on a script's argument parser."""
+    parser.add_argument('--report', metavar='PATH',
+                        help='write a JSON run report (time, CPU, memory, rows per section) to PATH')
+    parser.add_argument('--profile-dir', metavar='DIR',
+                        help='dump a cProfile .prof file per section into DIR')
+
+
+def _status_kb(field):
+    """A memory field (VmRSS, VmHWM) of this process in kB, or None off Linux."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak():
+    """Reset VmHWM to the current RSS; False where the kernel does not allow it."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _maxrss_kb():
+    # ru_maxrss is in kB on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss // 1024 if sys.platform == 'darwin' else maxrss
+
+
+class RunReport:
+    """Per-section measurements of one script run."""
+
+    def __init__(self, script, report_path=None, profile_dir=None):
+        self.script = script
+        self.report_path = report_path
+        self.profile_dir = profile_dir
+        self.enabled = bool(report_path or profile_dir)
+        self.sections = []
+        self._current = None
+        self._profiler = None
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    @classmethod
+    def from_args(cls, script, args):
+        return cls(script, args.report, args.profile_dir)
+
+    def section(self, name, rows_in=None):
+        """Close the open section (if any) and start measuring ``name``."""
+        self._close()
+        if not self.enabled:
+            return
+        peak_reset = _reset_peak()
+        self._current = {
+            'name': name,
+            'rows_in': None if rows_in is None else int(rows_in),
+            'rows_out': None,
+            '_wall': time.perf_counter(),
+            '_cpu': time.process_time(),
+            '_rss': _status_kb('VmRSS'),
+            '_maxrss': None if peak_reset else _maxrss_kb(),
+        }
+        if self.profile_dir:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def rows(self, rows_out=None, rows_in=None):
+        """Record row counts for the open section."""
+        if self._current is None:
+            return
+        if rows_out is not None:
+            self._current['rows_out'] = int(rows_out)
+        if rows_in is not None:
+            self._current['rows_in'] = int(rows_in)
+
+    def _close(self):
+        if self._current is None:
+            return
+        s = self._current
+        wall = time.perf_counter() - s.pop('_wall')
+        cpu = time.process_time() - s.pop('_cpu')
+        start_rss, start_maxrss = s.pop('_rss'), s.pop('_maxrss')
+        rss = _status_kb('VmRSS')
+        if start_maxrss is None:
+            peak_delta = (_status_kb('VmHWM') or 0) - (start_rss or 0)
+        else:
+            # Without a resettable high-water mark, only new process peaks show up
+            peak_delta = max(_maxrss_kb() - start_maxrss, 0)
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            slug = re.sub(r'[^a-z0-9]+', '_', s['name'].lower()).strip('_')
+            path = os.path.join(self.profile_dir, f'{self.script}-{len(self.sections) + 1:02d}-{slug}.prof')
+            self._profiler.dump_stats(path)
+            s['profile'] = path
+            self._profiler = None
+
+        s.update({
+            'wall_seconds': round(wall, 4),
+            'cpu_seconds': round(cpu, 4),
+            'peak_rss_delta_mb': round(peak_delta / 1024, 1),
+            'rss_end_mb': round(rss / 1024, 1) if rss is not None else None,
+        })
+        self.sections.append(s)
+        self._current = None
+
+    def finish(self):
+        """Close the last section, print a summary and write the report if requested."""
+        self._close()
+        if not self.enabled:
+            return
+        report = {
+            'script': self.script,
+            'argv': sys.argv[1:],
+            'started_at': self.started_at,
+            'wall_seconds': round(time.perf_counter() - self._start_wall, 4),
+            'cpu_seconds': round(time.process_time() - self._start_cpu, 4),
+            'peak_rss_mb': round(_maxrss_kb() / 1024, 1),
+            'sections': self.sections,
+        }
+
+        print(f"\n{'section':40s} {'wall s':>8s} {'cpu s':>8s} {'peak+ MB':>9s} {'rows in':>12s} {'rows out':>12s}")
+        for s in self.sections:
+            rows_in = f"{s['rows_in']:,}" if s['rows_in'] is not None else ''
+            rows_out = f"{s['rows_out']:,}" if s['rows_out'] is not None else ''
+            print(f"{s['name'][:40]:40s} {s['wall_seconds']:8.2f} {s['cpu_seconds']:8.2f} "
+                  f"{s['peak_rss_delta_mb']:9.1f} {rows_in:>12s} {rows_out:>12s}")
+
+        if self.report_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.report_path)), exist_ok=True)
+            with open(self.report_path, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"Run report written to {self.report_path}")
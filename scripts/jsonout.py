@@ -0,0 +1,237 @@
+"""
+Streaming JSON output straight from column arrays.
+The large outputs are arrays of flat records. Instead of building a
+Python dict per row and handing millions of them to json.dump, each
+column is rounded in one vectorized step, rows are formatted from a
+single template a block at a time as they are written, and groups are
+lazy slices of the same rows. ``dump`` streams the (small) nesting
+around them, so the text of the whole output is never held at once. For
+the same values the bytes are exactly what json.dump writes for the
+equivalent dicts; callers pick the rounding their old dicts used.
+"""
+
+import json
+from json.encoder import encode_basestring_ascii
+
+import numpy as np
+
+# Rows closer than this (in units of the last kept decimal) to a tie are
+# rounded by Python's round(), which decides from the exact binary value
+_TIE_MARGIN = 1e-6
+
+# Text written per file.write call
+_CHUNK = 1 << 16
+
+# Rows formatted per step while iterating ``Rows``
+_BLOCK = 4096
+
+
+def round_values(values, decimals):
+    """``round(float(v), decimals)`` of every value, as a float array.
+
+    np.round scales, rounds and unscales, which can land on the other side
+    of a tie than Python's correctly rounded round(); the rare values near
+    a tie are redone with round() so outputs match it exactly. Values that
+    used to be rounded as NumPy scalars (whose round() is np.round) should
+    use np.round instead.
+    """
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, decimals)
+    with np.errstate(invalid='ignore'):
+        scaled = values * 10.0 ** decimals
+        near_tie = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < _TIE_MARGIN
+    if near_tie.any():
+        rounded[near_tie] = [round(v, decimals) for v in values[near_tie].tolist()]
+    return rounded
+
+
+def _floatstr(value):
+    if value != value:
+        return 'NaN'
+    if value == float('inf'):
+        return 'Infinity'
+    if value == -float('inf'):
+        return '-Infinity'
+    return float.__repr__(value)
+
+
+def _missing(values):
+    """NaN/None mask of a column, or None for kinds that cannot be missing."""
+    kind = values.dtype.kind
+    if kind == 'f':
+        return np.isnan(values)
+    if kind in 'iub':
+        return None
+    return np.array([v is None or v != v for v in values.tolist()], dtype=bool)
+
+
+def tokens(values, decimals=None):
+    """(JSON text of each value, missing mask or None) for one column.
+
+    Floats are rounded to ``decimals`` first; NaN is written as NaN (like
+    json.dump) and reported as missing.
+    """
+    values = np.asarray(values)
+    kind = values.dtype.kind
+    if kind == 'f':
+        if decimals is not None:
+            values = round_values(values, decimals)
+        missing = np.isnan(values)
+        if np.isfinite(values).all():
+            return list(map(float.__repr__, values.tolist())), missing
+        return list(map(_floatstr, values.tolist())), missing
+    if kind in 'iu':
+        return list(map(int.__repr__, values.tolist())), None
+    if kind == 'b':
+        return ['true' if v else 'false' for v in values.tolist()], None
+    items = values.tolist()
+    if all(type(v) is str for v in items):
+        return list(map(encode_basestring_ascii, items)), None
+    return [encode_basestring_ascii(v) if type(v) is str else json.dumps(v) for v in items], _missing(values)
+
+
+class Rows:
+    """JSON text of one object per row of a column set, formatted lazily.
+
+    Iterating formats ``_BLOCK`` rows at a time, so only one block of text
+    is alive however many rows there are. ``rows[start:end]`` is a view
+    over the same columns.
+    """
+
+    def __init__(self, columns, decimals=None, skip_missing=False):
+        decimals = decimals or {}
+        template = []
+        # (values, key prefix of a column left out where missing, else None)
+        self._columns = []
+        self._start = self._stop = 0
+        for i, (key, values) in enumerate(columns.items()):
+            values = np.asarray(values)
+            if values.dtype.kind == 'f' and decimals.get(key) is not None:
+                values = round_values(values, decimals[key])
+            prefix = ('' if i == 0 else ', ') + encode_basestring_ascii(key) + ': '
+            missing = _missing(values) if skip_missing else None
+            if missing is not None and missing.any():
+                if i == 0:
+                    raise ValueError(f"first column {key!r} has missing values")
+                template.append('%s')
+                self._columns.append((values, prefix))
+            else:
+                template.append(prefix.replace('%', '%%') + '%s')
+                self._columns.append((values, None))
+            self._stop = len(values)
+        self._template = '{' + ''.join(template) + '}'
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("Rows only supports slicing")
+        start, stop, step = index.indices(len(self))
+        if step != 1:
+            raise ValueError("Rows slices must be contiguous")
+        view = object.__new__(Rows)
+        view._columns, view._template = self._columns, self._template
+        view._start = self._start + start
+        view._stop = self._start + max(start, stop)
+        return view
+
+    def __iter__(self):
+        for start in range(self._start, self._stop, _BLOCK):
+            yield from self._format(start, min(start + _BLOCK, self._stop))
+
+    def _format(self, start, end):
+        parts = []
+        for values, prefix in self._columns:
+            texts, missing = tokens(values[start:end])
+            if prefix is not None:
+                if missing is None:
+                    texts = [prefix + t for t in texts]
+                else:
+                    texts = ['' if m else prefix + t for t, m in zip(texts, missing.tolist())]
+            parts.append(texts)
+        template = self._template
+        return [template % row for row in zip(*parts)]
+
+
+def records(columns, decimals=None, skip_missing=False):
+    """Lazy JSON text (``Rows``) of one object per row of ``columns`` ({key: array}), keys in order.
+
+    ``decimals`` maps keys to rounding digits. With ``skip_missing`` a key
+    is left out of the rows where its value is NaN/None, like a dict
+    comprehension filtering on pd.notna; the first column must be complete.
+    """
+    return Rows(columns, decimals, skip_missing)
+
+
+class Array:
+    """JSON array of already-encoded ``items``, written by ``dump`` item by item."""
+
+    def __init__(self, items):
+        self.items = items
+
+
+def array(items):
+    """JSON array of already-encoded ``items`` (e.g. ``Rows``), encoded as it is written."""
+    return Array(items)
+
+
+def split(items, starts, ends):
+    """JSON arrays of ``items[start:end]`` for each group's split points."""
+    return [array(items[start:end]) for start, end in zip(starts.tolist(), ends.tolist())]
+
+
+def _key(key):
+    if isinstance(key, str):
+        return encode_basestring_ascii(key)
+    if isinstance(key, (bool, np.bool_)) or key is None:
+        return '"' + json.dumps(key) + '"'
+    if isinstance(key, (int, np.integer)):
+        return '"' + int.__repr__(int(key)) + '"'
+    if isinstance(key, (float, np.floating)):
+        return '"' + _floatstr(float(key)) + '"'
+    raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+
+def iterencode(obj):
+    """JSON text of ``obj`` in pieces; an ``Array`` yields one piece per item."""
+    if isinstance(obj, Array):
+        first = True
+        for item in obj.items:
+            yield ('[' if first else ', ') + item
+            first = False
+        yield '[]' if first else ']'
+    elif isinstance(obj, dict):
+        if not obj:
+            yield '{}'
+            return
+        first = True
+        for key, value in obj.items():
+            yield ('{' if first else ', ') + _key(key) + ': '
+            yield from iterencode(value)
+            first = False
+        yield '}'
+    elif isinstance(obj, (list, tuple)):
+        if not obj:
+            yield '[]'
+            return
+        first = True
+        for value in obj:
+            yield '[' if first else ', '
+            yield from iterencode(value)
+            first = False
+        yield ']'
+    else:
+        yield json.dumps(obj)
+
+
+def dump(obj, f):
+    """Stream ``obj`` to ``f`` exactly as json.dump(obj, f) would write it."""
+    buffer, size = [], 0
+    for piece in iterencode(obj):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= _CHUNK:
+            f.write(''.join(buffer))
+            buffer, size = [], 0
+    f.write(''.join(buffer))
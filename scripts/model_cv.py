@@ -0,0 +1,107 @@
+"""
+Rolling-origin, year-blocked cross-validation for the yield models.
+Each fold trains on every year before a test block and tests on that
+block, so no fold ever sees the future. All (crop, model, fold) fits are
+independent and run across a process pool.
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+MODELS = {
+    'linear': LinearRegression,
+    'ridge': lambda: Ridge(alpha=1.0),
+    'gbr': lambda: GradientBoostingRegressor(n_estimators=200, max_depth=2, learning_rate=0.05, random_state=0),
+}
+
+
+def make_model(name):
+    """Scaler + estimator; the scaler is fit on each fold's training years only."""
+    return make_pipeline(StandardScaler(), MODELS[name]())
+
+
+def rolling_origin_folds(years, min_train_years=5, block_years=1):
+    """(train_mask, test_mask, test_years) for each test block after ``min_train_years``."""
+    unique_years = np.unique(years)
+    folds = []
+    for start in range(min_train_years, len(unique_years), block_years):
+        block = unique_years[start:start + block_years]
+        test_mask = np.isin(years, block)
+        train_mask = years < block[0]
+        folds.append((train_mask, test_mask, block.tolist()))
+    return folds
+
+
+def evaluate_fold(task):
+    """Fit one model on one fold; returns its scores and fit/predict time."""
+    crop, model_name, test_years, X_train, y_train, X_test, y_test = task
+    start = time.perf_counter()
+    model = make_model(model_name).fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    return {
+        'crop': crop,
+        'model': model_name,
+        'test_years': test_years,
+        'n_train': int(len(y_train)),
+        'n_test': int(len(y_test)),
+        'r2': round(float(r2_score(y_test, y_pred)), 3),
+        'mae': round(float(mean_absolute_error(y_test, y_pred)), 2),
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def cross_validate(datasets, models, min_train_years=5, block_years=1, workers=None):
+    """Per-fold results for every crop in ``datasets`` ({crop: (X, y, years)}) and model.
+
+    Folds with fewer than two test rows are skipped (R² is undefined).
+    The pool forks its workers: analyze.py runs at import time, so spawned
+    workers would re-run it. Without fork the fits run serially.
+    Returns (results, wall seconds).
+    """
+    tasks = []
+    for crop, (X, y, years) in datasets.items():
+        for train_mask, test_mask, test_years in rolling_origin_folds(years, min_train_years, block_years):
+            if test_mask.sum() < 2 or train_mask.sum() < 2:
+                continue
+            for name in models:
+                tasks.append((crop, name, test_years, X[train_mask], y[train_mask], X[test_mask], y[test_mask]))
+
+    start = time.perf_counter()
+    workers = workers or os.cpu_count()
+    if workers > 1 and len(tasks) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)),
+                                 mp_context=multiprocessing.get_context('fork')) as pool:
+            results = list(pool.map(evaluate_fold, tasks))
+    else:
+        results = [evaluate_fold(task) for task in tasks]
+    return results, time.perf_counter() - start
+
+
+def summarize(results):
+    """{crop: {model: mean R², mean MAE, folds, fit seconds}} over all folds."""
+    summary = {}
+    for r in results:
+        entry = summary.setdefault(r['crop'], {}).setdefault(r['model'], {'r2': [], 'mae': [], 'seconds': []})
+        for key in ('r2', 'mae', 'seconds'):
+            entry[key].append(r[key])
+    return {
+        crop: {
+            model: {
+                'mean_r2': round(float(np.mean(entry['r2'])), 3),
+                'mean_mae': round(float(np.mean(entry['mae'])), 2),
+                'folds': len(entry['r2']),
+                'fit_seconds': round(float(np.sum(entry['seconds'])), 3),
+            }
+            for model, entry in models.items()
+        }
+        for crop, models in summary.items()
+    }
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Monthly normals as persisted, mergeable accumulators.
+Each (state, year, month) keeps the count, sum and sum of squares of every
+daily element plus the number of station-months reporting precipitation,
+so normals over any set of years are just sums of accumulator rows.
+process_weather.py stores one Parquet file per GHCN year (keyed like the
+yearly cache by the source file's size, mtime and hash) and only computes
+accumulators for new or changed years. Re-windowing the normals needs no
+daily data at all:
+
+Usage: python3 scripts/normals_store.py --years 2015-2024   (or --years 10 for the latest 10)
+"""
+
+import argparse
+import json
+import os
+import time
+
+import pandas as pd
+
+from ghcn_ingest import file_hash
+from weather_metrics import ELEMENT_COLUMNS
+
+# Bump when the accumulator columns change
+NORMALS_VERSION = 1
+
+
+def normal_accumulators(pivoted):
+    """Per (state, year, month) count, sum and sum of squares of each daily element.
+
+    ``PRCP_station_months`` counts the station-months with any precipitation
+    report, so ``PRCP_sum`` over it is the average monthly total.
+    """
+    cols = [c for c in ELEMENT_COLUMNS if c in pivoted.columns]
+    keys = ['state', 'year', 'month']
+    grouped = pivoted.groupby(keys, observed=True)[cols]
+    squares = (pivoted[cols] ** 2).groupby([pivoted[k] for k in keys], observed=True).sum()
+    acc = grouped.sum().add_suffix('_sum').join(grouped.count().add_suffix('_count')).join(
+        squares.add_suffix('_sumsq'))
+    if 'PRCP' in cols:
+        reported = pivoted['PRCP'].notna().groupby([pivoted[k] for k in keys + ['station']], observed=True).any()
+        acc['PRCP_station_months'] = reported.groupby(level=keys, observed=True).sum()
+    return acc
+
+
+def parse_years(spec, available):
+    """Years selected by 'FIRST-LAST' or 'N' (the latest N of ``available``); None selects all."""
+    available = sorted(available)
+    if spec is None:
+        return available
+    first, sep, last = spec.partition('-')
+    try:
+        if sep:
+            return [y for y in available if int(first) <= y <= int(last)]
+        return available[-int(spec):] if int(spec) > 0 else []
+    except ValueError:
+        raise ValueError(f"bad normals years {spec!r}, expected FIRST-LAST or a number of latest years")
+
+
+def monthly_normals(acc, years=None):
+    """{state: {month: normals}} from accumulator rows, optionally limited to ``years``."""
+    if years is not None:
+        acc = acc[acc.index.get_level_values('year').isin(years)]
+    totals = acc.groupby(level=['state', 'month'], observed=True).sum()
+    means = {}
+    for col in ELEMENT_COLUMNS:
+        if f'{col}_sum' in totals.columns:
+            means[col] = totals[f'{col}_sum'] / totals[f'{col}_count']
+    if 'PRCP_station_months' in totals.columns:
+        precip_totals = totals['PRCP_sum'] / totals['PRCP_station_months']
+
+    normals_by_state = {}
+    for state, month in totals.index:
+        normals = {}
+        if 'TMAX' in means:
+            normals['avg_high'] = round(means['TMAX'][(state, month)], 1)
+        if 'TMIN' in means:
+            normals['avg_low'] = round(means['TMIN'][(state, month)], 1)
+        if 'PRCP' in means:
+            # Average of the stations' actual monthly totals
+            normals['avg_precip_mm'] = round(precip_totals[(state, month)], 1)
+        if 'TMAX' in means and 'TMIN' in means:
+            normals['avg_temp'] = round((means['TMAX'][(state, month)] + means['TMIN'][(state, month)]) / 2, 1)
+
+        if state not in normals_by_state:
+            normals_by_state[state] = {}
+        normals_by_state[state][int(month)] = normals
+
+    return normals_by_state
+
+
+class NormalsStore:
+    """Accumulators per GHCN year, one Parquet file each, with a manifest.
+
+    Entries are valid for the station filter (``key``) they were built
+    with and the source file they came from; like the yearly cache, an
+    mtime change alone triggers a re-hash rather than a recompute.
+    """
+
+    def __init__(self, store_dir, key):
+        self.store_dir = store_dir
+        self.manifest_path = os.path.join(store_dir, 'manifest.json')
+        self.key = f'v{NORMALS_VERSION}:{key}'
+        os.makedirs(store_dir, exist_ok=True)
+
+        self.manifest = {'key': self.key, 'years': {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get('key') == self.key:
+                self.manifest = manifest
+
+    def _path(self, year):
+        return os.path.join(self.store_dir, f'{year}.parquet')
+
+    def is_current(self, year, filepath):
+        entry = self.manifest['years'].get(str(year))
+        if entry is None or not os.path.exists(self._path(year)):
+            return False
+        st = os.stat(filepath)
+        if st.st_size != entry['size']:
+            return False
+        if st.st_mtime_ns != entry['mtime_ns']:
+            if file_hash(filepath) != entry['sha256']:
+                return False
+            entry['mtime_ns'] = st.st_mtime_ns
+            self._save_manifest()
+        return True
+
+    def store(self, year, filepath, acc):
+        tmp_path = self._path(year) + '.tmp'
+        acc.reset_index().to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self._path(year))
+        st = os.stat(filepath)
+        self.manifest['years'][str(year)] = {
+            'source': os.path.basename(filepath),
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha256': file_hash(filepath),
+            'rows': len(acc),
+        }
+        self._save_manifest()
+
+    def years(self):
+        return sorted(int(y) for y in self.manifest['years'])
+
+    def load(self, years=None):
+        """Accumulator rows of ``years`` (default: every stored year), in year order."""
+        years = self.years() if years is None else sorted(years)
+        keys = ['state', 'year', 'month']
+        frames = [pd.read_parquet(self._path(y)) for y in years]
+        if not frames:
+            return pd.DataFrame(index=pd.MultiIndex.from_arrays([[], [], []], names=keys))
+        return pd.concat(frames, ignore_index=True).set_index(keys)
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def main():
+    data_dir = os.environ.get('HARROW_DATA_DIR', os.path.join(os.path.dirname(__file__), '..', 'Data'))
+    out_dir = os.environ.get('HARROW_OUT_DIR', os.path.join(os.path.dirname(__file__), '..', 'public', 'data'))
+    parser = argparse.ArgumentParser(description='Rebuild monthly_normals.json from stored accumulators.')
+    parser.add_argument('--store-dir', default=os.path.join(data_dir, 'normals_store'),
+                        help='accumulators written by process_weather.py (default: Data/normals_store)')
+    parser.add_argument('--years', help="FIRST-LAST, or N for the latest N stored years (default: all)")
+    parser.add_argument('--out', default=os.path.join(out_dir, 'monthly_normals.json'))
+    args = parser.parse_args()
+
+    manifest_path = os.path.join(args.store_dir, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        parser.error(f"no accumulators in {args.store_dir}; run process_weather.py first")
+    with open(manifest_path) as f:
+        key = json.load(f)['key'].split(':', 1)[1]
+    store = NormalsStore(args.store_dir, key)
+    try:
+        years = parse_years(args.years, store.years())
+    except ValueError as err:
+        parser.error(str(err))
+    if not years:
+        parser.error(f"no stored years match {args.years!r} (stored: {store.years()})")
+
+    start = time.perf_counter()
+    normals = monthly_normals(store.load(years))
+    with open(args.out, 'w') as f:
+        json.dump(normals, f)
+    print(f"{os.path.basename(args.out)}: {len(normals)} states, years {years[0]}-{years[-1]} "
+          f"({time.perf_counter() - start:.3f}s)")
+
+
+if __name__ == '__main__':
+    main()
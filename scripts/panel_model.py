@@ -0,0 +1,104 @@
+"""
+Two-way fixed-effects panel regression for county yields.
+County and year effects are absorbed by within-transformation: the
+outcome and every feature are demeaned by county and by year in
+alternating sparse group-mean passes until they stop changing, so the
+design never grows a one-hot column per county. The slopes are then a
+small dense least-squares fit on the demeaned columns, and the effects
+are recovered from the residuals the same way.
+"""
+
+import numpy as np
+from scipy import sparse
+
+# Alternating projections stop once no value moves by more than this
+# fraction of its column's scale
+TOLERANCE = 1e-10
+MAX_ITERATIONS = 1000
+
+
+def _indicator(codes, n_groups):
+    """Sparse (rows × groups) 0/1 matrix and the group sizes."""
+    n = len(codes)
+    matrix = sparse.csr_matrix((np.ones(n), (np.arange(n), codes)), shape=(n, n_groups))
+    return matrix, np.bincount(codes, minlength=n_groups)
+
+
+def _project_out(values, indicators, tol=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """Remove every group effect of ``indicators`` from the columns of ``values``.
+
+    Returns (residual columns, iterations). One pass subtracts the county
+    means, then the year means; balanced panels converge in one pass.
+    """
+    values = values.copy()
+    scale = np.maximum(np.abs(values).max(axis=0), 1.0)
+    for iteration in range(1, max_iterations + 1):
+        largest = 0.0
+        for matrix, sizes in indicators:
+            means = (matrix.T @ values) / sizes[:, None]
+            shift = matrix @ means
+            values -= shift
+            largest = max(largest, (np.abs(shift).max(axis=0) / scale).max())
+        if largest < tol:
+            break
+    return values, iteration
+
+
+def drop_singletons(group_codes):
+    """Mask of rows whose groups all have more than one row.
+
+    A county (or year) seen once is fit exactly by its own effect and only
+    inflates the fit; dropping one can create another, so repeat.
+    """
+    keep = np.ones(len(group_codes[0]), dtype=bool)
+    while True:
+        singles = np.zeros_like(keep)
+        for codes in group_codes:
+            counts = np.bincount(codes[keep], minlength=codes.max() + 1)
+            singles |= keep & (counts[codes] == 1)
+        if not singles.any():
+            return keep
+        keep &= ~singles
+
+
+class PanelRegression:
+    """OLS of ``y`` on ``X`` with county and year fixed effects."""
+
+    def fit(self, X, y, counties, years):
+        """Fit on rows with integer ``counties`` and ``years`` codes (0..n-1)."""
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        n_counties, n_years = counties.max() + 1, years.max() + 1
+        indicators = [_indicator(counties, n_counties), _indicator(years, n_years)]
+
+        within, self.iterations = _project_out(np.column_stack([y, X]), indicators)
+        y_within, X_within = within[:, 0], within[:, 1:]
+        self.coef_, *_ = np.linalg.lstsq(X_within, y_within, rcond=None)
+
+        # Split the fixed-effect part of the slope residuals into counties and years
+        residual = y - X @ self.coef_
+        unexplained, _ = _project_out(residual[:, None], indicators)
+        effects = residual - unexplained[:, 0]
+        (county_matrix, county_sizes), (year_matrix, year_sizes) = indicators
+        self.county_effects_ = np.zeros(n_counties)
+        self.year_effects_ = np.zeros(n_years)
+        for _ in range(MAX_ITERATIONS):
+            county_effects = (county_matrix.T @ (effects - year_matrix @ self.year_effects_)) / county_sizes
+            year_effects = (year_matrix.T @ (effects - county_matrix @ county_effects)) / year_sizes
+            change = max(np.abs(county_effects - self.county_effects_).max(),
+                         np.abs(year_effects - self.year_effects_).max())
+            self.county_effects_, self.year_effects_ = county_effects, year_effects
+            if change < TOLERANCE * max(np.abs(effects).max(), 1.0):
+                break
+        # Year effects sum to zero; the county effects carry the level
+        shift = self.year_effects_.mean()
+        self.year_effects_ -= shift
+        self.county_effects_ += shift
+
+        fitted_within = X_within @ self.coef_
+        self.within_r2_ = 1 - ((y_within - fitted_within) ** 2).sum() / (y_within ** 2).sum()
+        self.n_counties_, self.n_years_ = int(n_counties), int(n_years)
+        return self
+
+    def predict(self, X, counties, years):
+        return np.asarray(X, dtype=float) @ self.coef_ + self.county_effects_[counties] + self.year_effects_[years]
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Run the data pipeline: process_yields.py, process_weather.py, analyze.py.
+Stages form a DAG through the files they read and write. A stage is skipped
+when the hashes of its inputs, its code (the script plus the local modules
+it imports) and its arguments match the last successful run and its outputs
+are still in place. Optional inputs and outputs only exist with some stage
+arguments: they count towards the key when present, and an optional output
+the last run wrote must still be intact. Independent stages run
+concurrently.
+
+Usage: python3 scripts/pipeline.py [STAGE ...] [--force] [--dry-run] [--report-dir DIR]
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(SCRIPTS_DIR)
+# Same overrides as the stage scripts, which inherit them from the environment
+DATA_DIR = os.environ.get('HARROW_DATA_DIR', os.path.join(ROOT, 'Data'))
+OUT_DIR = os.environ.get('HARROW_OUT_DIR', os.path.join(ROOT, 'public', 'data'))
+STATE_FILE = os.path.join(DATA_DIR, 'pipeline_state.json')
+
+STAGES = {
+    'yields': {
+        'script': 'process_yields.py',
+        'inputs': [os.path.join(DATA_DIR, 'RMACountyYieldsReport-399.csv')],
+        'outputs': [
+            'state_yields.json', 'county_yields.json', 'yield_anomalies.json',
+            'state_summaries.json', 'planting_guide.json', 'extreme_events.json',
+        ],
+        # Not written with --no-columnar
+        'optional_outputs': ['county_yields.columnar.json', 'yield_anomalies.columnar.json'],
+    },
+    'weather': {
+        'script': 'process_weather.py',
+        'inputs': [
+            os.path.join(DATA_DIR, 'ghcnd-stations.txt'),
+            os.path.join(DATA_DIR, 'ghcn_by_year', '*.csv'),
+        ],
+        'optional_inputs': [os.path.join(DATA_DIR, 'counties-10m.json')],
+        'outputs': ['weather_features.json', 'monthly_normals.json', 'weather_by_state.json'],
+        # --county-weather
+        'optional_outputs': ['county_weather_features.json'],
+    },
+    'analyze': {
+        'script': 'analyze.py',
+        'inputs': [os.path.join(OUT_DIR, 'state_yields.json'), os.path.join(OUT_DIR, 'weather_features.json')],
+        # Read by --panel
+        'optional_inputs': [os.path.join(OUT_DIR, 'county_yields.json'),
+                            os.path.join(OUT_DIR, 'county_weather_features.json')],
+        'outputs': [
+            'correlations.json', 'feature_importance.json',
+            'model_predictions.json', 'weather_anomalies.json', 'sensitivity.json',
+        ],
+        # --cv and --panel
+        'optional_outputs': ['model_cv.json', 'county_model_predictions.json', 'county_weather_anomalies.json'],
+    },
+}
+
+for _stage in STAGES.values():
+    _stage['outputs'] = [os.path.join(OUT_DIR, name) for name in _stage['outputs']]
+    _stage['optional_outputs'] = [os.path.join(OUT_DIR, name) for name in _stage.get('optional_outputs', [])]
+
+
+def stage_dependencies():
+    """{stage: set of stages producing one of its inputs}, optional ones included."""
+    producers = {out: name for name, stage in STAGES.items()
+                 for out in stage['outputs'] + stage['optional_outputs']}
+    return {
+        name: {producers[path] for path in stage['inputs'] + stage.get('optional_inputs', [])
+               if path in producers}
+        for name, stage in STAGES.items()
+    }
+
+
+# ============================================================
+# Hashing
+# ============================================================
+class FileHasher:
+    """sha256 of files, memoized on (size, mtime_ns) across runs."""
+
+    def __init__(self, known):
+        self.known = known
+
+    def __call__(self, path):
+        st = os.stat(path)
+        entry = self.known.get(path)
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return entry['sha256']
+        with open(path, 'rb') as f:
+            digest = hashlib.file_digest(f, 'sha256').hexdigest()
+        self.known[path] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+        return digest
+
+
+def local_modules(script):
+    """The script plus every scripts/ module it imports, transitively."""
+    seen = []
+    pending = [script]
+    pattern = re.compile(r'^\s*(?:from|import)\s+(\w+)', re.MULTILINE)
+    while pending:
+        name = pending.pop()
+        path = os.path.join(SCRIPTS_DIR, name)
+        if path in seen or not os.path.exists(path):
+            continue
+        seen.append(path)
+        with open(path) as f:
+            pending.extend(f'{module}.py' for module in pattern.findall(f.read()))
+    return sorted(seen)
+
+
+def expand_inputs(patterns):
+    """Concrete input files, and the patterns that matched nothing."""
+    files, missing = [], []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            missing.append(pattern)
+        files.extend(matches)
+    return files, missing
+
+
+def stage_key(stage, extra_args, file_hash):
+    """Digest of everything a stage's outputs depend on, or None if inputs are missing."""
+    inputs, missing = expand_inputs(stage['inputs'])
+    if missing:
+        return None, missing
+    optional, _ = expand_inputs(stage.get('optional_inputs', []))
+    h = hashlib.sha256()
+    for path in local_modules(stage['script']) + inputs + optional:
+        h.update(os.path.relpath(path, ROOT).encode())
+        h.update(file_hash(path).encode())
+    h.update(json.dumps(extra_args).encode())
+    return h.hexdigest(), []
+
+
+# ============================================================
+# Running
+# ============================================================
+def run_stage(name, extra_args, report_path=None):
+    script = os.path.join(SCRIPTS_DIR, STAGES[name]['script'])
+    # The report flag is not part of extra_args, so it never changes the stage key
+    report_args = ['--report', report_path] if report_path else []
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, script, *extra_args, *report_args], capture_output=True, text=True)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the Harrow data pipeline, skipping up-to-date stages.')
+    parser.add_argument('stages', nargs='*', metavar='STAGE',
+                        help=f"stages to run: {', '.join(STAGES)} (default: all); their dependencies are included")
+    parser.add_argument('--force', action='store_true', help='rerun stages even if up to date')
+    parser.add_argument('--dry-run', action='store_true', help='only report what would run')
+    parser.add_argument('--jobs', type=int, default=len(STAGES), help='stages run concurrently (default: all)')
+    parser.add_argument('--report-dir', metavar='DIR',
+                        help='have each stage that runs write a JSON run report (<stage>-<timestamp>.json) into DIR')
+    for name in STAGES:
+        parser.add_argument(f'--{name}-args', default='', metavar='ARGS',
+                            help=f'extra arguments for {STAGES[name]["script"]}, e.g. --{name}-args="--flag"')
+    args = parser.parse_args()
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    deps = stage_dependencies()
+    selected = set(args.stages or STAGES)
+    while True:
+        expanded = selected | {d for s in selected for d in deps[s]}
+        if expanded == selected:
+            break
+        selected = expanded
+    extra_args = {name: shlex.split(getattr(args, f'{name}_args')) for name in STAGES}
+
+    state = {'files': {}, 'stages': {}}
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE) as f:
+            state = json.load(f)
+    file_hash = FileHasher(state['files'])
+
+    def is_current(name):
+        key, missing = stage_key(STAGES[name], extra_args[name], file_hash)
+        outputs = STAGES[name]['outputs']
+        record = state['stages'].get(name)
+        if key is None:
+            # Raw inputs not available locally: keep the committed outputs
+            if all(os.path.exists(p) for p in outputs):
+                print(f"  {name}: inputs missing ({', '.join(os.path.relpath(m, ROOT) for m in missing)}), "
+                      f"using existing outputs")
+                return True, None
+            raise SystemExit(f"{name}: missing inputs {missing} and no existing outputs")
+        # Every required output, and every optional one the last run wrote, must be intact
+        written = set(record['outputs']) if record else set()
+        expected = set(outputs) | (written & set(STAGES[name]['optional_outputs']))
+        current = (
+            not args.force and record is not None and record['key'] == key and
+            all(os.path.exists(p) and file_hash(p) == record['outputs'].get(p) for p in expected)
+        )
+        return current, key
+
+    pending = {name for name in STAGES if name in selected}
+    done, failed = set(), set()
+    running = {}
+
+    def save_state():
+        tmp_path = STATE_FILE + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, STATE_FILE)
+
+    run_id = time.strftime('%Y%m%dT%H%M%S')
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        while pending or running:
+            # Stages whose dependencies finished are checked in DAG order
+            for name in sorted(pending):
+                if not deps[name] <= done:
+                    if deps[name] & failed:
+                        pending.discard(name)
+                        failed.add(name)
+                        print(f"  {name}: skipped (dependency failed)")
+                    continue
+                pending.discard(name)
+                current, key = is_current(name)
+                if current:
+                    if key is not None:
+                        print(f"  {name}: up to date")
+                    done.add(name)
+                elif args.dry_run:
+                    print(f"  {name}: would run")
+                    done.add(name)
+                else:
+                    print(f"  {name}: running {STAGES[name]['script']}")
+                    report_path = os.path.join(args.report_dir, f'{name}-{run_id}.json') if args.report_dir else None
+                    running[pool.submit(run_stage, name, extra_args[name], report_path)] = (name, key, report_path)
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, key, report_path = running.pop(future)
+                result, elapsed = future.result()
+                if result.returncode != 0:
+                    failed.add(name)
+                    print(f"  {name}: FAILED after {elapsed:.1f}s\n{result.stdout}{result.stderr}")
+                    continue
+                done.add(name)
+                state['stages'][name] = {
+                    'key': key,
+                    'outputs': {p: file_hash(p) for p in STAGES[name]['outputs'] + STAGES[name]['optional_outputs']
+                                if os.path.exists(p)},
+                    'seconds': round(elapsed, 2),
+                }
+                if report_path:
+                    state['stages'][name]['report'] = report_path
+                save_state()
+                print(f"  {name}: done in {elapsed:.1f}s")
+
+    if not args.dry_run:
+        save_state()
+    print(f"\nPipeline finished in {time.perf_counter() - start:.2f}s")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
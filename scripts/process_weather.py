@@ -1,19 +1,72 @@
 #!/usr/bin/env python3
 """
 Process GHCN-Daily weather data into county-level seasonal aggregates.
-Maps stations to counties, then aggregates daily weather to growing-season metrics.
+Maps stations to states (and to counties when boundaries are available), then
+aggregates daily weather to growing-season metrics per state-year, and with
+--county-weather per county-year.
 """
 
 import pandas as pd
 import numpy as np
+import argparse
 import json
 import os
 import glob
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'Data')
-OUT_DIR = os.path.join(os.path.dirname(__file__), '..', 'public', 'data')
+import duckdb_backend
+import instrument
+import jsonout
+from ghcn_ingest import YearCache, filter_key, fork_context, read_year, read_years_parallel, station_dtype
+from normals_store import NormalsStore, monthly_normals as combine_normals, normal_accumulators, parse_years
+from season_features import WINDOWS, parse_window
+from spatial_index import assign_stations
+from weather_cube import CubeWriter
+from weather_metrics import SEASONS, county_year_metrics, pivot_daily, state_year_metrics as compute_state_year_metrics
+
+# HARROW_DATA_DIR / HARROW_OUT_DIR point the script at other inputs/outputs (e.g. synthetic data)
+DATA_DIR = os.environ.get('HARROW_DATA_DIR', os.path.join(os.path.dirname(__file__), '..', 'Data'))
+OUT_DIR = os.environ.get('HARROW_OUT_DIR', os.path.join(os.path.dirname(__file__), '..', 'public', 'data'))
 os.makedirs(OUT_DIR, exist_ok=True)
 
+parser = argparse.ArgumentParser(description='Process GHCN-Daily weather data into JSON files for the frontend.')
+parser.add_argument('--cache-dir', default=os.path.join(DATA_DIR, 'ghcn_cache'),
+                    help='where filtered yearly rows are cached (default: Data/ghcn_cache)')
+parser.add_argument('--no-cache', action='store_true',
+                    help='always re-parse the yearly CSVs and leave the cache and normals store untouched')
+parser.add_argument('--workers', type=int, default=1,
+                    help='processes used to read uncached years in parallel (default: 1, serial; needs the fork '
+                         'start method, so it is serial on Windows)')
+parser.add_argument('--streaming', action='store_true',
+                    help='pivot and reduce each year as it is read instead of holding every year in memory')
+parser.add_argument('--counties', default=os.path.join(DATA_DIR, 'counties-10m.json'),
+                    help='county boundaries (GeoJSON/TopoJSON) for station-to-county assignment '
+                         '(default: Data/counties-10m.json; skipped if missing)')
+parser.add_argument('--county-weather', action='store_true',
+                    help='also write county_weather_features.json: the state-year metrics for every '
+                         'county-year, from the stations inside each county (needs --counties)')
+parser.add_argument('--cube-dir', metavar='DIR',
+                    help='also persist cleaned daily PRCP/TMAX/TMIN as memory-mapped (station, day) '
+                         'float32 arrays in DIR, e.g. Data/weather_cube')
+parser.add_argument('--normals-store', default=os.path.join(DATA_DIR, 'normals_store'),
+                    help='where per-year monthly normals accumulators are kept (default: Data/normals_store)')
+parser.add_argument('--normals-years', metavar='SPEC',
+                    help='years averaged into monthly_normals.json: FIRST-LAST, or N for the latest N '
+                         '(default: all)')
+parser.add_argument('--window', action='append', default=[], metavar='NAME=M1-M2',
+                    help='extra month window for the seasonal features (GDD, heat days, precip, dry spells), '
+                         'e.g. --window early_season=4-5; may be repeated')
+duckdb_backend.add_arguments(parser, DATA_DIR)
+instrument.add_arguments(parser)
+args = parser.parse_args()
+try:
+    season_windows = {**WINDOWS, **dict(parse_window(w) for w in args.window)}
+except ValueError as err:
+    parser.error(str(err))
+# Crop windows share the registry's window names with the growing seasons
+if set(season_windows) & set(SEASONS):
+    parser.error(f"window names {sorted(SEASONS)} are taken by the growing-season metrics")
+report = instrument.RunReport.from_args('process_weather', args)
+
 # States we care about (from yield data)
 TARGET_STATES = {
     'AL', 'AR', 'CO', 'DE', 'IA', 'IL', 'IN', 'KS', 'KY', 'LA',
@@ -39,6 +92,7 @@ STATE_ABBR_TO_FIPS = {
 # ============================================================
 # 1. Parse station metadata and filter to US stations
 # ============================================================
+report.section('1. Station metadata')
 print("Loading station metadata...")
 stations_file = os.path.join(DATA_DIR, 'ghcnd-stations.txt')
 
@@ -66,203 +120,249 @@ with open(stations_file, 'r') as f:
 stations_df = pd.DataFrame(stations)
 print(f"Found {len(stations_df)} US stations in target states")
 
-# For simplicity, we map stations to states (not counties) since county-level
-# FIPS mapping would require a shapefile spatial join. State-level is sufficient
-# for our analysis since yield data aggregates to state level anyway.
 stations_df['state_fips'] = stations_df['state'].map(STATE_ABBR_TO_FIPS)
 
+# County FIPS via a grid-indexed point-in-polygon join against local county
+# boundaries (e.g. us-atlas counties-10m.json), cached next to the station file.
+# Only the county weather and the cube's station table use them.
+if args.county_weather and not os.path.exists(args.counties):
+    parser.error(f"--county-weather needs county boundaries; none at {args.counties}")
+if not (args.county_weather or args.cube_dir):
+    stations_df['county_fips'] = None
+elif os.path.exists(args.counties):
+    county_cache = os.path.join(DATA_DIR, 'ghcnd-stations-counties.json')
+    station_counties, cached = assign_stations(stations_df, args.counties, county_cache)
+    stations_df['county_fips'] = stations_df['station_id'].map(station_counties)
+    assigned = stations_df['county_fips'].notna().sum()
+    print(f"Assigned {assigned:,} of {len(stations_df):,} stations to counties"
+          f"{' (cached)' if cached else ''}")
+else:
+    stations_df['county_fips'] = None
+    print(f"No county boundaries at {args.counties}; mapping stations to states only")
+
+report.rows(rows_out=len(stations_df))
+
 # Create station lookup set for fast filtering
 station_set = set(stations_df['station_id'].values)
 station_state_map = dict(zip(stations_df['station_id'], stations_df['state']))
 
+# Daily rows carry station/state as category codes; look states up by station code
+station_categories = station_dtype(station_set).categories
+state_dtype = pd.CategoricalDtype(sorted(stations_df['state'].unique()))
+station_state_codes = state_dtype.categories.get_indexer(station_categories.map(station_state_map))
+county_dtype = None
+if args.county_weather:
+    # Stations outside every county get code -1 (missing) and drop out of the county metrics
+    station_county_map = dict(zip(stations_df['station_id'], stations_df['county_fips']))
+    county_dtype = pd.CategoricalDtype(sorted(stations_df['county_fips'].dropna().unique()))
+    station_county_codes = county_dtype.categories.get_indexer(station_categories.map(station_county_map))
+
 # ============================================================
 # 2. Process yearly GHCN files
 # ============================================================
+report.section('2. Yearly GHCN files')
 print("\nProcessing GHCN daily files...")
 
-# GHCN daily CSV columns: STATION, DATE, ELEMENT, DATA_VALUE, M_FLAG, Q_FLAG, S_FLAG, OBS_TIME
-# DATA_VALUE units: PRCP in tenths of mm, TMAX/TMIN in tenths of degrees C
-
-ELEMENTS = {'PRCP', 'TMAX', 'TMIN'}
-
-all_records = []
 ghcn_dir = os.path.join(DATA_DIR, 'ghcn_by_year')
+# The DuckDB backend scans the raw CSVs itself and bypasses the yearly cache
+use_duckdb = args.backend == 'duckdb'
+cache = None if args.no_cache or use_duckdb else YearCache(args.cache_dir, station_set)
 
+year_files = {}
 for year in range(2010, 2025):
     filepath = os.path.join(ghcn_dir, f'{year}.csv')
     if not os.path.exists(filepath):
         print(f"  Skipping {year} - file not found")
         continue
-
+    year_files[year] = filepath
+pandas_years = {} if use_duckdb else year_files
+
+# Only check the cache here; each cached year is loaded when the loop reaches it
+cached_years = {year for year, filepath in pandas_years.items() if cache and cache.is_current(year, filepath)}
+
+# Years that must be parsed, read serially or across a process pool (a bounded window of years)
+to_read = {year: path for year, path in pandas_years.items() if year not in cached_years}
+parallel = args.workers > 1 and bool(to_read)
+if parallel and fork_context() is None:
+    print("  --workers needs the 'fork' start method, which this platform lacks; reading serially")
+    parallel = False
+if parallel:
+    fresh = read_years_parallel(to_read, station_set, args.workers)
+else:
+    fresh = ((year, *read_year(path, station_set)) for year, path in to_read.items())
+
+# Normals accumulators are only computed for years missing from the store
+try:
+    normal_years = parse_years(args.normals_years, year_files)
+except ValueError as err:
+    parser.error(str(err))
+if year_files and not normal_years:
+    parser.error(f"no GHCN years match --normals-years {args.normals_years!r} "
+                 f"(available: {min(year_files)}-{max(year_files)})")
+
+normals_store = None if args.no_cache else NormalsStore(args.normals_store, filter_key(station_set))
+stale_normal_years = [year for year, path in year_files.items()
+                      if normals_store is None or not normals_store.is_current(year, path)]
+
+# Optional station × day feature store, filled from every pivoted slice
+cube = None
+if args.cube_dir and year_files:
+    cube_stations = stations_df.set_index('station_id').loc[station_categories].reset_index(names='station_id')
+    cube = CubeWriter(args.cube_dir, cube_stations, list(year_files))
+
+# Streaming mode reduces each year right away; batch mode keeps the daily rows
+all_records = []
+state_year_records = []
+county_year_records = []
+normal_parts = []
+pivoted_rows = []
+total_records = 0
+total_rows_read = 0
+
+
+def reduce_pivoted(pivoted):
+    """Fold pivoted station-days into the state-year (and county-year) and normals results."""
+    pivoted_rows.append(len(pivoted))
+    if cube is not None:
+        cube.add(pivoted)
+    state_year_records.extend(compute_state_year_metrics(pivoted, STATE_ABBR_TO_FIPS, season_windows))
+    if county_dtype is not None:
+        counties = pd.Categorical.from_codes(station_county_codes[pivoted['station'].cat.codes], dtype=county_dtype)
+        county_year_records.extend(county_year_metrics(pivoted.assign(county=counties), season_windows))
+    stale = pivoted['year'].isin(stale_normal_years)
+    if stale.any():
+        normal_parts.append(normal_accumulators(pivoted if stale.all() else pivoted[stale]))
+
+
+def reduce_daily(records):
+    """Pivot daily rows and fold them into the state-year and normals results."""
+    reduce_pivoted(pivot_daily(records))
+
+
+if use_duckdb:
+    # Filtering and the pivot run as SQL; only station-days come back to pandas
+    con = duckdb_backend.connect(args)
+    sql_stations = pd.DataFrame({'station_id': station_categories,
+                                 'state': station_categories.map(station_state_map)})
+    batches = [[year] for year in year_files] if args.streaming else [list(year_files)]
+    for years in batches:
+        label = str(years[0]) if len(years) == 1 else f"{years[0]}-{years[-1]}"
+        print(f"  Processing {label} with DuckDB...", end='', flush=True)
+        pivoted = duckdb_backend.read_pivoted(con, [year_files[y] for y in years], sql_stations, state_dtype)
+        total_records += len(pivoted)
+        print(f" {len(pivoted):,} station-days")
+        reduce_pivoted(pivoted)
+        del pivoted
+
+for year, filepath in pandas_years.items():
     print(f"  Processing {year}...", end='', flush=True)
 
-    # Read in chunks to manage memory
-    chunks = pd.read_csv(
-        filepath,
-        header=None,
-        names=['station', 'date', 'element', 'value', 'm_flag', 'q_flag', 's_flag', 'obs_time'],
-        dtype={'station': str, 'date': str, 'element': str, 'value': float},
-        usecols=['station', 'date', 'element', 'value', 'q_flag'],
-        chunksize=2_000_000,
-    )
-
-    year_records = []
-    rows_processed = 0
-
-    for chunk in chunks:
-        rows_processed += len(chunk)
-        # Filter to our stations and elements
-        mask = (
-            chunk['station'].isin(station_set) &
-            chunk['element'].isin(ELEMENTS) &
-            (chunk['q_flag'].isna() | (chunk['q_flag'] == ''))  # quality check passed
-        )
-        filtered = chunk[mask].copy()
-
-        if len(filtered) > 0:
-            filtered['state'] = filtered['station'].map(station_state_map)
-            filtered['date'] = pd.to_datetime(filtered['date'], format='%Y%m%d')
-            filtered['month'] = filtered['date'].dt.month
-            year_records.append(filtered[['station', 'state', 'date', 'month', 'element', 'value']])
-
-    if year_records:
-        year_df = pd.concat(year_records, ignore_index=True)
-        all_records.append(year_df)
-        print(f" {len(year_df):,} records from {rows_processed:,} rows")
+    cached = cache.load(year, filepath) if year in cached_years else None
+    if cached is not None:
+        year_df, rows_processed = cached
+        cached = None
+        source = ' (cached)'
+    elif year in cached_years:
+        # The source changed since the check; parse it here
+        year_df, rows_processed = read_year(filepath, station_set)
+        source = ''
+        cache.store(year, filepath, year_df, rows_processed)
     else:
-        print(f" no matching records")
+        _, year_df, rows_processed = next(fresh)
+        source = ''
+        if cache:
+            cache.store(year, filepath, year_df, rows_processed)
+
+    if year_df is not None:
+        year_df.insert(1, 'state', pd.Categorical.from_codes(
+            station_state_codes[year_df['station'].cat.codes], dtype=state_dtype))
+        total_records += len(year_df)
+        total_rows_read += rows_processed
+        print(f" {len(year_df):,} records from {rows_processed:,} rows{source}")
+        if args.streaming:
+            reduce_daily(year_df)
+            year_df = None  # only one year is held at a time
+        else:
+            all_records.append(year_df)
+    else:
+        print(f" no matching records{source}")
 
-if not all_records:
+if total_records == 0:
     print("No weather data found! Exiting.")
     exit(1)
 
-weather_df = pd.concat(all_records, ignore_index=True)
-print(f"\nTotal weather records: {len(weather_df):,}")
+print(f"\nTotal weather records: {total_records:,}")
+report.rows(rows_in=total_rows_read, rows_out=total_records)
 
 # ============================================================
 # 3. Pivot elements to columns and convert units
 # ============================================================
-print("\nPivoting and converting units...")
-
-# Pivot: one row per (station, state, date) with PRCP, TMAX, TMIN columns
-pivoted = weather_df.pivot_table(
-    index=['station', 'state', 'date', 'month'],
-    columns='element',
-    values='value',
-    aggfunc='mean'  # handle rare duplicates
-).reset_index()
-
-# Convert units
-if 'PRCP' in pivoted.columns:
-    pivoted['PRCP'] = pivoted['PRCP'] / 10.0  # tenths of mm → mm
-if 'TMAX' in pivoted.columns:
-    pivoted['TMAX'] = pivoted['TMAX'] / 10.0  # tenths of °C → °C
-if 'TMIN' in pivoted.columns:
-    pivoted['TMIN'] = pivoted['TMIN'] / 10.0
-
-pivoted['year'] = pivoted['date'].dt.year
-
-print(f"Pivoted: {len(pivoted):,} daily station records")
+# In streaming mode (and with DuckDB) the pivot and the metrics already ran inside section 2
+report.section('3. Pivot', rows_in=total_records if all_records else None)
+pivoted = None
+if all_records:
+    print("\nPivoting and converting units...")
+    weather_df = pd.concat(all_records, ignore_index=True)
+    del all_records
+    print(f"Daily table: {weather_df.memory_usage(deep=True).sum() / 1e6:,.1f} MB")
+    pivoted = pivot_daily(weather_df)
+    del weather_df
+    report.rows(rows_out=len(pivoted))
 
 # ============================================================
 # 4. Aggregate to state-level growing season metrics
 # ============================================================
-print("\nComputing state-level growing season metrics...")
-
-# Growing season: April (4) through September (9)
-growing = pivoted[(pivoted['month'] >= 4) & (pivoted['month'] <= 9)].copy()
-
-# Summer months for heat stress: June (6) through August (8)
-summer = pivoted[(pivoted['month'] >= 6) & (pivoted['month'] <= 8)].copy()
-
-state_year_metrics = []
-
-for (state, year), group in growing.groupby(['state', 'year']):
-    metrics = {
-        'state': state,
-        'state_fips': STATE_ABBR_TO_FIPS.get(state, ''),
-        'year': int(year),
-    }
-
-    # Average temperature during growing season
-    if 'TMAX' in group.columns and 'TMIN' in group.columns:
-        tmax_vals = group['TMAX'].dropna()
-        tmin_vals = group['TMIN'].dropna()
-        if len(tmax_vals) > 0 and len(tmin_vals) > 0:
-            metrics['growing_season_avg_temp'] = round(((tmax_vals.mean() + tmin_vals.mean()) / 2), 1)
-            metrics['growing_season_max_temp'] = round(tmax_vals.max(), 1)
-            metrics['growing_season_min_temp'] = round(tmin_vals.min(), 1)
-
-    # Total precipitation during growing season (state average)
-    if 'PRCP' in group.columns:
-        # Sum per station, then average across stations
-        station_precip = group.groupby('station')['PRCP'].sum()
-        metrics['growing_season_precip_mm'] = round(station_precip.mean(), 1)
-        metrics['growing_season_precip_std'] = round(station_precip.std(), 1) if len(station_precip) > 1 else 0
-
-    # Heat stress days: days with TMAX > 35°C (95°F)
-    if 'TMAX' in group.columns:
-        summer_group = summer[(summer['state'] == state) & (summer['year'] == year)]
-        if len(summer_group) > 0:
-            heat_days = summer_group.groupby('station')['TMAX'].apply(lambda x: (x > 35).sum())
-            metrics['heat_stress_days'] = round(heat_days.mean(), 1)
-
-    # Drought proxy: longest dry spell (consecutive days with PRCP < 1mm) per station average
-    if 'PRCP' in group.columns:
-        dry_spells = []
-        for station, sgroup in group.groupby('station'):
-            prcp = sgroup.sort_values('date')['PRCP'].values
-            max_spell = 0
-            current = 0
-            for p in prcp:
-                if p < 1.0:
-                    current += 1
-                    max_spell = max(max_spell, current)
-                else:
-                    current = 0
-            dry_spells.append(max_spell)
-        metrics['max_dry_spell_days'] = round(np.mean(dry_spells), 1) if dry_spells else 0
-
-    # Heavy rain events: days with PRCP > 50mm
-    if 'PRCP' in group.columns:
-        heavy_rain = group.groupby('station')['PRCP'].apply(lambda x: (x > 50).sum())
-        metrics['heavy_rain_days'] = round(heavy_rain.mean(), 1)
-
-    state_year_metrics.append(metrics)
-
-weather_features_df = pd.DataFrame(state_year_metrics)
+report.section('4. State-year metrics', rows_in=None if pivoted is None else len(pivoted))
+if pivoted is not None:
+    print("Computing state-level growing season metrics...")
+    reduce_pivoted(pivoted)
+    del pivoted
+
+print(f"Pivoted: {sum(pivoted_rows):,} daily station records")
+if cube is not None:
+    manifest = cube.close()
+    n_stations, n_days = manifest['shape']
+    print(f"Weather cube: {n_stations:,} stations × {n_days:,} days written to {args.cube_dir}")
+
+# Streaming mode yields records year by year; restore (state, year) order
+state_year_records.sort(key=lambda m: (m['state'], m['year']))
+weather_features_df = pd.DataFrame(state_year_records)
 print(f"Generated {len(weather_features_df)} state-year weather records")
+if args.county_weather:
+    county_year_records.sort(key=lambda m: (m['fips'], m['year']))
+    print(f"Generated {len(county_year_records)} county-year weather records")
+report.rows(rows_out=len(weather_features_df))
 
 # ============================================================
 # 5. Monthly normals per state (for month selector on map)
 # ============================================================
+report.section('5. Monthly normals', rows_in=sum(len(part) for part in normal_parts))
 print("\nComputing monthly normals...")
 
-monthly_normals = {}
-for (state, month), group in pivoted.groupby(['state', 'month']):
-    normals = {}
-    if 'TMAX' in group.columns:
-        normals['avg_high'] = round(group['TMAX'].mean(), 1)
-    if 'TMIN' in group.columns:
-        normals['avg_low'] = round(group['TMIN'].mean(), 1)
-    if 'PRCP' in group.columns:
-        # Average daily precip × ~30 for monthly total
-        normals['avg_precip_mm'] = round(group['PRCP'].mean() * 30, 1)
-    if 'TMAX' in group.columns and 'TMIN' in group.columns:
-        normals['avg_temp'] = round((group['TMAX'].mean() + group['TMIN'].mean()) / 2, 1)
-
-    if state not in monthly_normals:
-        monthly_normals[state] = {}
-    monthly_normals[state][int(month)] = normals
+fresh_normals = pd.concat(normal_parts) if normal_parts else None
+if normals_store is not None:
+    if fresh_normals is not None:
+        for year, acc in fresh_normals.groupby(level='year'):
+            normals_store.store(year, year_files[year], acc)
+    stored_years = [year for year in normal_years if normals_store.is_current(year, year_files[year])]
+    normal_acc = normals_store.load(stored_years)
+else:
+    normal_acc = fresh_normals
+n_fresh = 0 if fresh_normals is None else fresh_normals.index.get_level_values('year').nunique()
+print(f"  {n_fresh} years folded into the accumulators, normals over {len(normal_years)} years")
+
+monthly_normals = combine_normals(normal_acc, normal_years)
 
 # ============================================================
 # 6. Export JSON files
 # ============================================================
+report.section('6. Export JSON', rows_in=len(weather_features_df))
 print("\nExporting JSON files...")
 
-# Weather features (state-year level)
+# Weather features (state-year level); rows and per-state slices come from the columns
+columns = {c: weather_features_df[c].to_numpy() for c in weather_features_df.columns}
 with open(os.path.join(OUT_DIR, 'weather_features.json'), 'w') as f:
-    json.dump(weather_features_df.to_dict(orient='records'), f)
+    jsonout.dump(jsonout.array(jsonout.records(columns)), f)
 print(f"  weather_features.json: {len(weather_features_df)} records")
 
 # Monthly normals
@@ -270,16 +370,26 @@ with open(os.path.join(OUT_DIR, 'monthly_normals.json'), 'w') as f:
     json.dump(monthly_normals, f)
 print(f"  monthly_normals.json: {len(monthly_normals)} states")
 
-# State-year data as nested dict for easy frontend lookup
-weather_by_state = {}
-for _, row in weather_features_df.iterrows():
-    state = row['state']
-    if state not in weather_by_state:
-        weather_by_state[state] = []
-    weather_by_state[state].append({k: v for k, v in row.items() if k not in ['state', 'state_fips'] and pd.notna(v)})
+# State-year data as nested dict for easy frontend lookup; rows are in (state, year) order
+states = columns['state']
+starts = np.flatnonzero(np.r_[True, states[1:] != states[:-1]])
+ends = np.append(starts[1:], len(states))
+state_rows = jsonout.records({c: v for c, v in columns.items() if c not in ['state', 'state_fips']},
+                             skip_missing=True)
+weather_by_state = dict(zip(states[starts].tolist(), jsonout.split(state_rows, starts, ends)))
 
 with open(os.path.join(OUT_DIR, 'weather_by_state.json'), 'w') as f:
-    json.dump(weather_by_state, f)
+    jsonout.dump(weather_by_state, f)
 print(f"  weather_by_state.json: {len(weather_by_state)} states")
 
+# County-year metrics; metrics a county's stations do not report are left out
+if args.county_weather:
+    county_df = pd.DataFrame(county_year_records)
+    county_columns = {c: county_df[c].to_numpy() for c in county_df.columns}
+    with open(os.path.join(OUT_DIR, 'county_weather_features.json'), 'w') as f:
+        jsonout.dump(jsonout.array(jsonout.records(county_columns, skip_missing=True)), f)
+    print(f"  county_weather_features.json: {len(county_df)} records, "
+          f"{county_df['fips'].nunique() if len(county_df) else 0} counties")
+
 print("\nWeather processing complete!")
+report.finish()
@@ -3,200 +3,328 @@
 
 import pandas as pd
 import numpy as np
+import argparse
 import json
 import os
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'Data')
-OUT_DIR = os.path.join(os.path.dirname(__file__), '..', 'public', 'data')
+import anomaly_scores
+import duckdb_backend
+import instrument
+import jsonout
+from columnar import columns_columnar, county_yields_columnar, write_json
+from yield_shards import write_shards
+from yield_cube import build_cube, mean, row_means, series_stats, std
+
+# HARROW_DATA_DIR / HARROW_OUT_DIR point the script at other inputs/outputs (e.g. synthetic data)
+DATA_DIR = os.environ.get('HARROW_DATA_DIR', os.path.join(os.path.dirname(__file__), '..', 'Data'))
+OUT_DIR = os.environ.get('HARROW_OUT_DIR', os.path.join(os.path.dirname(__file__), '..', 'public', 'data'))
 os.makedirs(OUT_DIR, exist_ok=True)
 
-# Load yield data
-df = pd.read_csv(
-    os.path.join(DATA_DIR, 'RMACountyYieldsReport-399.csv'),
-    skipinitialspace=True
-)
+parser = argparse.ArgumentParser(description='Process RMA county yield data into JSON files for the frontend.')
+parser.add_argument('--anomaly-mode', choices=anomaly_scores.MODES, default='zscore',
+                    help='baseline for county anomalies: group mean/std, median/MAD, or linear trend (default: '
+                         'zscore, which writes mean_yield; the others write baseline_yield and name it in baseline)')
+parser.add_argument('--anomaly-threshold', type=float, default=1.5,
+                    help='flag county-years whose |score| exceeds this (default: 1.5)')
+parser.add_argument('--anomaly-top-k', type=int, default=None,
+                    help='keep only the K strongest anomalies (default: all)')
+parser.add_argument('--columnar', action=argparse.BooleanOptionalAction, default=True,
+                    help='also write struct-of-arrays *.columnar.json for county yields and anomalies, which '
+                         'the frontend loads in place of the row files (default: on; --no-columnar removes them)')
+parser.add_argument('--shards', choices=['state', 'crop'], default=None,
+                    help='also split county yields into public/data/county_yields/ shards per state, '
+                         'or per state and crop, with a manifest.json index')
+duckdb_backend.add_arguments(parser, DATA_DIR)
+instrument.add_arguments(parser)
+args = parser.parse_args()
+report = instrument.RunReport.from_args('process_yields', args)
+
+
+def group_bounds(*keys):
+    """(starts, ends) of each run of equal keys in arrays already sorted by them."""
+    n = len(keys[0])
+    change = np.zeros(n, dtype=bool)
+    change[:1] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    starts = np.flatnonzero(change)
+    ends = np.append(starts[1:], n)
+    return starts, ends
 
-# Clean column names
-df.columns = df.columns.str.strip()
 
-# Build FIPS codes
-df['State Code'] = df['State Code'].astype(str).str.zfill(2)
-df['County Code'] = df['County Code'].astype(str).str.zfill(3)
-df['FIPS'] = df['State Code'] + df['County Code']
+# Load yield data
+report.section('Load RMA yields')
+yields_csv = os.path.join(DATA_DIR, 'RMACountyYieldsReport-399.csv')
+if args.backend == 'duckdb':
+    # DuckDB parses the CSV once, cleans it the same way and keeps it for the cube
+    con = duckdb_backend.connect(args)
+    df = duckdb_backend.load_yields(con, yields_csv)
+else:
+    df = pd.read_csv(yields_csv, skipinitialspace=True)
+
+    # Clean column names
+    df.columns = df.columns.str.strip()
+
+    # Build FIPS codes
+    df['State Code'] = df['State Code'].astype(str).str.zfill(2)
+    df['County Code'] = df['County Code'].astype(str).str.zfill(3)
+    df['FIPS'] = df['State Code'] + df['County Code']
+
+    # Normalize commodity names
+    df['Commodity Name'] = df['Commodity Name'].str.strip().str.lower()
+report.rows(rows_out=len(df))
 
-# Normalize commodity names
-df['Commodity Name'] = df['Commodity Name'].str.strip().str.lower()
+# ============================================================
+# 0. Aggregate cube (sum/count/var/min/max per state, crop, year)
+# ============================================================
+# The only full scan of the county rows for the state-level outputs;
+# sections 1 and 4 derive everything from these cells.
+report.section('0. Aggregate cube', rows_in=len(df))
+if args.backend == 'duckdb':
+    cube = duckdb_backend.yield_cube(con)
+else:
+    cube = build_cube(df)
+report.rows(rows_out=len(cube))
 
 # ============================================================
 # 1. State Yields (per state, per crop, per year)
 # ============================================================
-state_yields = (
-    df.groupby(['State Abbreviation', 'State Name', 'Commodity Name', 'Yield Year'])
-    ['Yield Amount'].agg(['mean', 'std', 'min', 'max', 'count'])
-    .reset_index()
-)
-state_yields.columns = ['state_abbr', 'state_name', 'crop', 'year', 'avg_yield', 'std_yield', 'min_yield', 'max_yield', 'county_count']
+report.section('1. State yields', rows_in=len(cube))
+state_yields = pd.DataFrame({
+    'state_abbr': cube['state_abbr'],
+    'state_name': cube['state_name'],
+    'crop': cube['crop'],
+    'year': cube['year'],
+    'avg_yield': mean(cube),
+    'std_yield': std(cube),
+    'min_yield': cube['min'],
+    'max_yield': cube['max'],
+    'county_count': cube['count'],
+})
 state_yields = state_yields.round(2)
 
 # Convert to nested dict: { state_abbr: { crop: [ {year, avg_yield, ...} ] } }
+# Rows are already sorted by (state, crop, year); build every year record
+# from column arrays and slice them at the group boundaries.
+year_records = [
+    {
+        'year': year,
+        'avg_yield': avg,
+        'std_yield': std,
+        'min_yield': lo,
+        'max_yield': hi,
+        'county_count': count,
+    }
+    for year, avg, std, lo, hi, count in zip(
+        state_yields['year'].tolist(),
+        state_yields['avg_yield'].tolist(),
+        state_yields['std_yield'].astype(object).where(state_yields['std_yield'].notna(), 0).tolist(),
+        state_yields['min_yield'].tolist(),
+        state_yields['max_yield'].tolist(),
+        state_yields['county_count'].tolist(),
+    )
+]
+abbrs = state_yields['state_abbr'].to_numpy()
+crops = state_yields['crop'].to_numpy()
+state_names = state_yields['state_name'].to_numpy()
+
 state_yields_dict = {}
-for _, row in state_yields.iterrows():
-    abbr = row['state_abbr']
-    crop = row['crop']
+for start, end in zip(*group_bounds(abbrs, crops)):
+    abbr = abbrs[start]
     if abbr not in state_yields_dict:
-        state_yields_dict[abbr] = {'state_name': row['state_name'], 'crops': {}}
-    if crop not in state_yields_dict[abbr]['crops']:
-        state_yields_dict[abbr]['crops'][crop] = []
-    state_yields_dict[abbr]['crops'][crop].append({
-        'year': int(row['year']),
-        'avg_yield': row['avg_yield'],
-        'std_yield': row['std_yield'] if not np.isnan(row['std_yield']) else 0,
-        'min_yield': row['min_yield'],
-        'max_yield': row['max_yield'],
-        'county_count': int(row['county_count'])
-    })
+        state_yields_dict[abbr] = {'state_name': state_names[start], 'crops': {}}
+    state_yields_dict[abbr]['crops'][crops[start]] = year_records[start:end]
 
 with open(os.path.join(OUT_DIR, 'state_yields.json'), 'w') as f:
     json.dump(state_yields_dict, f)
 
 print(f"state_yields.json: {len(state_yields_dict)} states")
+report.rows(rows_out=len(year_records))
 
 # ============================================================
 # 2. County Yields (per county, per crop, time series)
 # ============================================================
+report.section('2. County yields', rows_in=len(df))
+# One stable sort by (FIPS, crop, year); ties keep their file order
+order = np.lexsort((
+    df['Yield Year'].to_numpy(),
+    df['Commodity Name'].to_numpy(),
+    df['FIPS'].to_numpy(),
+))
+county_rows = df.iloc[order]
+fips_codes = county_rows['FIPS'].to_numpy()
+county_crops = county_rows['Commodity Name'].to_numpy()
+group_starts, group_ends = group_bounds(fips_codes, county_crops)
+
+# Year points are encoded straight from the sorted columns and sliced per series
+point_years = county_rows['Yield Year'].to_numpy()
+point_yields = jsonout.round_values(county_rows['Yield Amount'].to_numpy(), 2)
+yield_points = jsonout.records({'year': point_years, 'yield': point_yields})
+series_points = jsonout.split(yield_points, group_starts, group_ends)
+
+# County metadata comes from the first file row of each county's first crop
+first_rows = np.minimum.reduceat(order, group_starts)
+county_meta = df.iloc[first_rows]
+meta_abbrs = county_meta['State Abbreviation'].tolist()
+meta_states = county_meta['State Name'].str.strip().tolist()
+meta_counties = county_meta['County Name'].str.strip().tolist()
+
 county_yields_dict = {}
-for (fips, crop), group in df.groupby(['FIPS', 'Commodity Name']):
+for i, (start, end) in enumerate(zip(group_starts, group_ends)):
+    fips = fips_codes[start]
     if fips not in county_yields_dict:
-        row = group.iloc[0]
         county_yields_dict[fips] = {
-            'state_abbr': row['State Abbreviation'],
-            'state_name': row['State Name'].strip(),
-            'county_name': row['County Name'].strip(),
+            'state_abbr': meta_abbrs[i],
+            'state_name': meta_states[i],
+            'county_name': meta_counties[i],
             'crops': {}
         }
-    series = group[['Yield Year', 'Yield Amount']].sort_values('Yield Year')
-    county_yields_dict[fips]['crops'][crop] = [
-        {'year': int(r['Yield Year']), 'yield': round(r['Yield Amount'], 2)}
-        for _, r in series.iterrows()
-    ]
+    county_yields_dict[fips]['crops'][county_crops[start]] = series_points[i]
 
 with open(os.path.join(OUT_DIR, 'county_yields.json'), 'w') as f:
-    json.dump(county_yields_dict, f)
+    jsonout.dump(county_yields_dict, f)
 
 print(f"county_yields.json: {len(county_yields_dict)} counties")
+report.rows(rows_out=len(yield_points))
+
+# The shard and columnar writers take plain objects; series follow the group order
+if args.shards or args.columnar:
+    point_objects = [{'year': year, 'yield': value}
+                     for year, value in zip(point_years.tolist(), point_yields.tolist())]
+    spans = iter(zip(group_starts.tolist(), group_ends.tolist()))
+    county_yields_objects = {
+        fips: {**county, 'crops': {crop: point_objects[start:end] for crop, (start, end) in zip(county['crops'], spans)}}
+        for fips, county in county_yields_dict.items()
+    }
+
+if args.shards:
+    manifest, written = write_shards(
+        county_yields_objects, os.path.join(OUT_DIR, 'county_yields'), by_crop=args.shards == 'crop')
+    print(f"county_yields/: {len(manifest['shards'])} shards ({written} rewritten)")
 
 # ============================================================
-# 3. Yield Anomalies (z-score per county-year)
+# 3. Yield Anomalies (score per county-year against its baseline)
 # ============================================================
-anomalies = []
-for (fips, crop), group in df.groupby(['FIPS', 'Commodity Name']):
-    mean_yield = group['Yield Amount'].mean()
-    std_yield = group['Yield Amount'].std()
-    if std_yield == 0 or np.isnan(std_yield):
-        continue
-    for _, row in group.iterrows():
-        z = (row['Yield Amount'] - mean_yield) / std_yield
-        if abs(z) > 1.5:  # flag notable anomalies
-            anomalies.append({
-                'fips': fips,
-                'state_abbr': row['State Abbreviation'],
-                'county': row['County Name'].strip(),
-                'crop': crop,
-                'year': int(row['Yield Year']),
-                'yield': round(row['Yield Amount'], 2),
-                'mean_yield': round(mean_yield, 2),
-                'z_score': round(z, 2),
-                'type': 'high' if z > 0 else 'low'
-            })
-
-# Sort by absolute z-score descending
-anomalies.sort(key=lambda x: abs(x['z_score']), reverse=True)
+report.section('3. Yield anomalies', rows_in=len(df))
+# Rows grouped by (FIPS, crop), keeping file order inside each group
+group_order, starts, counts = anomaly_scores.group_rows(df, ['FIPS', 'Commodity Name'])
+grouped_rows = df.iloc[group_order]
+values = grouped_rows['Yield Amount'].to_numpy(dtype=float)
+z_scores, baseline = anomaly_scores.score(
+    values, grouped_rows['Yield Year'].to_numpy(dtype=float), starts, counts, args.anomaly_mode,
+)
+with np.errstate(invalid='ignore'):
+    flagged = np.flatnonzero(np.abs(z_scores) > args.anomaly_threshold)  # flag notable anomalies
+
+# Strongest first by rounded |z| (stable); top-k only partially sorts
+z_rounded = np.round(z_scores[flagged], 2)
+flagged = flagged[anomaly_scores.top_k(-np.abs(z_rounded), args.anomaly_top_k)]
+z_rounded = np.round(z_scores[flagged], 2)
+
+flagged_rows = grouped_rows.iloc[flagged]
+anomaly_columns = {
+    'fips': flagged_rows['FIPS'].to_numpy(),
+    'state_abbr': flagged_rows['State Abbreviation'].to_numpy(),
+    'county': flagged_rows['County Name'].str.strip().to_numpy(),
+    'crop': flagged_rows['Commodity Name'].to_numpy(),
+    'year': flagged_rows['Yield Year'].to_numpy(),
+    'yield': jsonout.round_values(values[flagged], 2),
+}
+# The default z-score baseline is the county mean; other modes name their statistic.
+# Like z, the baseline was a NumPy scalar, whose round() is np.round
+if args.anomaly_mode == 'zscore':
+    anomaly_columns['mean_yield'] = np.round(baseline[flagged], 2)
+else:
+    anomaly_columns['baseline_yield'] = np.round(baseline[flagged], 2)
+    anomaly_columns['baseline'] = np.full(len(flagged), anomaly_scores.BASELINES[args.anomaly_mode], dtype=object)
+anomaly_columns['z_score'] = z_rounded
+anomaly_columns['type'] = np.where(z_scores[flagged] > 0, 'high', 'low').astype(object)
+anomaly_records = jsonout.records(anomaly_columns)
 
 with open(os.path.join(OUT_DIR, 'yield_anomalies.json'), 'w') as f:
-    json.dump(anomalies, f)
+    jsonout.dump(jsonout.array(anomaly_records), f)
 
-print(f"yield_anomalies.json: {len(anomalies)} anomalies flagged")
+print(f"yield_anomalies.json: {len(anomaly_records)} anomalies flagged "
+      f"({args.anomaly_mode}, against the county {anomaly_scores.BASELINES[args.anomaly_mode]})")
+report.rows(rows_out=len(anomaly_records))
 
 # ============================================================
-# 4. State Summaries (for tooltips and helper)
+# 4. State Summaries (for tooltips and helper) and Planting Guide
+#    (for plant helper context), built in one pass over the series
 # ============================================================
+report.section('4. State summaries and planting guide', rows_in=len(state_yields))
+# Year series per (state, crop) are the cube's state-year rows in order
+series_starts, series_ends = group_bounds(abbrs, crops)
+series = series_stats(state_yields, 'avg_yield', series_starts, series_ends)
+series_years = state_yields['year'].to_numpy()
+series_yields = state_yields['avg_yield'].to_numpy()
+
 state_summaries = {}
-for abbr, state_data in state_yields_dict.items():
-    summary = {
-        'state_name': state_data['state_name'],
-        'crops': {}
+planting_guide = {}
+crop_means = {}
+for i, (start, end) in enumerate(zip(series_starts, series_ends)):
+    abbr, crop = abbrs[start], crops[start]
+    if abbr not in state_summaries:
+        state_summaries[abbr] = {'state_name': state_names[start], 'crops': {}}
+        planting_guide[abbr] = {'state_name': state_names[start], 'crops': {}}
+        crop_means[abbr] = {}
+
+    years = year_records[start:end]
+    yields = series_yields[start:end]
+    year_nums = series_years[start:end]
+    avg, spread, count = series['mean'][i], series['std'][i], series['count'][i]
+    trend = series['slope'][i] if count > 2 else 0
+    crop_means[abbr][crop] = avg
+
+    recent = yields[year_nums >= 2020]
+    state_summaries[abbr]['crops'][crop] = {
+        'avg_yield': round(avg, 1),
+        'recent_avg': round(np.mean(recent), 1) if len(recent) else round(avg, 1),
+        'best_year': int(year_nums[np.argmax(yields)]),
+        'worst_year': int(year_nums[np.argmin(yields)]),
+        'best_yield': round(float(yields.max()), 1),
+        'worst_yield': round(float(yields.min()), 1),
+        'trend_per_year': round(trend, 2),
+        'variability': round(spread, 1)
     }
-    best_crop = None
-    best_yield = 0
 
-    for crop, years in state_data['crops'].items():
-        yields = [y['avg_yield'] for y in years]
-        recent = [y['avg_yield'] for y in years if y['year'] >= 2020]
-        trend = np.polyfit([y['year'] for y in years], yields, 1)[0] if len(years) > 2 else 0
-
-        crop_summary = {
-            'avg_yield': round(np.mean(yields), 1),
-            'recent_avg': round(np.mean(recent), 1) if recent else round(np.mean(yields), 1),
-            'best_year': years[np.argmax(yields)]['year'],
-            'worst_year': years[np.argmin(yields)]['year'],
-            'best_yield': round(max(yields), 1),
-            'worst_yield': round(min(yields), 1),
-            'trend_per_year': round(trend, 2),
-            'variability': round(np.std(yields), 1)
-        }
-        summary['crops'][crop] = crop_summary
+    recent_years = [y for y, num in zip(years, year_nums) if num >= 2018]
+    planting_guide[abbr]['crops'][crop] = {
+        'historical_avg': round(avg, 1),
+        'historical_std': round(spread, 1),
+        'trend': round(trend, 2),
+        'best_recent_years': sorted(recent_years, key=lambda y: y['avg_yield'], reverse=True)[:3],
+        'worst_recent_years': sorted(recent_years, key=lambda y: y['avg_yield'])[:3],
+        'year_data': years
+    }
 
-        if np.mean(yields) > best_yield:
-            best_yield = np.mean(yields)
+for abbr, summary in state_summaries.items():
+    # Best crop by (unrounded) mean yield, worst by the rounded summary value
+    best_crop = None
+    best_yield = 0
+    for crop, crop_mean in crop_means[abbr].items():
+        if crop_mean > best_yield:
+            best_yield = crop_mean
             best_crop = crop
-
     summary['best_crop'] = best_crop
-    # Determine worst crop
-    worst_crop = min(summary['crops'].keys(),
-                     key=lambda c: summary['crops'][c]['avg_yield'])
-    summary['worst_crop'] = worst_crop
-
-    state_summaries[abbr] = summary
+    summary['worst_crop'] = min(summary['crops'].keys(),
+                                key=lambda c: summary['crops'][c]['avg_yield'])
 
 with open(os.path.join(OUT_DIR, 'state_summaries.json'), 'w') as f:
     json.dump(state_summaries, f)
 
 print(f"state_summaries.json: {len(state_summaries)} states")
 
-# ============================================================
-# 5. Planting Guide (for plant helper context)
-# ============================================================
-planting_guide = {}
-for abbr, state_data in state_yields_dict.items():
-    planting_guide[abbr] = {
-        'state_name': state_data['state_name'],
-        'crops': {}
-    }
-    for crop, years in state_data['crops'].items():
-        yields = [y['avg_yield'] for y in years]
-        planting_guide[abbr]['crops'][crop] = {
-            'historical_avg': round(np.mean(yields), 1),
-            'historical_std': round(np.std(yields), 1),
-            'trend': round(np.polyfit([y['year'] for y in years], yields, 1)[0], 2) if len(years) > 2 else 0,
-            'best_recent_years': sorted(
-                [y for y in years if y['year'] >= 2018],
-                key=lambda y: y['avg_yield'], reverse=True
-            )[:3],
-            'worst_recent_years': sorted(
-                [y for y in years if y['year'] >= 2018],
-                key=lambda y: y['avg_yield']
-            )[:3],
-            'year_data': years
-        }
-
 with open(os.path.join(OUT_DIR, 'planting_guide.json'), 'w') as f:
     json.dump(planting_guide, f)
 
 print(f"planting_guide.json: {len(planting_guide)} states")
+report.rows(rows_out=len(series_starts))
 
 # ============================================================
-# 6. Extreme Events Summary
+# 5. Extreme Events Summary
 # ============================================================
+report.section('5. Extreme events', rows_in=len(df))
 # Known extreme weather years for US agriculture
 extreme_years = {
     2012: 'Midwest Drought',
@@ -205,29 +333,30 @@ extreme_years = {
     2022: 'Southern Plains Drought',
 }
 
+# Event and state means average the rows like Series.mean(); the overall
+# average is the mean of the per-year grouped means, as before
+crop_year_means = row_means(df, ['Commodity Name', 'Yield Year'])
+state_year_means = row_means(df, ['Commodity Name', 'Yield Year', 'State Abbreviation'])
+state_all_means = row_means(df, ['State Abbreviation', 'Commodity Name'])
+national_means = df.groupby(['Commodity Name', 'Yield Year'])['Yield Amount'].mean()
+
 extreme_events = []
 for year, event_name in extreme_years.items():
-    year_data = df[df['Yield Year'] == year]
-    all_data = df.copy()
-
     for crop in df['Commodity Name'].unique():
-        crop_year = year_data[year_data['Commodity Name'] == crop]
-        crop_all = all_data[all_data['Commodity Name'] == crop]
-
-        if len(crop_year) == 0:
+        if (crop, year) not in crop_year_means.index:
             continue
 
         # Compare this year's avg to overall avg
-        year_avg = crop_year['Yield Amount'].mean()
-        overall_avg = crop_all.groupby('Yield Year')['Yield Amount'].mean().mean()
+        year_avg = crop_year_means[(crop, year)]
+        overall_avg = national_means[crop].mean()
         deviation_pct = ((year_avg - overall_avg) / overall_avg) * 100
 
         # Find most affected states
         state_impacts = []
-        for state, state_group in crop_year.groupby('State Abbreviation'):
-            state_all = crop_all[crop_all['State Abbreviation'] == state]
-            state_avg = state_all['Yield Amount'].mean()
-            state_year_avg = state_group['Yield Amount'].mean()
+        # NumPy scalars, not items()' Python floats: round() differs at ties
+        impacts = state_year_means[(crop, year)]
+        for state, state_year_avg in zip(impacts.index, impacts.to_numpy()):
+            state_avg = state_all_means[(state, crop)]
             state_dev = ((state_year_avg - state_avg) / state_avg) * 100 if state_avg > 0 else 0
             state_impacts.append({
                 'state': state,
@@ -252,4 +381,26 @@ with open(os.path.join(OUT_DIR, 'extreme_events.json'), 'w') as f:
     json.dump(extreme_events, f)
 
 print(f"extreme_events.json: {len(extreme_events)} event-crop combos")
+report.rows(rows_out=len(extreme_events))
+
+# ============================================================
+# 6. Columnar outputs (for the frontend)
+# ============================================================
+report.section('6. Columnar outputs')
+columnar_outputs = ['county_yields.columnar.json', 'yield_anomalies.columnar.json']
+
+if args.columnar:
+    write_json(os.path.join(OUT_DIR, 'county_yields.columnar.json'), county_yields_columnar(county_yields_objects))
+    write_json(os.path.join(OUT_DIR, 'yield_anomalies.columnar.json'), columns_columnar(
+        {key: values.tolist() for key, values in anomaly_columns.items()}, len(anomaly_records),
+        dictionary_columns=('fips', 'state_abbr', 'county', 'crop', 'baseline', 'type')))
+    print(f"{', '.join(columnar_outputs)} written")
+else:
+    # The frontend prefers these, so none may outlive the row files just written
+    stale = [name for name in columnar_outputs if os.path.exists(os.path.join(OUT_DIR, name))]
+    for name in stale:
+        os.remove(os.path.join(OUT_DIR, name))
+    if stale:
+        print(f"Removed stale {', '.join(stale)}")
 print("\nDone! All JSON files written to public/data/")
+report.finish()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Local query service over the pipeline outputs.
+Loads state yields, weather, the planting guide and county yields into
+in-memory indexes keyed by state/crop/year and serves compact JSON slices,
+so clients (e.g. server/api.js) can send keys instead of whole payloads.
+Responses are cached in an LRU and carry ETags for conditional requests.
+
+Usage: python3 scripts/query_service.py [--port 3002]
+
+  GET /context?state=IA&crop=corn   planting guide + yields + weather for a prompt
+  GET /yields?state=IA&crop=corn[&year=2012]
+  GET /weather?state=IA[&year=2012]
+  GET /guide?state=IA[&crop=corn]
+  GET /counties?state=IA[&crop=corn]  or  /counties?fips=19153
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+DATA_DIR = os.environ.get('HARROW_OUT_DIR', os.path.join(os.path.dirname(__file__), '..', 'public', 'data'))
+
+
+class QueryError(Exception):
+    """A request that cannot be answered; carries the HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _load(data_dir, name, default=None):
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+class DataIndex:
+    """Pipeline outputs indexed by (state, crop, year) for constant-time slices."""
+
+    def __init__(self, data_dir):
+        state_yields = _load(data_dir, 'state_yields.json', {})
+        weather_by_state = _load(data_dir, 'weather_by_state.json', {})
+        self.guide = _load(data_dir, 'planting_guide.json', {})
+        self.counties = _load(data_dir, 'county_yields.json', {})
+
+        self.state_names = {abbr: data['state_name'] for abbr, data in state_yields.items()}
+        # (state, crop) -> yearly records, and (state, crop, year) -> record
+        self.yields = {}
+        self.yield_years = {}
+        for abbr, data in state_yields.items():
+            for crop, years in data['crops'].items():
+                self.yields[(abbr, crop)] = years
+                for record in years:
+                    self.yield_years[(abbr, crop, record['year'])] = record
+
+        self.weather = weather_by_state
+        self.weather_years = {
+            (abbr, record['year']): record
+            for abbr, records in weather_by_state.items() for record in records
+        }
+
+        self.counties_by_state = {}
+        for fips, county in self.counties.items():
+            self.counties_by_state.setdefault(county['state_abbr'], []).append(fips)
+
+        # Changes whenever any underlying file does, so ETags never go stale
+        h = hashlib.sha256()
+        for name in ('state_yields.json', 'weather_by_state.json', 'planting_guide.json', 'county_yields.json'):
+            path = os.path.join(data_dir, name)
+            if os.path.exists(path):
+                st = os.stat(path)
+                h.update(f'{name}:{st.st_size}:{st.st_mtime_ns}'.encode())
+        self.version = h.hexdigest()[:16]
+
+    def _state(self, params):
+        state = params.get('state', '').upper()
+        if not state:
+            raise QueryError(400, "missing 'state'")
+        if state not in self.state_names and state not in self.guide and state not in self.weather:
+            raise QueryError(404, f"unknown state {state!r}")
+        return state
+
+    @staticmethod
+    def _year(params):
+        if 'year' not in params:
+            return None
+        try:
+            return int(params['year'])
+        except ValueError:
+            raise QueryError(400, f"bad year {params['year']!r}")
+
+    def yields_slice(self, params):
+        state, crop, year = self._state(params), params.get('crop'), self._year(params)
+        crops = [crop] if crop else sorted(c for s, c in self.yields if s == state)
+        if year is not None:
+            return {c: self.yield_years.get((state, c, year)) for c in crops}
+        return {c: self.yields.get((state, c), []) for c in crops}
+
+    def weather_slice(self, params):
+        state, year = self._state(params), self._year(params)
+        if year is not None:
+            return self.weather_years.get((state, year))
+        return self.weather.get(state, [])
+
+    def guide_slice(self, params):
+        state, crop = self._state(params), params.get('crop')
+        guide = self.guide.get(state)
+        if guide is None:
+            return None
+        if crop and crop != 'general':
+            return guide['crops'].get(crop)
+        return guide
+
+    def counties_slice(self, params):
+        if 'fips' in params:
+            county = self.counties.get(params['fips'].zfill(5))
+            if county is None:
+                raise QueryError(404, f"unknown county {params['fips']!r}")
+            return county
+        state, crop = self._state(params), params.get('crop')
+        result = {}
+        for fips in self.counties_by_state.get(state, []):
+            county = self.counties[fips]
+            if crop:
+                if crop not in county['crops']:
+                    continue
+                county = {**county, 'crops': {crop: county['crops'][crop]}}
+            result[fips] = county
+        return result
+
+    def context(self, params):
+        """Everything the plant helper prompt needs for one state (and crop)."""
+        state = self._state(params)
+        return {
+            'state': state,
+            'state_name': self.state_names.get(state),
+            'guide': self.guide_slice(params),
+            'yields': self.yields_slice({k: v for k, v in params.items() if k != 'year'}),
+            'weather': self.weather_slice({'state': state}),
+        }
+
+
+ROUTES = {
+    '/context': DataIndex.context,
+    '/yields': DataIndex.yields_slice,
+    '/weather': DataIndex.weather_slice,
+    '/guide': DataIndex.guide_slice,
+    '/counties': DataIndex.counties_slice,
+}
+
+
+def make_handler(index, cache_size):
+    @lru_cache(maxsize=cache_size)
+    def render(path, query):
+        """(status, body, etag) for a route and its sorted query parameters."""
+        try:
+            if path not in ROUTES:
+                raise QueryError(404, f"unknown endpoint {path!r}")
+            data = ROUTES[path](index, dict(query))
+            status = 200
+        except QueryError as err:
+            data, status = {'error': str(err)}, err.status
+        body = json.dumps(data, separators=(',', ':')).encode()
+        etag = f'"{index.version}-{hashlib.sha1(body).hexdigest()[:16]}"'
+        return status, body, etag
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == '/health':
+                info = render.cache_info()
+                self._send(200, json.dumps({'version': index.version, 'cache_hits': info.hits,
+                                            'cache_misses': info.misses}).encode())
+                return
+
+            start = time.perf_counter()
+            status, body, etag = render(url.path, tuple(sorted(parse_qsl(url.query))))
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if status == 200 and self.headers.get('If-None-Match') == etag:
+                self._send(304, b'', etag, elapsed_ms)
+            else:
+                self._send(status, body, etag, elapsed_ms)
+
+        def _send(self, status, body, etag=None, elapsed_ms=None):
+            self.send_response(status)
+            if status != 304:
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+            if etag:
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'no-cache')
+            if elapsed_ms is not None:
+                self.send_header('Server-Timing', f'query;dur={elapsed_ms:.3f}')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            if status != 304:
+                self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve indexed slices of the pipeline outputs over HTTP.')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('QUERY_PORT', 3002)))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='directory with the pipeline JSON outputs')
+    parser.add_argument('--cache-size', type=int, default=1024, help='responses kept in the LRU cache')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = DataIndex(args.data_dir)
+    print(f"Indexed {len(index.yields)} state-crop series, {len(index.weather_years)} state-years of weather, "
+          f"{len(index.counties)} counties in {time.perf_counter() - start:.2f}s")
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(index, args.cache_size))
+    print(f"Harrow query service on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
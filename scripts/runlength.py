@@ -0,0 +1,71 @@
+"""
+Vectorized run-length statistics for consecutive-day weather metrics.
+Computes the longest run and the number of runs of a daily condition
+(dry days, heat days, wet days, ...) for every group at once.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def run_stats(group_ids, condition, n_groups=None, min_length=1):
+    """Longest run and run count of True values in each group.
+
+    Rows must be contiguous per group and in time order within a group.
+    Runs never continue across a group boundary. Only runs of at least
+    ``min_length`` rows are counted; the longest run is always reported.
+    Returns (longest, count) integer arrays of length ``n_groups``.
+    """
+    group_ids = np.asarray(group_ids, dtype=np.int64)
+    condition = np.asarray(condition, dtype=bool)
+    if n_groups is None:
+        n_groups = int(group_ids.max()) + 1 if len(group_ids) else 0
+
+    longest = np.zeros(n_groups, dtype=np.int64)
+    count = np.zeros(n_groups, dtype=np.int64)
+    if not condition.any():
+        return longest, count
+
+    # A run starts on a True row whose predecessor is False or in another group
+    new_group = np.ones(len(group_ids), dtype=bool)
+    new_group[1:] = group_ids[1:] != group_ids[:-1]
+    prev_true = np.zeros(len(condition), dtype=bool)
+    prev_true[1:] = condition[:-1]
+    starts = condition & (new_group | ~prev_true)
+
+    run_id = np.cumsum(starts) - 1
+    lengths = np.bincount(run_id[condition], minlength=int(starts.sum()))
+    run_group = group_ids[starts]
+
+    np.maximum.at(longest, run_group, lengths)
+    count += np.bincount(run_group[lengths >= min_length], minlength=n_groups)
+    return longest, count
+
+
+def grouped_runs(frame, keys, order, conditions, min_length=1):
+    """Run statistics for several conditions over every group of ``frame``.
+
+    ``conditions`` maps a name to a boolean Series aligned with ``frame``.
+    Keys are factorized once and rows ordered with a single lexsort on
+    (group code, ``order``); the result has one row
+    per group indexed by ``keys`` with ``{name}_longest`` and ``{name}_runs``
+    columns.
+    """
+    keys = list(keys)
+    grouper = frame.groupby(keys, sort=True, observed=True)
+    codes = grouper.ngroup().to_numpy()
+    index = grouper.size().index
+    n_groups = len(index)
+
+    # Codes follow sorted key order, so one lexsort makes groups contiguous
+    positions = np.lexsort((frame[order].to_numpy(), codes))
+    group_ids = codes[positions]
+
+    columns = {}
+    for name, condition in conditions.items():
+        cond = np.asarray(condition, dtype=bool)[positions]
+        longest, count = run_stats(group_ids, cond, n_groups, min_length)
+        columns[f'{name}_longest'] = longest
+        columns[f'{name}_runs'] = count
+    return pd.DataFrame(columns, index=index)
+
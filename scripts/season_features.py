@@ -0,0 +1,53 @@
+"""
+Crop-specific seasonal weather features for every (state, year).
+Named month windows (corn Apr-Sep, soybeans May-Sep and each crop's
+critical month) are crossed with agronomic metrics: growing degree days,
+heat-stress days, precipitation totals and the longest dry spell. Each
+window × metric pair is a weather_metrics registry entry, evaluated in
+the same pass as the growing-season metrics and with the same station
+rule: every station with a day in the window counts, so a temperature-
+only station adds 0 mm of rain, exactly as in growing_season_precip_mm.
+"""
+
+import numpy as np
+
+# Window name -> (first month, last month), inclusive
+WINDOWS = {
+    'corn_season': (4, 9),
+    'corn_silking': (7, 7),
+    'soybeans_season': (5, 9),
+    'soybeans_pod_fill': (8, 8),
+}
+
+METRICS = ('gdd', 'heat_days', 'precip_mm', 'dry_spell_days')
+
+# Features analyze.py adds for each crop; the rest overlap the growing-season columns
+CROP_FEATURES = {
+    'corn': ['corn_season_gdd', 'corn_silking_heat_days', 'corn_silking_precip_mm'],
+    'soybeans': ['soybeans_season_gdd', 'soybeans_pod_fill_heat_days', 'soybeans_pod_fill_precip_mm'],
+}
+
+# Growing degree days, 86/50 °F method: temperatures clipped to [10, 30] °C
+GDD_BASE = 10.0
+GDD_CAP = 30.0
+HEAT_STRESS_C = 35.0
+DRY_DAY_MM = 1.0
+
+
+def parse_window(text):
+    """'name=4-9' (or 'name=7') -> (name, (4, 9))."""
+    name, sep, months = text.partition('=')
+    first, _, last = months.partition('-')
+    try:
+        window = (int(first), int(last or first))
+    except ValueError:
+        window = None
+    if not sep or not name or window is None or not 1 <= window[0] <= window[1] <= 12:
+        raise ValueError(f"bad window {text!r}, expected NAME=FIRST-LAST months, e.g. early_season=4-5")
+    return name, window
+
+
+def growing_degree_days(tmax, tmin):
+    """Daily GDD from TMAX/TMIN in °C; NaN where either is missing."""
+    with np.errstate(invalid='ignore'):
+        return (np.clip(tmax, GDD_BASE, GDD_CAP) + np.clip(tmin, GDD_BASE, GDD_CAP)) / 2 - GDD_BASE
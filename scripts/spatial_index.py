@@ -0,0 +1,220 @@
+"""
+Station-to-county assignment with a uniform-grid spatial index.
+County boundaries come from a local GeoJSON or TopoJSON file (e.g. the
+us-atlas counties-10m.json the frontend maps are built from). Each grid
+cell lists the counties whose bounding box overlaps it, so a station is
+only tested against a handful of polygons, and every test is a vectorized
+even-odd ray cast over all of a county's edges at once.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from ghcn_ingest import file_hash
+
+# Bump when the assignment rules change
+ASSIGNMENT_VERSION = 1
+
+
+# ============================================================
+# Loading boundaries
+# ============================================================
+def _ring_edges(points):
+    """(n, 4) edges x0, y0, x1, y1 of a ring, closing it if needed."""
+    points = np.asarray(points, dtype=float)[:, :2]
+    if len(points) and not np.array_equal(points[0], points[-1]):
+        points = np.vstack([points, points[:1]])
+    return np.hstack([points[:-1], points[1:]])
+
+
+def _county_fips(obj):
+    props = obj.get('properties') or {}
+    fips = obj.get('id', props.get('GEOID', props.get('FIPS')))
+    return None if fips is None else str(fips).zfill(5)
+
+
+def _geojson_counties(data):
+    features = data['features'] if data['type'] == 'FeatureCollection' else [data]
+    counties = []
+    for feature in features:
+        geometry = feature.get('geometry')
+        fips = _county_fips(feature)
+        if not geometry or fips is None:
+            continue
+        polygons = geometry['coordinates']
+        if geometry['type'] == 'Polygon':
+            polygons = [polygons]
+        elif geometry['type'] != 'MultiPolygon':
+            continue
+        edges = [_ring_edges(ring) for polygon in polygons for ring in polygon]
+        counties.append((fips, np.vstack(edges)))
+    return counties
+
+
+def _topojson_counties(topo):
+    # Quantized topologies store delta-encoded integer positions
+    transform = topo.get('transform')
+    arc_edges = []
+    for arc in topo['arcs']:
+        points = np.asarray(arc, dtype=float)[:, :2]
+        if transform:
+            points = np.cumsum(points, axis=0) * transform['scale'] + transform['translate']
+        arc_edges.append(np.hstack([points[:-1], points[1:]]))
+
+    objects = topo['objects']
+    collection = objects['counties'] if 'counties' in objects else next(iter(objects.values()))
+    counties = []
+    for geometry in collection['geometries']:
+        fips = _county_fips(geometry)
+        if fips is None or geometry.get('type') not in ('Polygon', 'MultiPolygon'):
+            continue
+        polygons = geometry['arcs']
+        if geometry['type'] == 'Polygon':
+            polygons = [polygons]
+        # Rings are sequences of shared arcs (~i means arc i reversed); edge
+        # direction does not matter for an even-odd test, so no stitching
+        arcs = [i if i >= 0 else ~i for polygon in polygons for ring in polygon for i in ring]
+        counties.append((fips, np.vstack([arc_edges[i] for i in arcs])))
+    return counties
+
+
+def load_counties(path):
+    """[(fips, edges)] from a GeoJSON or TopoJSON county boundary file."""
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('type') == 'Topology':
+        return _topojson_counties(data)
+    return _geojson_counties(data)
+
+
+# ============================================================
+# Grid index
+# ============================================================
+class CountyIndex:
+    """Uniform grid over county bounding boxes for point-in-polygon lookups."""
+
+    def __init__(self, counties, cell_size=0.25):
+        counties = [(fips, edges) for fips, edges in counties if len(edges)]
+        self.fips = np.array([fips for fips, _ in counties])
+        self.edges = np.vstack([edges for _, edges in counties])
+        sizes = np.array([len(edges) for _, edges in counties])
+        self.edge_starts = np.concatenate([[0], np.cumsum(sizes)])
+
+        # Edges are contiguous per county, so bounding boxes are segment reductions
+        first = self.edge_starts[:-1]
+        self.bbox = np.column_stack([
+            np.minimum.reduceat(np.minimum(self.edges[:, 0], self.edges[:, 2]), first),
+            np.minimum.reduceat(np.minimum(self.edges[:, 1], self.edges[:, 3]), first),
+            np.maximum.reduceat(np.maximum(self.edges[:, 0], self.edges[:, 2]), first),
+            np.maximum.reduceat(np.maximum(self.edges[:, 1], self.edges[:, 3]), first),
+        ])
+        n = len(counties)
+
+        self.cell_size = cell_size
+        self.origin = self.bbox[:, :2].min(axis=0)
+        self.shape = (np.floor((self.bbox[:, 2:].max(axis=0) - self.origin) / cell_size).astype(int) + 1)
+
+        # (cell, county) pairs for every cell a county's bounding box touches
+        lo = self._cells(self.bbox[:, :2])
+        hi = self._cells(self.bbox[:, 2:])
+        span = hi - lo + 1
+        per_county = span[:, 0] * span[:, 1]
+        county = np.repeat(np.arange(n), per_county)
+        local = np.arange(per_county.sum()) - np.repeat(np.cumsum(per_county) - per_county, per_county)
+        cx = lo[county, 0] + local % span[county, 0]
+        cy = lo[county, 1] + local // span[county, 0]
+        cell = cy * self.shape[0] + cx
+
+        order = np.argsort(cell, kind='stable')
+        self.cell_counties = county[order]
+        self.cell_starts = np.concatenate(
+            [[0], np.cumsum(np.bincount(cell, minlength=self.shape[0] * self.shape[1]))])
+
+    def _cells(self, points):
+        return np.floor((points - self.origin) / self.cell_size).astype(int)
+
+    def locate(self, lon, lat):
+        """Index into ``self.fips`` of the county containing each point, or -1."""
+        points = np.column_stack([lon, lat]).astype(float)
+        result = np.full(len(points), -1)
+
+        cells = self._cells(points)
+        inside_grid = ((cells >= 0) & (cells < self.shape)).all(axis=1)
+        point_ids = np.flatnonzero(inside_grid)
+        cell = cells[point_ids, 1] * self.shape[0] + cells[point_ids, 0]
+
+        # Candidate (point, county) pairs from each point's cell, pruned by bounding box
+        starts = self.cell_starts[cell]
+        counts = self.cell_starts[cell + 1] - starts
+        pair_point = np.repeat(point_ids, counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_county = self.cell_counties[np.repeat(starts, counts) + local]
+        box = self.bbox[pair_county]
+        px, py = points[pair_point, 0], points[pair_point, 1]
+        keep = (px >= box[:, 0]) & (px <= box[:, 2]) & (py >= box[:, 1]) & (py <= box[:, 3])
+        pair_point, pair_county = pair_point[keep], pair_county[keep]
+        if not len(pair_point):
+            return result
+
+        order = np.lexsort((pair_point, pair_county))
+        pair_point, pair_county = pair_point[order], pair_county[order]
+        bounds = np.flatnonzero(np.diff(pair_county)) + 1
+        for pts, county in zip(np.split(pair_point, bounds), pair_county[np.append(0, bounds)]):
+            # Points on shared borders keep the first county that claims them
+            pts = pts[result[pts] < 0]
+            if len(pts):
+                e = self.edges[self.edge_starts[county]:self.edge_starts[county + 1]]
+                hit = self._contains(e, points[pts, 0], points[pts, 1])
+                result[pts[hit]] = county
+        return result
+
+    @staticmethod
+    def _contains(edges, px, py):
+        """Even-odd ray cast of each point against all edges of one county."""
+        x0, y0, x1, y1 = (edges[:, i][None, :] for i in range(4))
+        px, py = px[:, None], py[:, None]
+        straddles = (y0 > py) != (y1 > py)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cross_x = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+        crossings = (straddles & (px < cross_x)).sum(axis=1)
+        return crossings % 2 == 1
+
+
+# ============================================================
+# Cached station assignment
+# ============================================================
+def assignment_key(counties_path, station_ids, lats, lons):
+    """Identifies one assignment: boundary file contents plus station positions."""
+    h = hashlib.sha256(f'v{ASSIGNMENT_VERSION}'.encode())
+    h.update(file_hash(counties_path).encode())
+    for station, lat, lon in zip(station_ids, lats, lons):
+        h.update(f'{station},{lat},{lon}\n'.encode())
+    return h.hexdigest()
+
+
+def assign_stations(stations, counties_path, cache_path, cell_size=0.25):
+    """{station_id: county FIPS or None} for a frame of station_id/lat/lon.
+
+    The result is cached in ``cache_path`` and reused while the boundary
+    file and the station list are unchanged. Returns (assignments, cached).
+    """
+    key = assignment_key(counties_path, stations['station_id'], stations['lat'], stations['lon'])
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cached = json.load(f)
+        if cached.get('key') == key:
+            return cached['counties'], True
+
+    index = CountyIndex(load_counties(counties_path), cell_size)
+    found = index.locate(stations['lon'].to_numpy(), stations['lat'].to_numpy())
+    fips = np.where(found >= 0, index.fips[np.maximum(found, 0)], None)
+    assignments = dict(zip(stations['station_id'], fips.tolist()))
+
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'key': key, 'source': os.path.basename(counties_path), 'counties': assignments}, f)
+    os.replace(tmp_path, cache_path)
+    return assignments, False
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Synthetic GHCN-Daily and RMA county yield inputs at any scale.
+Writes the same layout as the real Data/ directory (ghcnd-stations.txt,
+ghcn_by_year/<year>.csv, RMACountyYieldsReport-399.csv), so the pipeline
+scripts run on it unchanged via HARROW_DATA_DIR. Output is deterministic
+for a given seed.
+
+Usage: python3 scripts/synth_data.py OUT_DIR [--stations N] [--ghcn-years 2023-2024]
+                                              [--counties N] [--yield-years 2010-2024]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Target states: (FIPS, name, approximate centroid lat, lon)
+STATES = {
+    'AL': ('01', 'Alabama', 32.8, -86.8), 'AR': ('05', 'Arkansas', 34.9, -92.4),
+    'CO': ('08', 'Colorado', 39.0, -105.5), 'DE': ('10', 'Delaware', 39.0, -75.5),
+    'IA': ('19', 'Iowa', 42.0, -93.5), 'IL': ('17', 'Illinois', 40.0, -89.2),
+    'IN': ('18', 'Indiana', 39.9, -86.3), 'KS': ('20', 'Kansas', 38.5, -98.4),
+    'KY': ('21', 'Kentucky', 37.5, -85.3), 'LA': ('22', 'Louisiana', 31.0, -92.0),
+    'MD': ('24', 'Maryland', 39.0, -76.8), 'MI': ('26', 'Michigan', 43.5, -84.6),
+    'MN': ('27', 'Minnesota', 46.3, -94.3), 'MO': ('29', 'Missouri', 38.4, -92.5),
+    'MS': ('28', 'Mississippi', 32.7, -89.7), 'NC': ('37', 'North Carolina', 35.5, -79.4),
+    'ND': ('38', 'North Dakota', 47.5, -100.5), 'NE': ('31', 'Nebraska', 41.5, -99.8),
+    'NJ': ('34', 'New Jersey', 40.2, -74.7), 'NY': ('36', 'New York', 42.9, -75.5),
+    'OH': ('39', 'Ohio', 40.3, -82.8), 'OK': ('40', 'Oklahoma', 35.6, -97.5),
+    'PA': ('42', 'Pennsylvania', 40.9, -77.8), 'SC': ('45', 'South Carolina', 33.9, -80.9),
+    'SD': ('46', 'South Dakota', 44.4, -100.2), 'TN': ('47', 'Tennessee', 35.9, -86.4),
+    'TX': ('48', 'Texas', 31.5, -99.3), 'VA': ('51', 'Virginia', 37.5, -78.8),
+    'VT': ('50', 'Vermont', 44.0, -72.7), 'WI': ('55', 'Wisconsin', 44.6, -89.9),
+    'WV': ('54', 'West Virginia', 38.6, -80.6), 'WY': ('56', 'Wyoming', 43.0, -107.5),
+}
+
+# Commodity code, name, baseline yield, yearly trend, county spread (bu/acre)
+CROPS = [('0041', 'Corn', 150.0, 1.8, 25.0), ('0081', 'Soybeans', 45.0, 0.5, 7.0)]
+
+# Elements written besides the three the pipeline keeps, so filters do real work
+ELEMENTS = ['TMAX', 'TMIN', 'PRCP', 'SNOW']
+
+# Stations per block when generating daily rows; bounds memory at any scale
+STATION_BLOCK = 2000
+
+
+def parse_years(text):
+    first, _, last = text.partition('-')
+    return range(int(first), int(last or first) + 1)
+
+
+# ============================================================
+# GHCN-Daily
+# ============================================================
+def write_stations(data_dir, n_stations, rng):
+    """ghcnd-stations.txt with ~90% US stations spread over the target states.
+
+    Returns (station ids, state abbreviations, latitudes) of every station.
+    """
+    abbrs = np.array(list(STATES))
+    states = abbrs[rng.integers(0, len(abbrs), n_stations)]
+    lat = np.array([STATES[s][2] for s in states]) + rng.uniform(-1.5, 1.5, n_stations)
+    lon = np.array([STATES[s][3] for s in states]) + rng.uniform(-2.0, 2.0, n_stations)
+    us = rng.random(n_stations) < 0.9
+    ids = np.where(us, [f'USC{i:08d}' for i in range(n_stations)], [f'CA{i:09d}' for i in range(n_stations)])
+
+    with open(os.path.join(data_dir, 'ghcnd-stations.txt'), 'w') as f:
+        for station, la, lo, state in zip(ids, lat, lon, states):
+            f.write(f'{station:<11} {la:8.4f} {lo:9.4f} {250.0:6.1f} {state:2} {"SYNTHETIC " + station:30}\n')
+    return ids, states, lat
+
+
+def ghcn_block(ids, lat, dates, rng):
+    """Daily rows for a block of stations over ``dates`` in GHCN CSV column order."""
+    n_st, n_days = len(ids), len(dates)
+    doy = dates.dayofyear.to_numpy()
+    yyyymmdd = (dates.year * 10000 + dates.month * 100 + dates.day).to_numpy()
+
+    # Seasonal temperature cycle, cooler to the north; values in tenths
+    season = np.sin((doy - 105) / 365.25 * 2 * np.pi)[None, :]
+    base = 300 - 8 * (lat[:, None] - 30)
+    tmax = base + 150 * season + rng.normal(0, 45, (n_st, n_days))
+    tmin = tmax - rng.uniform(80, 140, (n_st, n_days))
+    prcp = np.where(rng.random((n_st, n_days)) < 0.3, rng.exponential(70, (n_st, n_days)), 0)
+    snow = np.where(tmax < 20, prcp, 0)
+
+    values = np.stack([tmax, tmin, prcp, snow], axis=2).round().astype(np.int32)  # (station, day, element)
+    # About 5% of station-days are missing, 1% of values fail QC
+    present = np.repeat((rng.random((n_st, n_days)) > 0.05)[:, :, None], len(ELEMENTS), axis=2).ravel()
+    n = present.sum()
+    return pd.DataFrame({
+        'station': np.repeat(ids, n_days * len(ELEMENTS))[present],
+        'date': np.tile(np.repeat(yyyymmdd, len(ELEMENTS)), n_st)[present],
+        'element': np.tile(ELEMENTS, n_st * n_days)[present],
+        'value': values.ravel()[present],
+        'm_flag': '',
+        'q_flag': np.where(rng.random(n) < 0.01, 'X', ''),
+        's_flag': '7',
+        'obs_time': '0700',
+    })
+
+
+def write_ghcn(data_dir, n_stations, years, seed=0):
+    """Station list plus one daily CSV per year; returns rows written per year."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(data_dir, 'ghcn_by_year'), exist_ok=True)
+    ids, _, lat = write_stations(data_dir, n_stations, rng)
+
+    rows = {}
+    for year in years:
+        dates = pd.date_range(f'{year}-01-01', f'{year}-12-31')
+        rows[year] = 0
+        with open(os.path.join(data_dir, 'ghcn_by_year', f'{year}.csv'), 'w') as f:
+            for start in range(0, n_stations, STATION_BLOCK):
+                block = ghcn_block(ids[start:start + STATION_BLOCK], lat[start:start + STATION_BLOCK], dates, rng)
+                block.to_csv(f, header=False, index=False)
+                rows[year] += len(block)
+    return rows
+
+
+# ============================================================
+# RMA county yields
+# ============================================================
+def write_rma(data_dir, n_counties, years, seed=0):
+    """RMACountyYieldsReport-399.csv with both crops for every county; returns rows written."""
+    rng = np.random.default_rng(seed + 1)
+    abbrs = np.array(list(STATES))
+    county_states = abbrs[rng.integers(0, len(abbrs), n_counties)]
+    # County codes count up (odd, like real FIPS) within each state
+    county_codes = np.empty(n_counties, dtype=int)
+    for state in STATES:
+        mask = county_states == state
+        county_codes[mask] = 1 + 2 * np.arange(mask.sum())
+    county_effect = rng.normal(0, 1, n_counties)
+
+    years = np.asarray(list(years))
+    year_shock = rng.normal(0, 1, (len(STATES), len(years)))
+    state_index = {s: i for i, s in enumerate(STATES)}
+    shock = year_shock[[state_index[s] for s in county_states]]  # (county, year)
+
+    frames = []
+    for code, name, baseline, trend, spread in CROPS:
+        yields = (baseline + trend * (years - years[0])[None, :] + spread * county_effect[:, None]
+                  + 0.6 * spread * shock + rng.normal(0, spread * 0.3, (n_counties, len(years))))
+        # Not every county reports every year
+        reported = rng.random((n_counties, len(years))) > 0.1
+        c_idx, y_idx = np.nonzero(reported)
+        frames.append(pd.DataFrame({
+            'Commodity Code': code,
+            'Commodity Name': name,
+            'State Code': [STATES[s][0] for s in county_states[c_idx]],
+            'State Name': [STATES[s][1] for s in county_states[c_idx]],
+            'State Abbreviation': county_states[c_idx],
+            'County Code': [f'{c:03d}' for c in county_codes[c_idx]],
+            'County Name': [f'County {c:03d}' for c in county_codes[c_idx]],
+            'Irrigation Practice Code': '003',
+            'Irrigation Practice Name': 'Non-Irrigated',
+            'Yield Year': years[y_idx],
+            'Yield Amount': np.maximum(yields[c_idx, y_idx], 1.0).round(2),
+        }))
+
+    rma = pd.concat(frames, ignore_index=True)
+    rma.to_csv(os.path.join(data_dir, 'RMACountyYieldsReport-399.csv'), index=False, sep=',',
+               float_format='%.2f')
+    return len(rma)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write synthetic GHCN-Daily and RMA inputs.')
+    parser.add_argument('out_dir', help='data directory to create (use as HARROW_DATA_DIR)')
+    parser.add_argument('--stations', type=int, default=1000, help='GHCN stations (default: 1000)')
+    parser.add_argument('--ghcn-years', default='2023-2024', help='years of daily files (default: 2023-2024)')
+    parser.add_argument('--counties', type=int, default=1300, help='RMA counties (default: 1300)')
+    parser.add_argument('--yield-years', default='2010-2024', help='RMA years (default: 2010-2024)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    start = time.perf_counter()
+    rma_rows = write_rma(args.out_dir, args.counties, parse_years(args.yield_years), args.seed)
+    print(f"RMA: {rma_rows:,} rows ({args.counties:,} counties)")
+    for year, rows in write_ghcn(args.out_dir, args.stations, parse_years(args.ghcn_years), args.seed).items():
+        print(f"GHCN {year}: {rows:,} rows ({args.stations:,} stations)")
+    print(f"Written to {args.out_dir} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
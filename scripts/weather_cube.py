@@ -0,0 +1,135 @@
+"""
+Memory-mapped station × day cube of cleaned daily weather.
+process_weather.py --cube-dir fills one float32 (station, day) array per
+element (PRCP in mm, TMAX/TMIN in °C, NaN where missing) as .npy files,
+alongside stations.csv and calendar.csv index files. Later feature work
+opens the arrays with mmap_mode='r' and slices seasons or stations as
+zero-copy views, shared between processes through the page cache, instead
+of re-reading the raw GHCN CSVs.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from weather_metrics import ELEMENT_COLUMNS
+
+CUBE_VERSION = 1
+MANIFEST = 'cube.json'
+
+
+def _array_path(cube_dir, element):
+    return os.path.join(cube_dir, f'{element}.npy')
+
+
+def day_index(year, doy, first_year):
+    """Day offsets from January 1 of ``first_year`` for (year, day of year) arrays."""
+    year = np.asarray(year, dtype=np.int64)
+    jan1 = (year - 1970).astype('datetime64[Y]').astype('datetime64[D]')
+    start = np.datetime64(f'{first_year}-01-01', 'D')
+    return (jan1 - start).astype(np.int64) + np.asarray(doy, dtype=np.int64) - 1
+
+
+class CubeWriter:
+    """Allocates the cube for a station list and year range, then fills it slice by slice.
+
+    Rows follow ``stations`` in order, which must match the categories of the
+    pivoted frames' station column, so a row is just the station's category code.
+    """
+
+    def __init__(self, cube_dir, stations, years):
+        self.cube_dir = cube_dir
+        self.first_year, self.last_year = min(years), max(years)
+        self.dates = pd.date_range(f'{self.first_year}-01-01', f'{self.last_year}-12-31')
+        self.stations = stations.reset_index(drop=True)
+        os.makedirs(cube_dir, exist_ok=True)
+        # A cube without its manifest is incomplete; drop the old one first
+        if os.path.exists(os.path.join(cube_dir, MANIFEST)):
+            os.remove(os.path.join(cube_dir, MANIFEST))
+
+        shape = (len(self.stations), len(self.dates))
+        self.arrays = {}
+        for element in ELEMENT_COLUMNS:
+            array = np.lib.format.open_memmap(_array_path(cube_dir, element), mode='w+',
+                                              dtype=np.float32, shape=shape)
+            array[:] = np.nan
+            self.arrays[element] = array
+        self.filled = 0
+
+    def add(self, pivoted):
+        """Write a pivoted daily slice (one year or all of them) into the cube."""
+        rows = pivoted['station'].cat.codes.to_numpy()
+        days = day_index(pivoted['year'].to_numpy(), pivoted['doy'].to_numpy(), self.first_year)
+        for element, array in self.arrays.items():
+            if element in pivoted.columns:
+                array[rows, days] = pivoted[element].to_numpy(dtype=np.float32)
+        self.filled += len(pivoted)
+
+    def close(self):
+        """Flush the arrays and write the index files and manifest."""
+        for array in self.arrays.values():
+            array.flush()
+        self.arrays = {}
+
+        self.stations.to_csv(os.path.join(self.cube_dir, 'stations.csv'), index_label='row')
+        pd.DataFrame({
+            'date': self.dates.strftime('%Y-%m-%d'),
+            'year': self.dates.year,
+            'month': self.dates.month,
+            'doy': self.dates.dayofyear,
+        }).to_csv(os.path.join(self.cube_dir, 'calendar.csv'), index_label='day')
+
+        manifest = {
+            'version': CUBE_VERSION,
+            'elements': ELEMENT_COLUMNS,
+            'units': {'PRCP': 'mm', 'TMAX': 'degC', 'TMIN': 'degC'},
+            'dtype': 'float32',
+            'shape': [len(self.stations), len(self.dates)],
+            'first_date': str(self.dates[0].date()),
+            'last_date': str(self.dates[-1].date()),
+            'station_days_filled': int(self.filled),
+        }
+        with open(os.path.join(self.cube_dir, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+
+class WeatherCube:
+    """Read-only view of a cube written by CubeWriter."""
+
+    def __init__(self, cube_dir):
+        manifest_path = os.path.join(cube_dir, MANIFEST)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"no complete weather cube in {cube_dir} (missing {MANIFEST})")
+        with open(manifest_path) as f:
+            self.manifest = json.load(f)
+        if self.manifest['version'] != CUBE_VERSION:
+            raise ValueError(f"weather cube version {self.manifest['version']}, expected {CUBE_VERSION}")
+
+        self.cube_dir = cube_dir
+        self.stations = pd.read_csv(os.path.join(cube_dir, 'stations.csv'), index_col='row',
+                                    dtype={'state_fips': str, 'county_fips': str})
+        self.calendar = pd.read_csv(os.path.join(cube_dir, 'calendar.csv'), index_col='day')
+        self.dates = pd.DatetimeIndex(self.calendar['date'])
+        self._arrays = {}
+
+    def element(self, element):
+        """The full (station, day) memmap of one element."""
+        if element not in self._arrays:
+            self._arrays[element] = np.load(_array_path(self.cube_dir, element), mmap_mode='r')
+        return self._arrays[element]
+
+    def days(self, start, end):
+        """Slice of day columns from ``start`` to ``end`` inclusive (date strings)."""
+        return slice(self.dates.searchsorted(pd.Timestamp(start)),
+                     self.dates.searchsorted(pd.Timestamp(end), side='right'))
+
+    def window(self, element, start, end, rows=slice(None)):
+        """(station, day) values between two dates; a view as long as ``rows`` is a slice."""
+        return self.element(element)[rows, self.days(start, end)]
+
+    def state_rows(self, state):
+        """Cube rows of the stations in one state."""
+        return np.flatnonzero(self.stations['state'].to_numpy() == state)
@@ -0,0 +1,279 @@
+"""
+Daily weather reductions used by process_weather.py.
+Each function works on any slice of the daily table (one year or all of
+them), so the batch and streaming paths share the same code.
+"""
+
+import operator
+import re
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from runlength import run_stats
+from season_features import DRY_DAY_MM, HEAT_STRESS_C, METRICS as WINDOW_METRIC_NAMES, WINDOWS, growing_degree_days
+
+ELEMENT_COLUMNS = ['TMAX', 'TMIN', 'PRCP']
+
+
+def pivot_daily(records):
+    """One row per (station, state, year, doy) with PRCP/TMAX/TMIN in mm and °C.
+
+    ``records`` holds the compact daily rows from ghcn_ingest: categorical
+    station/state/element and int16 values in tenths, converted here. The
+    pivot runs on integer codes: one packed (station, year, doy) key, one
+    sort, and bincount sums/counts per element, averaging rare duplicates.
+    """
+    station = records['station'].cat.codes.to_numpy().astype(np.int64)
+    key = (station * 10_000 + records['year'].to_numpy()) * 400 + records['doy'].to_numpy()
+    keys, first, row = np.unique(key, return_index=True, return_inverse=True)
+
+    elements = records['element'].cat.categories
+    cell = row * len(elements) + records['element'].cat.codes.to_numpy()
+    size = len(keys) * len(elements)
+    sums = np.bincount(cell, weights=records['value'].to_numpy(), minlength=size)
+    counts = np.bincount(cell, minlength=size)
+
+    pivoted = records.iloc[first][['station', 'state', 'year', 'doy', 'month']].reset_index(drop=True)
+    sums = sums.reshape(-1, len(elements))
+    counts = counts.reshape(-1, len(elements))
+    for i, element in enumerate(elements):
+        if counts[:, i].any():
+            with np.errstate(invalid='ignore'):
+                pivoted[element] = sums[:, i] / counts[:, i]
+
+    # Convert units
+    if 'PRCP' in pivoted.columns:
+        pivoted['PRCP'] = pivoted['PRCP'] / 10.0  # tenths of mm → mm
+    if 'TMAX' in pivoted.columns:
+        pivoted['TMAX'] = pivoted['TMAX'] / 10.0  # tenths of °C → °C
+    if 'TMIN' in pivoted.columns:
+        pivoted['TMIN'] = pivoted['TMIN'] / 10.0
+    return pivoted
+
+
+# ============================================================
+# State-year metric registry
+# ============================================================
+# Each metric names a month window, a daily element (or a condition on
+# one) and two reductions: per station over the window's days, then across
+# the state's stations. A per-station reduction of None pools every
+# station-day of the state instead; several elements are then averaged.
+# A station counts towards every metric of a window it has any day in,
+# whether or not it reported the metric's element: a temperature-only
+# station adds 0 mm of rain and no dry days.
+Metric = namedtuple('Metric', ['name', 'window', 'element', 'station', 'across'])
+
+SEASONS = {
+    'growing': (4, 9),  # April through September
+    'summer': (6, 8),   # June through August, for heat stress
+}
+
+STATE_YEAR_METRICS = [
+    Metric('growing_season_avg_temp', 'growing', ('TMAX', 'TMIN'), None, 'mean'),
+    Metric('growing_season_max_temp', 'growing', 'TMAX', None, 'max'),
+    Metric('growing_season_min_temp', 'growing', 'TMIN', None, 'min'),
+    Metric('growing_season_precip_mm', 'growing', 'PRCP', 'sum', 'mean'),
+    Metric('growing_season_precip_std', 'growing', 'PRCP', 'sum', 'std'),
+    # Heat stress days: TMAX > 35°C (95°F)
+    Metric('heat_stress_days', 'summer', 'TMAX > 35', 'count', 'mean'),
+    # Drought proxy: longest run of days with PRCP < 1mm
+    Metric('max_dry_spell_days', 'growing', 'PRCP < 1', 'longest_run', 'mean'),
+    Metric('max_wet_spell_days', 'growing', 'PRCP >= 1', 'longest_run', 'mean'),
+    # Heat waves: longest run of TMAX > 35°C and number of 3+ day runs
+    Metric('max_heat_spell_days', 'growing', 'TMAX > 35', 'longest_run', 'mean'),
+    Metric('heat_wave_count', 'growing', 'TMAX > 35', 'runs', 'mean'),
+    Metric('heavy_rain_days', 'growing', 'PRCP > 50', 'count', 'mean'),
+]
+
+# Crop-window features (see season_features): one metric per window and
+# kind, reduced exactly like the growing-season metrics, so a window over
+# April-September reproduces them
+WINDOW_METRICS = {
+    'gdd': ('GDD', 'sum'),
+    'heat_days': (f'TMAX > {HEAT_STRESS_C:g}', 'count'),
+    'precip_mm': ('PRCP', 'sum'),
+    'dry_spell_days': (f'PRCP < {DRY_DAY_MM:g}', 'longest_run'),
+}
+
+
+def window_metrics(windows=WINDOWS, kinds=WINDOW_METRIC_NAMES):
+    """Registry entries for the ``{window}_{kind}`` features of every window."""
+    return [Metric(f'{window}_{kind}', window, *WINDOW_METRICS[kind], 'mean')
+            for window in windows for kind in kinds]
+
+
+# Runs shorter than this do not count towards a 'runs' metric
+MIN_RUN_DAYS = 3
+
+_CONDITION = re.compile(r'^(\w+)\s*(<=|>=|<|>)\s*(-?[\d.]+)$')
+_OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+
+def _daily(element, columns):
+    """Daily values of an element or a condition like 'TMAX > 35'; None if the element is missing."""
+    match = _CONDITION.match(element)
+    if match is None:
+        return columns.get(element)
+    name, op, threshold = match.groups()
+    if name not in columns:
+        return None
+    return _OPERATORS[op](columns[name], float(threshold))
+
+
+def _segment_starts(ids):
+    """Start offsets of each run of equal values in sorted ``ids``."""
+    return np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+
+
+def _across(values, groups, n_groups, how):
+    """Reduce ``values`` over contiguous ``groups`` like the Series methods would.
+
+    Returns (result, present) arrays of length ``n_groups``. Sums use
+    np.sum per segment, which is pairwise like Series.mean/std; reduceat
+    adds sequentially and can differ in the last bit, enough to flip a
+    rounded x.x5 value. Segments are state-years, so the loop is short.
+    """
+    result = np.full(n_groups, np.nan)
+    present = np.zeros(n_groups, dtype=bool)
+    if len(values) == 0:
+        return result, present
+    starts = _segment_starts(groups)
+    ids = groups[starts]
+    present[ids] = True
+    if how == 'max':
+        result[ids] = np.maximum.reduceat(values, starts)
+    elif how == 'min':
+        result[ids] = np.minimum.reduceat(values, starts)
+    else:
+        bounds = np.r_[starts, len(values)]
+        counts = np.diff(bounds)
+        means = np.array([values[a:b].sum() for a, b in zip(bounds[:-1], bounds[1:])]) / counts
+        if how == 'mean':
+            result[ids] = means
+        elif how == 'std':
+            deviations = (np.repeat(means, counts) - values) ** 2
+            squares = np.array([deviations[a:b].sum() for a, b in zip(bounds[:-1], bounds[1:])])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result[ids] = np.where(counts > 1, np.sqrt(squares / (counts - 1)), 0.0)
+        else:
+            raise ValueError(f"unknown across-station reduction {how!r}")
+    return result, present
+
+
+def evaluate_metrics(pivoted, metrics=STATE_YEAR_METRICS, seasons=SEASONS, key='state'):
+    """Every metric for every (state, year) from one sort and one grouped sum.
+
+    ``key`` names the column grouping the stations (e.g. 'county'); rows
+    where it is missing are left out. Returns (index of (key, year)
+    pairs, {name: (values, present)}).
+    """
+    months_used = [seasons[m.window] for m in metrics]
+    first, last = min(w[0] for w in months_used), max(w[1] for w in months_used)
+    month = pivoted['month'].to_numpy()
+    rows = pivoted[(month >= first) & (month <= last) & pivoted[key].notna().to_numpy()]
+
+    # Station-years in (state, year, station) order, each contiguous and in day order
+    grouper = rows.groupby([key, 'year', 'station'], sort=True, observed=True)
+    codes = grouper.ngroup().to_numpy()
+    station_index = grouper.size().index
+    order = np.lexsort((rows['doy'].to_numpy(), codes))
+    station_ids = codes[order]
+    n_stations = len(station_index)
+    state_year_index = station_index.droplevel('station').unique()
+    station_state_year = state_year_index.get_indexer(station_index.droplevel('station'))
+    row_state_year = station_state_year[station_ids]
+
+    columns = {c: rows[c].to_numpy()[order] for c in ELEMENT_COLUMNS if c in rows.columns}
+    if 'TMAX' in columns and 'TMIN' in columns:
+        columns['GDD'] = growing_degree_days(columns['TMAX'], columns['TMIN'])
+    month = rows['month'].to_numpy()[order]
+    in_window = {name: (month >= lo) & (month <= hi) for name, (lo, hi) in seasons.items()
+                 if any(m.window == name for m in metrics)}
+
+    # Per-station sums and counts share one grouped pass; NaN days are skipped
+    sums = {f'rows:{w}': in_window[w] for w in {m.window for m in metrics}}
+    for m in metrics:
+        if m.station in ('sum', 'count'):
+            daily = _daily(m.element, columns)
+            if daily is not None:
+                outside = np.nan if m.station == 'sum' else 0
+                sums[f'{m.window}:{m.element}'] = np.where(in_window[m.window], daily, outside)
+    station_totals = pd.DataFrame(sums).groupby(station_ids, sort=True).sum()
+
+    results = {}
+    for m in metrics:
+        if m.station is None:
+            # Pooled over every station-day; elements are averaged
+            parts = []
+            for element in ((m.element,) if isinstance(m.element, str) else m.element):
+                daily = _daily(element, columns)
+                if daily is None:
+                    break
+                keep = in_window[m.window] & ~np.isnan(daily)
+                parts.append(_across(daily[keep], row_state_year[keep], len(state_year_index), m.across))
+            else:
+                values = sum(v for v, _ in parts) / len(parts)
+                present = np.logical_and.reduce([p for _, p in parts])
+                results[m.name] = (values, present)
+            continue
+
+        daily = _daily(m.element, columns)
+        if daily is None:
+            continue
+        if m.station in ('sum', 'count'):
+            per_station = station_totals[f'{m.window}:{m.element}'].to_numpy(dtype=float)
+        elif m.station in ('longest_run', 'runs'):
+            longest, runs = run_stats(station_ids, daily & in_window[m.window], n_stations, MIN_RUN_DAYS)
+            per_station = (longest if m.station == 'longest_run' else runs).astype(float)
+        else:
+            raise ValueError(f"unknown per-station reduction {m.station!r}")
+        # Stations count if they have any day in the window
+        keep = station_totals[f'rows:{m.window}'].to_numpy() > 0
+        results[m.name] = _across(per_station[keep], station_state_year[keep], len(state_year_index), m.across)
+
+    return state_year_index, results
+
+
+def _rounded_metrics(pivoted, key, windows, metrics):
+    """(index of (key, year) pairs, {name: (rounded values, present)}), crop windows included."""
+    index, results = evaluate_metrics(pivoted, metrics + window_metrics(windows), {**SEASONS, **windows}, key)
+    rounded = {name: (np.round(values, 1).tolist(), present) for name, (values, present) in results.items()}
+    return index, rounded
+
+
+def _records(index, rounded, head):
+    """One record per (key, year): ``head(key, year)`` then every present metric."""
+    records = []
+    for i, (group, year) in enumerate(index):
+        record = head(group, int(year))
+        for name, (values, present) in rounded.items():
+            if present[i]:
+                record[name] = values[i]
+        records.append(record)
+    return records
+
+
+def state_year_metrics(pivoted, state_fips, windows=WINDOWS, metrics=STATE_YEAR_METRICS):
+    """Registered metrics for every (state, year) in ``pivoted``, as records.
+
+    The crop-window features of ``windows`` (GDD, heat days, precip, dry
+    spells; see season_features) are evaluated in the same pass.
+    """
+    index, rounded = _rounded_metrics(pivoted, 'state', windows, metrics)
+    return _records(index, rounded, lambda state, year: {
+        'state': state,
+        'state_fips': state_fips.get(state, ''),
+        'year': year,
+    })
+
+
+def county_year_metrics(pivoted, windows=WINDOWS, metrics=STATE_YEAR_METRICS):
+    """The same metrics for every (county, year), over the stations inside each county.
+
+    ``pivoted`` needs a ``county`` column of FIPS codes; stations outside
+    every county (missing FIPS) are left out.
+    """
+    index, rounded = _rounded_metrics(pivoted, 'county', windows, metrics)
+    return _records(index, rounded, lambda fips, year: {'fips': fips, 'year': year})
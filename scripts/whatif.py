@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Saved yield models and batch what-if scoring.
+analyze.py saves each crop's fitted scaler + linear model as a versioned
+artifact (plain .npz arrays, no pickles) and records the current version
+of every crop in models.json. Because the models are linear, the scaler
+folds into per-feature weights in raw units, and every crop stacks into
+one (feature × crop) weight matrix: a grid of weather perturbations for
+every state and crop is then a single matrix multiply, with no retrain.
+
+Usage: python3 scripts/whatif.py --delta heat_stress_days=0,5,10 \\
+           --delta growing_season_precip_mm=-100,0,100 [--states IA,IL] [--crops corn] [--out grid.csv]
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Bump when the artifact arrays or manifest fields change
+MODEL_FORMAT = 2
+MANIFEST = 'models.json'
+
+# Step sizes of the sensitivity table, in each feature's own units;
+# features not listed step by one standard deviation
+SENSITIVITY_STEPS = {
+    'growing_season_avg_temp': 1.0,      # °C
+    'growing_season_max_temp': 1.0,      # °C
+    'growing_season_precip_mm': 50.0,    # mm
+    'heat_stress_days': 10.0,            # days
+    'max_dry_spell_days': 7.0,           # days
+    'heavy_rain_days': 2.0,              # days
+    'corn_season_gdd': 100.0,            # °C-days
+    'corn_silking_heat_days': 5.0,       # days
+    'corn_silking_precip_mm': 25.0,      # mm
+    'soybeans_season_gdd': 100.0,        # °C-days
+    'soybeans_pod_fill_heat_days': 5.0,  # days
+    'soybeans_pod_fill_precip_mm': 25.0, # mm
+}
+
+# Years of weather averaged into each state's baseline
+BASELINE_YEARS = 5
+
+
+# ============================================================
+# Artifacts
+# ============================================================
+def save_models(model_dir, fitted):
+    """Write one artifact per crop and point models.json at them.
+
+    ``fitted`` maps crop -> dict with the fitted ``scaler`` and ``model``,
+    the ``features`` in column order, the ``states`` and ``years`` it was
+    trained on, and any metrics to record. The artifact holds everything
+    scoring needs, training states included; the version is a digest of
+    its arrays, so refitting identical data reuses the same file and older
+    versions stay loadable.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    manifest_path = os.path.join(model_dir, MANIFEST)
+    manifest = {'format': MODEL_FORMAT, 'crops': {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            previous = json.load(f)
+        if previous.get('format') == MODEL_FORMAT:
+            manifest = previous
+
+    for crop, fit in fitted.items():
+        arrays = {
+            'features': np.array(fit['features'], dtype=str),
+            'mean': fit['scaler'].mean_.astype(float),
+            'scale': fit['scaler'].scale_.astype(float),
+            'coef': np.asarray(fit['model'].coef_, dtype=float),
+            'intercept': np.array(float(fit['model'].intercept_)),
+            'states': np.array(sorted(set(fit['states'])), dtype=str),
+            'years': np.array([min(fit['years']), max(fit['years'])], dtype=int),
+        }
+        h = hashlib.sha256()
+        for name, array in arrays.items():
+            h.update(name.encode())
+            h.update(array.tobytes())
+        version = h.hexdigest()[:12]
+
+        artifact = os.path.join(crop, f'{version}.npz')
+        path = os.path.join(model_dir, artifact)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.tmp.npz'
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, path)
+
+        manifest['crops'][crop] = {
+            'version': version,
+            'artifact': artifact,
+            'model': 'linear_regression',
+            'features': arrays['features'].tolist(),
+            'states': arrays['states'].tolist(),
+            'years': arrays['years'].tolist(),
+            **fit.get('metrics', {}),
+        }
+
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return manifest
+
+
+class ModelSet:
+    """The saved models of several crops, as one raw-unit weight matrix.
+
+    ``weights[i, j]`` is crop j's yield change per unit of ``features[i]``
+    (zero where the crop's model does not use the feature) and
+    ``intercepts[j]`` its yield at all-zero features. ``info`` is each
+    crop's manifest entry, with the features, states and years taken from
+    the loaded artifact; an older ``versions`` entry drops the manifest's
+    metrics, which describe the current version.
+    """
+
+    def __init__(self, model_dir, crops=None, versions=None):
+        manifest_path = os.path.join(model_dir, MANIFEST)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"no saved models in {model_dir} (missing {MANIFEST}); run analyze.py first")
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('format') != MODEL_FORMAT:
+            raise ValueError(f"model format {manifest.get('format')}, expected {MODEL_FORMAT}")
+
+        self.crops = list(crops) if crops else sorted(manifest['crops'])
+        unknown = [c for c in self.crops if c not in manifest['crops']]
+        if unknown:
+            raise ValueError(f"no saved model for {', '.join(unknown)} (have {', '.join(sorted(manifest['crops']))})")
+        self.info = {crop: manifest['crops'][crop] for crop in self.crops}
+
+        models = {}
+        for crop in self.crops:
+            info = self.info[crop]
+            version = (versions or {}).get(crop, info['version'])
+            artifact = os.path.join(crop, f'{version}.npz')
+            with np.load(os.path.join(model_dir, artifact), allow_pickle=False) as npz:
+                models[crop] = m = {name: npz[name] for name in npz.files}
+            if 'states' not in m:
+                raise ValueError(f"{crop} version {version} predates model format {MODEL_FORMAT}; "
+                                 f"rerun analyze.py to refit it")
+            if version != info['version']:
+                info = self.info[crop] = {'version': version, 'artifact': artifact, 'model': info['model']}
+            info.update(features=m['features'].tolist(), states=m['states'].tolist(), years=m['years'].tolist())
+
+        # Union of the crops' features, in first-seen order
+        self.features = list(dict.fromkeys(f for m in models.values() for f in m['features'].tolist()))
+        self.weights = np.zeros((len(self.features), len(self.crops)))
+        self.intercepts = np.zeros(len(self.crops))
+        self.uses = np.zeros(self.weights.shape, dtype=bool)
+        self.scales = {}
+        for j, crop in enumerate(self.crops):
+            m = models[crop]
+            rows = [self.features.index(f) for f in m['features'].tolist()]
+            # coef · (x - mean) / scale + intercept, regrouped as w · x + b
+            w = m['coef'] / m['scale']
+            self.weights[rows, j] = w
+            self.uses[rows, j] = True
+            self.intercepts[j] = float(m['intercept']) - m['mean'] @ w
+            for feature, scale in zip(m['features'].tolist(), m['scale']):
+                self.scales.setdefault(feature, float(scale))
+
+    def score(self, baseline, deltas):
+        """Predicted yields for every baseline row under every scenario.
+
+        ``baseline`` is (rows × features) and ``deltas`` (scenarios ×
+        features), both in ``self.features`` order. Returns a (rows ×
+        scenarios × crops) array; a crop's prediction is NaN for a row
+        missing one of its features.
+        """
+        baseline = np.asarray(baseline, dtype=float)
+        deltas = np.asarray(deltas, dtype=float)
+        missing = np.isnan(baseline)
+        # Baselines and perturbations go through the weights together
+        scores = np.vstack([np.where(missing, 0.0, baseline), deltas]) @ self.weights
+        base, shift = scores[:len(baseline)] + self.intercepts, scores[len(baseline):]
+        base[(missing.astype(float) @ self.uses) > 0] = np.nan
+        return base[:, None, :] + shift[None, :, :]
+
+
+# ============================================================
+# Scenarios and baselines
+# ============================================================
+def parse_delta(text):
+    """'heat_stress_days=0,5,10' -> ('heat_stress_days', [0.0, 5.0, 10.0])."""
+    name, sep, values = text.partition('=')
+    try:
+        steps = [float(v) for v in values.split(',')]
+    except ValueError:
+        steps = None
+    if not sep or not name or not steps:
+        raise ValueError(f"bad delta {text!r}, expected FEATURE=V1,V2,..., e.g. heat_stress_days=0,5,10")
+    return name, steps
+
+
+def parse_years(text):
+    """'2018-2022' -> range(2018, 2023); a single year is a one-year range."""
+    first, _, last = text.partition('-')
+    try:
+        years = range(int(first), int(last or first) + 1)
+    except ValueError:
+        years = None
+    if not years:
+        raise ValueError(f"bad years {text!r}, expected FIRST-LAST, e.g. 2018-2022")
+    return years
+
+
+def scenario_grid(deltas, features):
+    """Every combination of the ``deltas`` ({feature: values}) as a (scenarios × features) frame.
+
+    Features without deltas stay at zero change.
+    """
+    unknown = [f for f in deltas if f not in features]
+    if unknown:
+        raise ValueError(f"unknown feature(s) {', '.join(unknown)}; the models use {', '.join(features)}")
+    combos = list(itertools.product(*deltas.values())) if deltas else [()]
+    grid = pd.DataFrame(0.0, index=pd.RangeIndex(len(combos), name='scenario'), columns=features)
+    if deltas:
+        grid[list(deltas)] = np.array(combos, dtype=float)
+    return grid
+
+
+def baseline_features(weather, features, years=None):
+    """Each state's mean of ``features`` over ``years`` (default: the latest BASELINE_YEARS)."""
+    if years is None:
+        available = sorted(weather['year'].unique())
+        years = available[-BASELINE_YEARS:]
+    rows = weather[weather['year'].isin(years)]
+    columns = rows.reindex(columns=features)
+    return columns.groupby(rows['state']).mean(), [int(y) for y in years]
+
+
+def score_grid(models, baseline, grid):
+    """Long-format scores: one row per (state, crop, scenario) the crop's model was trained on.
+
+    ``baseline`` is indexed by state (see baseline_features) and ``grid``
+    holds one scenario per row (see scenario_grid). The unperturbed
+    baseline rides along as an extra all-zero scenario, so ``change`` is
+    exact for every scenario.
+    """
+    deltas = np.vstack([np.zeros((1, len(models.features))), grid[models.features].to_numpy()])
+    scores = models.score(baseline[models.features].to_numpy(), deltas)
+    base, predicted = scores[:, :1, :], scores[:, 1:, :]
+    n_states, n_scenarios, n_crops = predicted.shape
+
+    frame = pd.DataFrame({
+        'state': np.repeat(baseline.index.to_numpy(), n_scenarios * n_crops),
+        'crop': np.tile(np.array(models.crops), n_states * n_scenarios),
+        'scenario': np.tile(np.repeat(grid.index.to_numpy(), n_crops), n_states),
+        'baseline': np.broadcast_to(base, predicted.shape).ravel(),
+        'predicted': predicted.ravel(),
+    })
+    frame['change'] = frame['predicted'] - frame['baseline']
+    varied = [f for f in grid.columns if grid[f].any()]
+    frame = frame.join(grid[varied].add_suffix('_delta'), on='scenario')
+
+    trained = np.zeros(len(frame), dtype=bool)
+    for crop in models.crops:
+        trained |= (frame['crop'] == crop) & frame['state'].isin(models.info[crop]['states'])
+    return frame[trained & frame['predicted'].notna()].reset_index(drop=True)
+
+
+def sensitivity_table(models, baseline, baseline_years):
+    """Yield response of each crop to a one-step change in each feature, for the frontend.
+
+    Per crop: bu/acre per step of every feature (the same in every state,
+    since the models are linear) and, per state, the baseline yield and
+    the percent change per step.
+    """
+    steps = {f: SENSITIVITY_STEPS.get(f, round(models.scales[f], 1)) for f in models.features}
+    grid = pd.DataFrame(np.diag([steps[f] for f in models.features]), columns=models.features)
+    scores = score_grid(models, baseline, grid)
+    scores['feature'] = np.array(models.features)[scores['scenario'].to_numpy()]
+    scores['pct_change'] = 100 * scores['change'] / scores['baseline']
+
+    table = {}
+    for j, crop in enumerate(models.crops):
+        info = models.info[crop]
+        crop_scores = scores[scores['crop'] == crop]
+        table[crop] = {
+            'model_version': info['version'],
+            'baseline_years': [baseline_years[0], baseline_years[-1]],
+            'features': {
+                f: {
+                    'step': steps[f],
+                    'bu_per_step': round(float(models.weights[i, j] * steps[f]), 2),
+                }
+                for i, f in enumerate(models.features) if f in info['features']
+            },
+            'states': {
+                state: {
+                    'baseline_yield': round(float(rows['baseline'].iloc[0]), 1),
+                    'pct_per_step': {
+                        f: round(p, 2) for f, p in zip(rows['feature'], rows['pct_change'].tolist())
+                        if f in info['features']
+                    },
+                }
+                for state, rows in crop_scores.groupby('state', sort=True)
+            },
+        }
+    return table
+
+
+def main():
+    data_dir = os.environ.get('HARROW_DATA_DIR', os.path.join(os.path.dirname(__file__), '..', 'Data'))
+    out_dir = os.environ.get('HARROW_OUT_DIR', os.path.join(os.path.dirname(__file__), '..', 'public', 'data'))
+    parser = argparse.ArgumentParser(description='Score weather what-if scenarios with the saved yield models.')
+    parser.add_argument('--delta', action='append', default=[], metavar='FEATURE=V1,V2,...',
+                        help='changes to a weather feature, in its own units; repeat to cross several '
+                             '(e.g. --delta heat_stress_days=0,5,10)')
+    parser.add_argument('--model-dir', default=os.path.join(data_dir, 'models'),
+                        help='artifacts written by analyze.py (default: Data/models)')
+    parser.add_argument('--version', action='append', default=[], metavar='CROP=VERSION',
+                        help='score with an older saved version of a crop model')
+    parser.add_argument('--crops', help='comma-separated crops (default: every saved model)')
+    parser.add_argument('--states', help='comma-separated state abbreviations (default: all)')
+    parser.add_argument('--baseline-years', help=f"FIRST-LAST years of weather averaged into each state's "
+                                                 f"baseline (default: the latest {BASELINE_YEARS})")
+    parser.add_argument('--out', help='write .csv or .json instead of printing CSV')
+    args = parser.parse_args()
+
+    try:
+        deltas = dict(parse_delta(d) for d in args.delta)
+        versions = dict(v.split('=', 1) for v in args.version)
+        years = parse_years(args.baseline_years) if args.baseline_years else None
+        models = ModelSet(args.model_dir, args.crops.split(',') if args.crops else None, versions)
+        grid = scenario_grid(deltas, models.features)
+    except (ValueError, FileNotFoundError) as err:
+        parser.error(str(err))
+
+    with open(os.path.join(out_dir, 'weather_features.json')) as f:
+        weather = pd.DataFrame(json.load(f))
+    baseline, years = baseline_features(weather, models.features, years)
+    if args.states:
+        baseline = baseline[baseline.index.isin(args.states.upper().split(','))]
+
+    scores = score_grid(models, baseline, grid)
+    for col in ('baseline', 'predicted', 'change'):
+        scores[col] = scores[col].round(1)
+    print(f"Scored {len(grid):,} scenarios × {len(baseline)} states × {len(models.crops)} crops "
+          f"(baseline {years[0]}-{years[-1]}; " +
+          ', '.join(f"{c} {models.info[c]['version']}" for c in models.crops) + ')', file=sys.stderr)
+
+    if args.out and args.out.endswith('.json'):
+        scores.to_json(args.out, orient='records')
+    else:
+        scores.to_csv(args.out or sys.stdout, index=False)
+
+
+if __name__ == '__main__':
+    main()
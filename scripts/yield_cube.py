@@ -0,0 +1,78 @@
+"""
+State × crop × year aggregate cube of county yields.
+Built in a single groupby over the RMA rows; state yields, summaries and
+the planting guide all read from it instead of rescanning the county
+frame. Extreme events average row subsets the way Series.mean() does,
+which the cube's compensated sums cannot reproduce, so ``row_means``
+computes those from the rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+from anomaly_scores import group_rows, group_sums
+
+CUBE_KEYS = ['state_abbr', 'state_name', 'crop', 'year']
+
+
+def build_cube(df):
+    """Sum, count, sample variance, min and max of county yields per state/crop/year.
+
+    The variance is pandas' (Welford) one, from deviations rather than raw
+    sums of squares, so it does not cancel for large, tightly spread yields.
+    """
+    cube = (
+        df.groupby(['State Abbreviation', 'State Name', 'Commodity Name', 'Yield Year'])
+        .agg(
+            sum=('Yield Amount', 'sum'),
+            count=('Yield Amount', 'count'),
+            var=('Yield Amount', 'var'),
+            min=('Yield Amount', 'min'),
+            max=('Yield Amount', 'max'),
+        )
+    )
+    cube.index.names = CUBE_KEYS
+    return cube.reset_index()
+
+
+def mean(cells):
+    return cells['sum'] / cells['count']
+
+
+def std(cells):
+    """Sample standard deviation (ddof=1); NaN for one county."""
+    return np.sqrt(cells['var'])
+
+
+def row_means(df, keys):
+    """Mean county yield per ``keys``, exactly as Series.mean() over each group's rows.
+
+    Each group is summed pairwise in file order, where the cube's cells
+    hold compensated sums; the two can round differently at ties.
+    """
+    order, starts, counts = group_rows(df, keys)
+    values = df['Yield Amount'].to_numpy(dtype=float)[order]
+    index = pd.MultiIndex.from_frame(df.iloc[order[starts]][keys])
+    return pd.Series(group_sums(values, starts, counts) / counts, index=index)
+
+
+def series_stats(frame, value, starts, ends):
+    """Mean, population std and linear trend of ``value`` over years per group.
+
+    ``frame`` is sorted by group then year; ``starts``/``ends`` delimit the
+    groups. Mirrors np.mean/np.std/np.polyfit(deg=1) on each slice.
+    """
+    x = frame['year'].to_numpy(dtype=float)
+    y = frame[value].to_numpy(dtype=float)
+    counts = ends - starts
+
+    # Pairwise sums per slice, as np.mean/np.std add them
+    means = group_sums(y, starts, counts) / counts
+    stds = np.sqrt(group_sums((y - np.repeat(means, counts)) ** 2, starts, counts) / counts)
+
+    x_dev = x - np.repeat(np.add.reduceat(x, starts) / counts, counts)
+    y_dev = y - np.repeat(means, counts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slopes = np.add.reduceat(x_dev * y_dev, starts) / np.add.reduceat(x_dev ** 2, starts)
+
+    return pd.DataFrame({'mean': means, 'std': stds, 'slope': slopes, 'count': counts})
@@ -0,0 +1,81 @@
+"""
+Per-state (optionally per-crop) shards of county_yields.json.
+The frontend can fetch only the state being viewed, using a manifest that
+lists every shard's path, size, year range and sha256. Shards whose bytes
+did not change are left untouched on disk.
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST = 'manifest.json'
+
+
+def shard_county_yields(county_yields, by_crop=False):
+    """{relative path: (state, crop or None, shard dict)} in county_yields.json layout."""
+    shards = {}
+    for fips, county in county_yields.items():
+        state = county['state_abbr']
+        for crop, points in county['crops'].items():
+            crop_key = crop if by_crop else None
+            path = f'{state}/{crop}.json' if by_crop else f'{state}.json'
+            _, _, shard = shards.setdefault(path, (state, crop_key, {}))
+            if fips not in shard:
+                shard[fips] = {**{k: v for k, v in county.items() if k != 'crops'}, 'crops': {}}
+            shard[fips]['crops'][crop] = points
+    return shards
+
+
+def write_shards(county_yields, out_dir, by_crop=False):
+    """Write shards and their manifest under ``out_dir``.
+
+    A shard is rewritten only when its sha256 differs from the previous
+    manifest (or its file is gone); shards no longer produced are removed,
+    along with any directory left empty.
+    Returns (manifest, number of shards written).
+    """
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    previous = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            previous = {entry['path']: entry for entry in json.load(f)['shards']}
+
+    entries = []
+    written = 0
+    for path, (state, crop, shard) in sorted(shard_county_yields(county_yields, by_crop).items()):
+        data = json.dumps(shard).encode()
+        digest = hashlib.sha256(data).hexdigest()
+        full_path = os.path.join(out_dir, path)
+        old = previous.get(path)
+        if old is None or old['sha256'] != digest or not os.path.exists(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'wb') as f:
+                f.write(data)
+            written += 1
+
+        years = [p['year'] for county in shard.values() for points in county['crops'].values() for p in points]
+        entries.append({
+            'path': path,
+            'state': state,
+            **({'crop': crop} if by_crop else {}),
+            'counties': len(shard),
+            'bytes': len(data),
+            'years': [min(years), max(years)],
+            'sha256': digest,
+        })
+
+    for path in set(previous) - {entry['path'] for entry in entries}:
+        full_path = os.path.join(out_dir, path)
+        if os.path.exists(full_path):
+            os.remove(full_path)
+        # Drop the directories (e.g. a by-crop state's) that the removal left empty
+        parent = os.path.dirname(os.path.normpath(full_path))
+        while parent != os.path.normpath(out_dir) and os.path.isdir(parent) and not os.listdir(parent):
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+
+    manifest = {'source': 'county_yields.json', 'by_crop': by_crop, 'shards': entries}
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest, written
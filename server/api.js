@@ -1,5 +1,6 @@
 import express from 'express';
 import cors from 'cors';
+import { readFile } from 'node:fs/promises';
 import { GoogleGenerativeAI } from '@google/generative-ai';
 import dotenv from 'dotenv';
 
@@ -11,6 +12,38 @@ app.use(express.json({ limit: '2mb' }));
 
 const genAI = new GoogleGenerativeAI(process.env.GEMINI_API_KEY);
 
+// Clients send only state/crop keys; the planting guide slice comes from
+// scripts/query_service.py when QUERY_SERVICE_URL is set, else from the file
+const QUERY_SERVICE_URL = process.env.QUERY_SERVICE_URL;
+const QUERY_TIMEOUT_MS = Number(process.env.QUERY_TIMEOUT_MS) || 2000;
+const GUIDE_PATH = new URL('../public/data/planting_guide.json', import.meta.url);
+
+let plantingGuide;
+
+async function guideSlice(stateAbbr, crop) {
+  plantingGuide ??= JSON.parse(await readFile(GUIDE_PATH, 'utf8'));
+  const guide = plantingGuide[stateAbbr];
+  if (!guide) return null;
+  return crop && crop !== 'general' ? guide.crops[crop] ?? null : guide;
+}
+
+// Prompt context, or null (no context) when the lookup fails or times out
+async function fetchContext(stateAbbr, crop) {
+  if (!stateAbbr) return null;
+  try {
+    if (!QUERY_SERVICE_URL) return await guideSlice(stateAbbr, crop);
+    const params = new URLSearchParams({ state: stateAbbr });
+    if (crop && crop !== 'general') params.set('crop', crop);
+    const res = await fetch(`${QUERY_SERVICE_URL}/guide?${params}`, {
+      signal: AbortSignal.timeout(QUERY_TIMEOUT_MS),
+    });
+    return res.ok ? await res.json() : null;
+  } catch (err) {
+    console.error('Context lookup error:', err.message);
+    return null;
+  }
+}
+
 const SYSTEM_PROMPT = `You are an expert agricultural advisor called "Crop Advisor" built into the Harrow platform. You have deep knowledge of US crop production, weather patterns, and farming economics.
 
 Key facts you know:
@@ -23,7 +56,8 @@ Key facts you know:
 Be concise, practical, and friendly. Use numbers and data. Format with **bold** for key terms. Keep responses under 200 words unless the question requires more detail.`;
 
 app.post('/api/plant-helper', async (req, res) => {
-  const { state, stateAbbr, crop, plantDate, historicalData, chatHistory, userMessage } = req.body;
+  const { state, stateAbbr, crop, plantDate, chatHistory, userMessage } = req.body;
+  const historicalData = await fetchContext(stateAbbr, crop);
 
   const historicalContext = historicalData
     ? `\n\nHistorical yield data for ${state}:\n${JSON.stringify(historicalData, null, 2)}`
@@ -9,7 +9,6 @@ export default function ChatDrawer() {
   const chatOpen = useStore(s => s.chatOpen);
   const toggleChat = useStore(s => s.toggleChat);
   const selectedState = useStore(s => s.selectedState);
-  const plantingGuide = useStore(s => s.plantingGuide);
 
   const [messages, setMessages] = useState([]);
   const [input, setInput] = useState('');
@@ -51,9 +50,6 @@ export default function ChatDrawer() {
     setInput('');
     setLoading(true);
 
-    // Build context for Claude
-    const guideData = stateAbbr && plantingGuide ? plantingGuide[stateAbbr] : null;
-
     try {
       const res = await fetch('/api/plant-helper', {
         method: 'POST',
@@ -63,7 +59,6 @@ export default function ChatDrawer() {
           stateAbbr: stateAbbr || '',
           crop: 'general',
           plantDate: new Date().toISOString().split('T')[0],
-          historicalData: guideData,
           chatHistory: messages.concat(userMsg).map(m => ({
             role: m.role,
             content: m.content,
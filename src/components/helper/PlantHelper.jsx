@@ -18,7 +18,6 @@ export default function PlantHelper() {
   const setHelperPlantDate = useStore(s => s.setHelperPlantDate);
   const setClaudeResponse = useStore(s => s.setClaudeResponse);
   const setClaudeLoading = useStore(s => s.setClaudeLoading);
-  const plantingGuide = useStore(s => s.plantingGuide);
 
   // Convert FIPS to abbr for display
   const selectedAbbr = helperState ? FIPS_TO_ABBR[helperState] : null;
@@ -48,8 +47,6 @@ export default function PlantHelper() {
     setClaudeLoading(true);
     setClaudeResponse(null);
 
-    const guideData = plantingGuide?.[selectedAbbr]?.crops?.[helperCrop];
-
     try {
       const res = await fetch('/api/plant-helper', {
         method: 'POST',
@@ -59,7 +56,6 @@ export default function PlantHelper() {
           stateAbbr: selectedAbbr,
           crop: helperCrop,
           plantDate: helperPlantDate,
-          historicalData: guideData,
         }),
       });
       const data = await res.json();
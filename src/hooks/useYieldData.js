@@ -1,5 +1,6 @@
 import { useEffect } from 'react';
 import useStore from '../store/useStore';
+import { decodeCountyYields, decodeRecords } from '../utils/columnar';
 
 const BASE = import.meta.env.BASE_URL;
 
@@ -8,13 +9,26 @@ const DATA_FILES = {
   countyYields: `${BASE}data/county_yields.json`,
   anomalies: `${BASE}data/yield_anomalies.json`,
   stateSummaries: `${BASE}data/state_summaries.json`,
-  plantingGuide: `${BASE}data/planting_guide.json`,
   extremeEvents: `${BASE}data/extreme_events.json`,
   monthlyNormals: `${BASE}data/monthly_normals.json`,
   weatherByState: `${BASE}data/weather_by_state.json`,
   weatherAnomalies: `${BASE}data/weather_anomalies.json`,
 };
 
+// The large datasets load from their smaller, faster-to-parse columnar files,
+// falling back to the row files above when those are missing
+const COLUMNAR_FILES = {
+  countyYields: { path: `${BASE}data/county_yields.columnar.json`, decode: decodeCountyYields },
+  anomalies: { path: `${BASE}data/yield_anomalies.columnar.json`, decode: decodeRecords },
+};
+
+function fetchJson(path) {
+  return fetch(path).then(res => {
+    if (!res.ok) throw new Error(`${res.status}`);
+    return res.json();
+  });
+}
+
 export default function useYieldData() {
   const setData = useStore(s => s.setData);
   const stateYields = useStore(s => s.stateYields);
@@ -23,11 +37,11 @@ export default function useYieldData() {
     if (stateYields) return; // already loaded
 
     Object.entries(DATA_FILES).forEach(([key, path]) => {
-      fetch(path)
-        .then(res => {
-          if (!res.ok) throw new Error(`${res.status}`);
-          return res.json();
-        })
+      const columnar = COLUMNAR_FILES[key];
+      const load = columnar
+        ? fetchJson(columnar.path).then(columnar.decode).catch(() => fetchJson(path))
+        : fetchJson(path);
+      load
         .then(data => setData(key, data))
         .catch(() => {}); // silently skip missing files
     });
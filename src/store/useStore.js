@@ -39,7 +39,6 @@ const useStore = create((set) => ({
   countyYields: null,
   anomalies: null,
   stateSummaries: null,
-  plantingGuide: null,
   extremeEvents: null,
   monthlyNormals: null,
   weatherByState: null,
@@ -0,0 +1,52 @@
+/**
+ * Decoders for the struct-of-arrays files written by scripts/columnar.py.
+ * Each returns the same shape as the matching row file, so the store and
+ * components don't care which one was loaded.
+ */
+const FORMAT = 'columnar-v1';
+
+function checkFormat(data) {
+  if (data.format !== FORMAT) throw new Error(`expected ${FORMAT}, got ${data.format}`);
+}
+
+// { length, columns, dictionaries } -> array of row objects
+function tableRecords({ length, columns, dictionaries }) {
+  const keys = Object.keys(columns);
+  const rows = new Array(length);
+  for (let i = 0; i < length; i++) {
+    const row = {};
+    for (const key of keys) {
+      const value = columns[key][i];
+      row[key] = dictionaries[key] ? dictionaries[key][value] : value;
+    }
+    rows[i] = row;
+  }
+  return rows;
+}
+
+// yield_anomalies.columnar.json -> yield_anomalies.json
+export function decodeRecords(data) {
+  checkFormat(data);
+  return tableRecords(data);
+}
+
+// county_yields.columnar.json -> { fips: { state_abbr, ..., crops: { crop: [{ year, yield }] } } }
+export function decodeCountyYields(data) {
+  checkFormat(data);
+  const countyYields = {};
+  const counties = tableRecords(data.counties).map(({ fips, ...meta }) => {
+    countyYields[fips] = { ...meta, crops: {} };
+    return countyYields[fips];
+  });
+
+  const { county, crop, offset, length } = data.series.columns;
+  const crops = data.series.dictionaries.crop;
+  for (let s = 0; s < data.series.length; s++) {
+    const points = new Array(length[s]);
+    for (let k = 0; k < length[s]; k++) {
+      points[k] = { year: data.year[offset[s] + k], yield: data.yield[offset[s] + k] };
+    }
+    counties[county[s]].crops[crops[crop[s]]] = points;
+  }
+  return countyYields;
+}
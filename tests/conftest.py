@@ -0,0 +1,9 @@
+import os
+import sys
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), 'golden')
+
+# The pipeline modules are flat scripts, imported by name like the scripts import each other
+sys.path.insert(0, SCRIPTS_DIR)
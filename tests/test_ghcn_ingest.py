@@ -0,0 +1,67 @@
+"""Parallel GHCN ingestion: same frames as the serial reader, bounded years in flight."""
+
+from concurrent.futures import Future
+
+import pandas as pd
+
+import ghcn_ingest
+
+STATIONS = {'USC00000001', 'USC00000002'}
+
+
+def write_year(path, year):
+    rows = []
+    for day in range(1, 29):
+        for station in ('USC00000001', 'USC00000002', 'CA000000003'):
+            rows.append(f'{station},{year}03{day:02d},TMAX,{100 + day},,,7,')
+            rows.append(f'{station},{year}03{day:02d},PRCP,{day % 5},,{"X" if day == 3 else ""},7,')
+            rows.append(f'{station},{year}03{day:02d},SNOW,0,,,7,')
+    path.write_text('\n'.join(rows) + '\n')
+
+
+class SerialPool:
+    """Stands in for ProcessPoolExecutor: runs tasks on submit and records the order."""
+
+    log = []
+
+    def __init__(self, max_workers, mp_context, initializer, initargs):
+        # Workers must not re-run the importing script, as spawned ones would
+        assert mp_context.get_start_method() == 'fork'
+        initializer(*initargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, filepath, start, end):
+        SerialPool.log.append(('submit', filepath))
+        future = Future()
+        future.set_result(fn(filepath, start, end))
+        return future
+
+
+def test_parallel_matches_serial(tmp_path, monkeypatch):
+    year_files = {}
+    for year in range(2015, 2021):
+        year_files[year] = str(tmp_path / f'{year}.csv')
+        write_year(tmp_path / f'{year}.csv', year)
+
+    monkeypatch.setattr(ghcn_ingest, 'ProcessPoolExecutor', SerialPool)
+    SerialPool.log = []
+    for year, frame, rows in ghcn_ingest.read_years_parallel(year_files, STATIONS, workers=2, chunk_bytes=1000):
+        SerialPool.log.append(('yield', year_files[year]))
+        expected, expected_rows = ghcn_ingest.read_year(year_files[year], STATIONS)
+        assert rows == expected_rows
+        pd.testing.assert_frame_equal(frame, expected)
+
+    # Never more than two years submitted but not yet yielded
+    in_flight, peak = set(), 0
+    for event, path in SerialPool.log:
+        if event == 'submit':
+            in_flight.add(path)
+        else:
+            in_flight.discard(path)
+        peak = max(peak, len(in_flight))
+    assert peak == 2
@@ -0,0 +1,69 @@
+"""Streaming JSON writer: json.dump's bytes, without holding the output text."""
+
+import io
+import json
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import jsonout
+
+
+class CountingSink:
+    """File stand-in that keeps only the number of characters written."""
+
+    size = 0
+
+    def write(self, text):
+        self.size += len(text)
+
+
+def dumped(obj):
+    f = io.StringIO()
+    jsonout.dump(obj, f)
+    return f.getvalue()
+
+
+def test_records_match_json_dump():
+    columns = {
+        'state': np.array(['IA', 'IA', 'IA', 'NE', 'NE'], dtype=object),
+        'year': np.array([2019, 2020, 2021, 2020, 2021]),
+        'yield': np.array([1.005, 2.675, np.nan, 180.0, 3.14159]),
+        'note': np.array(['a', None, 'c"', None, 'e'], dtype=object),
+        'flag': np.array([True, False, True, True, False]),
+    }
+    decimals = {'yield': 2}
+    expected = [{k: (round(v, 2) if k == 'yield' else v) for k, v in zip(columns, row)}
+                for row in zip(*(values.tolist() for values in columns.values()))]
+    assert dumped(jsonout.array(jsonout.records(columns, decimals))) == json.dumps(expected)
+
+    rows = jsonout.records(columns, decimals, skip_missing=True)
+    kept = [{k: v for k, v in row.items() if pd.notna(v)} for row in expected]
+    starts, ends = np.array([0, 3]), np.array([3, 5])
+    by_state = dict(zip(['IA', 'NE'], jsonout.split(rows, starts, ends)))
+    assert len(rows) == 5
+    assert dumped(by_state) == json.dumps({'IA': kept[:3], 'NE': kept[3:]})
+    assert dumped(jsonout.array(rows[5:])) == '[]'
+
+
+def test_dump_streams_rows():
+    # Many blocks of rows; the columns exist before tracing starts
+    n = 200_000
+    rng = np.random.default_rng(0)
+    columns = {
+        'fips': np.array([f'{i:05d}' for i in range(n)], dtype=object),
+        'year': rng.integers(1990, 2024, n),
+        'yield': np.round(rng.random(n) * 200, 2),
+    }
+    sink = CountingSink()
+    tracemalloc.start()
+    try:
+        jsonout.dump(jsonout.array(jsonout.records(columns)), sink)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert sink.size > 8_000_000
+    # Building every row's text first would peak well above the output size
+    assert peak < sink.size / 4
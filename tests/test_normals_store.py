@@ -0,0 +1,11 @@
+"""Normals accumulator store: an empty selection still has the accumulator index."""
+
+from normals_store import NormalsStore, monthly_normals
+
+
+def test_load_nothing_keeps_accumulator_index(tmp_path):
+    store = NormalsStore(str(tmp_path / 'normals_store'), 'key')
+    acc = store.load([])
+    assert list(acc.index.names) == ['state', 'year', 'month']
+    assert acc.index.get_level_values('year').nunique() == 0
+    assert monthly_normals(acc) == {}
@@ -0,0 +1,39 @@
+"""Two-way fixed-effects panel regression."""
+
+import numpy as np
+
+from panel_model import PanelRegression, drop_singletons
+
+
+def test_drop_singletons_with_the_highest_code_single():
+    # County 2 has one row; dropping it leaves no count for the highest code
+    counties = np.array([0, 0, 1, 1, 2])
+    years = np.array([0, 1, 0, 1, 0])
+    assert drop_singletons([counties, years]).tolist() == [True, True, True, True, False]
+
+    # Dropping county 3 leaves year 2 with one row, and dropping that county 2
+    counties = np.array([0, 0, 1, 1, 2, 2, 3])
+    years = np.array([0, 1, 0, 1, 0, 2, 2])
+    assert drop_singletons([counties, years]).tolist() == [True, True, True, True, False, False, False]
+
+
+def test_fit_recovers_slopes_and_effects():
+    rng = np.random.default_rng(0)
+    n_counties, n_years = 30, 12
+    counties = np.repeat(np.arange(n_counties), n_years)
+    years = np.tile(np.arange(n_years), n_counties)
+    # Unbalanced: drop a tenth of the county-years
+    keep = rng.random(len(counties)) > 0.1
+    counties, years = counties[keep], years[keep]
+
+    X = rng.normal(size=(len(counties), 2)) + counties[:, None] * 0.1
+    county_effects = rng.normal(100, 20, n_counties)
+    year_effects = rng.normal(0, 5, n_years)
+    year_effects -= year_effects.mean()
+    y = X @ np.array([2.5, -1.0]) + county_effects[counties] + year_effects[years]
+
+    model = PanelRegression().fit(X, y, counties, years)
+    np.testing.assert_allclose(model.coef_, [2.5, -1.0], atol=1e-6)
+    np.testing.assert_allclose(model.year_effects_, year_effects, atol=1e-6)
+    np.testing.assert_allclose(model.county_effects_, county_effects, atol=1e-6)
+    np.testing.assert_allclose(model.predict(X, counties, years), y, atol=1e-6)
@@ -0,0 +1,97 @@
+"""
+Regression test for process_yields.py against golden outputs.
+tests/fixtures/yields holds the real RMA rows of six small states
+(AL, DE, NJ, VT, WV, WY). tests/fixtures/yields_synth holds 50 synthetic
+counties (synth_data.py --counties 50), enough group means that land
+near a rounding tie to catch summation-order and rounding drift the real
+rows miss. tests/golden/<fixture> holds what the original,
+pre-vectorization process_yields.py wrote for each. Every rewrite of the
+yield outputs must reproduce those files byte for byte.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from conftest import FIXTURES_DIR, GOLDEN_DIR, SCRIPTS_DIR
+
+FIXTURES = ['yields', 'yields_synth']
+GOLDEN_FILES = [
+    'state_yields.json', 'county_yields.json', 'yield_anomalies.json',
+    'state_summaries.json', 'planting_guide.json', 'extreme_events.json',
+]
+
+
+def run_process_yields(out_dir, *args, data_dir=os.path.join(FIXTURES_DIR, 'yields')):
+    env = {
+        **os.environ,
+        'HARROW_DATA_DIR': str(data_dir),
+        'HARROW_OUT_DIR': str(out_dir),
+    }
+    subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, 'process_yields.py'), *args],
+                   env=env, check=True, capture_output=True)
+
+
+@pytest.fixture(scope='module', params=FIXTURES)
+def outputs(request, tmp_path_factory):
+    out_dir = tmp_path_factory.mktemp(request.param)
+    run_process_yields(out_dir, data_dir=os.path.join(FIXTURES_DIR, request.param))
+    return request.param, out_dir
+
+
+@pytest.mark.parametrize('name', GOLDEN_FILES)
+def test_outputs_match_golden(outputs, name):
+    fixture, out_dir = outputs
+    with open(os.path.join(GOLDEN_DIR, fixture, name), 'rb') as f:
+        expected = f.read()
+    with open(out_dir / name, 'rb') as f:
+        assert f.read() == expected
+
+
+@pytest.mark.parametrize('fixture', FIXTURES)
+def test_duckdb_backend_matches_golden(tmp_path, fixture):
+    pytest.importorskip('duckdb')
+    # A quote in the paths must reach DuckDB intact
+    data_dir = tmp_path / "farmer's data"
+    shutil.copytree(os.path.join(FIXTURES_DIR, fixture), data_dir)
+    out_dir = tmp_path / 'out'
+    run_process_yields(out_dir, '--backend', 'duckdb', data_dir=data_dir)
+    for name in GOLDEN_FILES:
+        with open(os.path.join(GOLDEN_DIR, fixture, name), 'rb') as f:
+            expected = f.read()
+        with open(out_dir / name, 'rb') as f:
+            assert f.read() == expected, name
+
+
+def test_columnar_outputs_hold_the_row_records(tmp_path):
+    run_process_yields(tmp_path)
+    with open(tmp_path / 'yield_anomalies.json') as f:
+        anomalies = json.load(f)
+    with open(tmp_path / 'yield_anomalies.columnar.json') as f:
+        table = json.load(f)
+    columns, dictionaries = table['columns'], table['dictionaries']
+    decoded = [
+        {key: dictionaries[key][values[i]] if key in dictionaries else values[i] for key, values in columns.items()}
+        for i in range(table['length'])
+    ]
+    assert decoded == anomalies
+
+    # The frontend prefers the columnar files, so a run without them removes stale ones
+    run_process_yields(tmp_path, '--no-columnar')
+    assert not list(tmp_path.glob('*.columnar.json'))
+
+
+@pytest.mark.parametrize('mode, statistic', [('robust', 'median'), ('detrended', 'trend')])
+def test_anomaly_baseline_is_named(tmp_path, mode, statistic):
+    run_process_yields(tmp_path, '--anomaly-mode', mode)
+    with open(tmp_path / 'yield_anomalies.json') as f:
+        anomalies = json.load(f)
+    assert anomalies
+    for record in anomalies:
+        assert 'mean_yield' not in record
+        assert record['baseline'] == statistic
+        assert isinstance(record['baseline_yield'], float)
@@ -0,0 +1,45 @@
+"""State- and county-year metrics, crop-window features included, from the registry."""
+
+import numpy as np
+import pandas as pd
+
+from weather_metrics import county_year_metrics, state_year_metrics
+
+
+def pivoted_july():
+    """Two Iowa stations through July; only the first reports precipitation."""
+    days = np.arange(182, 213)  # July 1-31
+    frames = []
+    for station, prcp in (('USC00000001', np.where(days % 10 == 0, 5.0, 0.0)), ('USC00000002', np.nan)):
+        frames.append(pd.DataFrame({
+            'station': station, 'state': 'IA', 'year': 2020, 'doy': days, 'month': 7,
+            'TMAX': np.where(days < 185, 36.0, 30.0), 'TMIN': 20.0, 'PRCP': prcp,
+        }))
+    pivoted = pd.concat(frames, ignore_index=True)
+    pivoted['station'] = pivoted['station'].astype('category')
+    pivoted['state'] = pivoted['state'].astype('category')
+    return pivoted
+
+
+def test_window_features():
+    windows = {'silking': (7, 7), 'season': (4, 9)}
+    [record] = state_year_metrics(pivoted_july(), {'IA': '19'}, windows=windows)
+    # 3 days at (30 + 20) / 2 - 10 and 28 at the same: GDD caps TMAX at 30 °C
+    assert record['silking_gdd'] == 15.0 * 31
+    assert record['silking_heat_days'] == 3.0
+    # The station without rain reports counts as 0 mm and no dry days, as in the growing season
+    assert record['silking_precip_mm'] == 7.5
+    assert record['silking_dry_spell_days'] == 4.5
+    assert record['season_precip_mm'] == record['growing_season_precip_mm']
+    assert record['season_dry_spell_days'] == record['max_dry_spell_days']
+    assert list(record)[-4:] == ['season_gdd', 'season_heat_days', 'season_precip_mm', 'season_dry_spell_days']
+
+
+def test_county_metrics_use_each_countys_stations():
+    pivoted = pivoted_july()
+    pivoted['county'] = pd.Categorical(np.where(pivoted['station'] == 'USC00000001', '19001', None))
+    [record] = county_year_metrics(pivoted, windows={'silking': (7, 7)})
+    assert (record['fips'], record['year']) == ('19001', 2020)
+    assert record['silking_precip_mm'] == 15.0
+    # The county's one station saw all three hot days
+    assert record['heat_stress_days'] == 3.0
@@ -0,0 +1,44 @@
+"""Saved yield models and what-if scoring."""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from whatif import ModelSet, parse_years, save_models, scenario_grid, score_grid
+
+
+def fit(features, states, coef):
+    return {
+        'scaler': SimpleNamespace(mean_=np.zeros(len(features)), scale_=np.ones(len(features))),
+        'model': SimpleNamespace(coef_=np.array(coef, dtype=float), intercept_=100.0),
+        'features': features,
+        'states': states,
+        'years': [2000, 2020],
+        'metrics': {'r2': 0.5},
+    }
+
+
+def test_older_version_scores_with_its_own_features_and_states(tmp_path):
+    old = save_models(tmp_path, {'corn': fit(['heat'], ['IA'], [2.0])})['crops']['corn']['version']
+    save_models(tmp_path, {'corn': fit(['heat', 'precip'], ['IA', 'NE'], [1.0, 0.5])})
+
+    models = ModelSet(tmp_path, versions={'corn': old})
+    assert models.features == ['heat']
+    assert models.info['corn'] == {
+        'version': old, 'artifact': f'corn/{old}.npz', 'model': 'linear_regression',
+        'features': ['heat'], 'states': ['IA'], 'years': [2000, 2020],
+    }
+
+    baseline = pd.DataFrame({'heat': [10.0, 10.0]}, index=pd.Index(['IA', 'NE'], name='state'))
+    scores = score_grid(models, baseline, scenario_grid({'heat': [1.0]}, models.features))
+    assert scores[['state', 'predicted', 'change']].values.tolist() == [['IA', 122.0, 2.0]]
+
+
+def test_parse_years():
+    assert parse_years('2018-2022') == range(2018, 2023)
+    assert parse_years('2020') == range(2020, 2021)
+    for text in ('2020-x', '2022-2018', '-'):
+        with pytest.raises(ValueError):
+            parse_years(text)
@@ -0,0 +1,34 @@
+"""State × crop × year yield cube."""
+
+import numpy as np
+import pandas as pd
+
+from yield_cube import build_cube, row_means, std
+
+
+def rows(values, states):
+    return pd.DataFrame({
+        'State Abbreviation': states,
+        'State Name': states,
+        'Commodity Name': 'corn',
+        'Yield Year': 2020,
+        'Yield Amount': values,
+    })
+
+
+def test_std_does_not_cancel():
+    # Raw sums of squares lose every digit of this spread
+    values = 1e8 + np.array([0.1, 0.2, 0.3, 0.4])
+    df = rows(values, ['IA'] * 4)
+    np.testing.assert_allclose(std(build_cube(df))[0], np.std(values, ddof=1), rtol=1e-6)
+    assert np.isnan(std(build_cube(rows([180.0], ['IA'])))[0])
+
+
+def test_row_means_match_series_mean():
+    rng = np.random.default_rng(0)
+    values = np.round(rng.random(300) * 200, 1)
+    states = rng.choice(['IA', 'NE', 'SC'], 300)
+    df = rows(values, states)
+    means = row_means(df, ['Commodity Name', 'State Abbreviation'])
+    for state, group in df.groupby('State Abbreviation'):
+        assert means[('corn', state)] == group['Yield Amount'].mean()
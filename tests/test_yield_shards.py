@@ -0,0 +1,30 @@
+"""Per-state shards of county_yields.json across repeated runs."""
+
+import json
+
+import pytest
+
+from yield_shards import MANIFEST, write_shards
+
+
+def county(state, crops):
+    return {'state_abbr': state, 'county': 'Story', 'crops': {
+        crop: [{'year': 2020, 'yield': 180.5}, {'year': 2021, 'yield': 175.0}] for crop in crops}}
+
+
+@pytest.mark.parametrize('by_crop', [False, True])
+def test_state_dropping_out_removes_its_shards(tmp_path, by_crop):
+    first = {'19169': county('IA', ['corn', 'soybeans']), '31001': county('NE', ['corn'])}
+    manifest, written = write_shards(first, tmp_path, by_crop)
+    assert written == len(manifest['shards'])
+    assert (tmp_path / ('NE/corn.json' if by_crop else 'NE.json')).exists()
+
+    manifest, written = write_shards({'19169': first['19169']}, tmp_path, by_crop)
+    assert written == 0
+    assert {entry['state'] for entry in manifest['shards']} == {'IA'}
+    # Nothing of NE is left behind, not even an empty directory
+    on_disk = sorted(p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob('*'))
+    expected = ['IA', 'IA/corn.json', 'IA/soybeans.json'] if by_crop else ['IA.json']
+    assert on_disk == sorted(expected + [MANIFEST])
+    with open(tmp_path / MANIFEST) as f:
+        assert json.load(f) == manifest